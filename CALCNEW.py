@@ -1,142 +1,11 @@
 import tkinter as tk
-import math
-import re
-import operator
+from omnicalc.core import CalculatorCore
+from omnicalc.background import BackgroundEvaluator
+from omnicalc.bigint import is_huge
+from omnicalc.metrics import RedrawScheduler, dump as dump_metrics
 # from PIL import Image, ImageTk # REMOVED: No longer needed as logo/image functionality is removed
 
-# --- 1. Model: Core Logic and State Management (Unchanged) ---
-
-class CalculatorCore:
-    """Handles all mathematical state, evaluation, and mode processing."""
-    
-    def __init__(self):
-        self.expression = ""
-        self.total_history = ""
-        self.is_deg_mode = True
-        self.is_second_mode = False
-        self.memory = 0.0
-        self.last_answer = 0.0
-        self.safe_dict = self._create_safe_dict()
-        
-        self.DISPLAY_MAP = {'**': '^', '*': '×', '/': '÷', 'sqrt(': '√(', 'cbrt(': '³√('}
-        self.DISPLAY_FUNCTIONS = ['sin(', 'cos(', 'tan(', 'log10(', 'log(', 'exp(', 'factorial(', 'sqrt(', 'cbrt(', 'pow(', 'asin(', 'acos', 'atan', 'sinh', 'cosh', 'tanh', 'asinh', 'acosh', 'atanh']
-
-    def _create_safe_dict(self):
-        """Creates the dictionary of allowed functions for safe evaluation."""
-        safe_dict = {
-            'pi': math.pi, 'e': math.e, 'sqrt': math.sqrt, 
-            'cbrt': lambda x: x**(1/3),
-            'log': math.log, 'log10': math.log10, 'exp': math.exp, 'abs': abs,
-            'factorial': math.factorial, 'pow': pow, 
-            'sinh': math.sinh, 'cosh': math.cosh, 'tanh': math.tanh, 
-            'asinh': math.asinh, 'acosh': math.acosh, 'atanh': math.atanh,
-        }
-
-        for func in ['sin', 'cos', 'tan', 'asin', 'acos', 'atan']:
-            safe_dict[func] = getattr(math, func)
-        
-        safe_dict.update({
-            'sind': lambda x: math.sin(math.radians(x)),
-            'cosd': lambda x: math.cos(math.radians(x)),
-            'tand': lambda x: math.tan(math.radians(x)),
-            'asind': lambda x: math.degrees(math.asin(x)),
-            'acosd': lambda x: math.degrees(math.acos(x)),
-            'atand': lambda x: math.degrees(math.atan(x)),
-        })
-        return safe_dict
-
-    def add_to_expression(self, value):
-        if self.expression == "Error": self.expression = ""
-        if value == 'π': value = 'pi'
-        elif value == 'e': value = 'e'
-        self.expression += str(value)
-
-    def clear(self):
-        self.expression = ""
-        self.total_history = ""
-
-    def backspace(self):
-        if self.expression == "Error": self.clear()
-        else: self.expression = self.expression[:-1]
-
-    def toggle_deg_rad(self):
-        self.is_deg_mode = not self.is_deg_mode
-        return "DEG" if self.is_deg_mode else "RAD"
-
-    def toggle_second_mode(self):
-        self.is_second_mode = not self.is_second_mode
-        return self.is_second_mode
-
-    def memory_clear(self):
-        self.memory = 0.0
-
-    def memory_recall(self):
-        self.add_to_expression(str(self.memory))
-
-    def recall_last_answer(self):
-        self.add_to_expression(str(self.last_answer))
-
-    def memory_op(self, op_func):
-        try:
-            current_val = float(eval(self._preprocess_expression(self.expression), {"__builtins__": None}, self.safe_dict))
-            self.memory = op_func(self.memory, current_val)
-        except:
-            self.expression = "Error"
-            
-    def memory_add(self): 
-        self.memory_op(operator.add)
-        self.clear() 
-        
-    def memory_subtract(self): 
-        self.memory_op(operator.sub)
-        self.clear() 
-
-    def _preprocess_expression(self, expr):
-        open_count = expr.count('(')
-        close_count = expr.count(')')
-        expr += ')' * (open_count - close_count)
-
-        if self.is_deg_mode:
-            for func in ['sin', 'cos', 'tan', 'asin', 'acos', 'atan']:
-                expr = re.sub(r'\b' + func + r'\(', f'{func}d(', expr)
-        
-        expr = expr.replace('pi', str(math.pi))
-        expr = expr.replace('e', str(math.e))
-
-        return expr
-
-    def evaluate(self):
-        self.total_history = self._format_for_display(self.expression) + "="
-        
-        try:
-            processed_expr = self._preprocess_expression(self.expression)
-            result = eval(processed_expr, {"__builtins__": None}, self.safe_dict)
-            self.last_answer = result
-            
-            if result == int(result):
-                result = int(result)
-            
-            self.expression = str(round(result, 10))
-            
-        except Exception:
-            self.expression = "Error"
-        
-        return self.expression, self.total_history
-
-    def _format_for_display(self, expr):
-        display_expr = expr
-        for op, symbol in self.DISPLAY_MAP.items():
-            display_expr = display_expr.replace(op, symbol)
-        
-        if self.is_deg_mode:
-            display_expr = display_expr.replace('sind(', 'sin(')
-            display_expr = display_expr.replace('cosd(', 'cos(')
-            display_expr = display_expr.replace('tand(', 'tan(')
-            display_expr = display_expr.replace('asind(', 'sin⁻¹(')
-            display_expr = display_expr.replace('acosd(', 'cos⁻¹(')
-            display_expr = display_expr.replace('atand(', 'tan⁻¹(')
-
-        return display_expr
+# --- 1. Model: CalculatorCore lives in omnicalc/core.py (tkinter-free) ---
 
 # --- 2. View: Tkinter UI and Styling (MODIFIED) ---
 
@@ -166,11 +35,31 @@ class Style:
 class ScientificCalculator(tk.Frame):
     """The Tkinter GUI class (View)."""
 
-    def __init__(self, master, core):
+    WORKER_POLL_MS = 16 # Roughly one frame
+    PLOT_WIDTH = 400 # Extra window width while the graph panel is shown
+    TABLE_WIDTH = 300 # ... and while the table panel is shown
+    HISTORY_WIDTH = 260 # ... and while the history panel is shown
+
+    def __init__(self, master, core, background=None):
         tk.Frame.__init__(self, master)
         self.master = master
         self.core = core 
         self.toggleable_buttons = []
+        # Evaluation runs in a separate process so heavy math never blocks the mainloop
+        self.background = background or BackgroundEvaluator()
+        self._pending_expression = None
+        self._digits_job = None # Ctrl+D: writing out a huge ANS in the worker
+        self._poll_job = None
+        # All display refreshes of one event-loop turn are folded into one idle pass
+        self.redraw = RedrawScheduler(master, self._redraw_display)
+        self._shown_state = None
+        self._label_texts = {}
+        self.plot_panel = None # Graph panel, created on first Ctrl+G
+        self._plot_visible = False
+        self.table_panel = None # Table panel, created on first Ctrl+T
+        self._table_visible = False
+        self.history_panel = None # History panel, created on first Ctrl+H
+        self._history_visible = False
         # self.github_logo = None # REMOVED: Logo variable no longer needed
 
         master.title("OmniCalc: Scientific Calculator (Green/Gold)")
@@ -183,14 +72,22 @@ class ScientificCalculator(tk.Frame):
         # UI Component Creation
         self.display_frame = self._create_display_frame()
         self.buttons_frame = self._create_buttons_frame()
-        self.total_label, self.label, self.mode_label = self._create_display_labels()
+        self.total_label, self.label, self.mode_label, self.exact_label, self.preview_label = \
+            self._create_display_labels()
         # self._create_author_label() # REMOVED: Logo/Author label creation no longer needed
         
         # Button Creation
         self.button_definitions = self._get_button_definitions()
+        self._hover_colors = {}
         self._create_buttons()
         self.update_display() 
         self._bind_keys()
+        # Hover effects are not needed for the first paint; attach them once Tk is idle
+        master.after_idle(self._bind_hover_effects)
+
+        master.protocol("WM_DELETE_WINDOW", self._on_close)
+        master.after(200, self.background.start) # Warm the worker once the window is up
+        master.after(200, self.core.open_history) # Maps the history index; nothing is read up front
 
     # --- UI Creation Helper Methods (Restored/Modified) ---
 
@@ -237,8 +134,21 @@ class ScientificCalculator(tk.Frame):
                               bg=Style.DISPLAY_BG_COLOR, fg=Style.OPERATOR_BG_COLOR, 
                               padx=10, font=Style.MODE_FONT)
         mode_label.pack(side='left', padx=(0, 10))
+
+        # Number mode (float, exact fractions, N-digit decimals), next to the DEG/RAD indicator (click or Ctrl+E)
+        exact_label = tk.Label(status_frame, text="FLOAT", anchor=tk.W, cursor="hand2",
+                               bg=Style.DISPLAY_BG_COLOR, fg=Style.LABEL_COLOR,
+                               padx=0, font=Style.MODE_FONT)
+        exact_label.pack(side='left')
+        exact_label.bind('<Button-1>', lambda event: self._cycle_number_mode_ui())
+
+        # Live result preview while typing
+        preview_label = tk.Label(status_frame, text="", anchor=tk.E,
+                                 bg=Style.DISPLAY_BG_COLOR, fg=Style.LABEL_COLOR,
+                                 padx=10, font=Style.MODE_FONT)
+        preview_label.pack(side='right')
         
-        return total_label, label, mode_label
+        return total_label, label, mode_label, exact_label, preview_label
         
     # def _create_author_label(self): # REMOVED: This method is entirely gone
     #     """The logic for the GitHub logo and author label is removed."""
@@ -328,17 +238,8 @@ class ScientificCalculator(tk.Frame):
                     columnspan=b_info.get('colspan', 1),
                     sticky="nsew", padx=2, pady=2)
         
-        # Hover logic
-        def on_enter(event, h_color=hover_color):
-            if event.widget['bg'] != Style.SECOND_ACTIVE_BG:
-                event.widget.config(bg=h_color)
-        
-        def on_leave(event, b_color=bg_color):
-            if event.widget['bg'] != Style.SECOND_ACTIVE_BG:
-                event.widget.config(bg=b_color)
-
-        button.bind("<Enter>", on_enter)
-        button.bind("<Leave>", on_leave)
+        # Hover colors are applied by class-wide bindings (see _bind_hover_effects)
+        self._hover_colors[button] = (bg_color, hover_color)
 
         if b_info.get('toggle', False):
             self.toggleable_buttons.append((button, b_info))
@@ -346,6 +247,21 @@ class ScientificCalculator(tk.Frame):
         if 'id' in b_info:
             setattr(self, f"btn_{b_info['id']}", button)
 
+    def _bind_hover_effects(self):
+        """One class binding for every button instead of two bindings per button."""
+        self.master.bind_class("Button", "<Enter>", self._on_button_enter, add="+")
+        self.master.bind_class("Button", "<Leave>", self._on_button_leave, add="+")
+
+    def _on_button_enter(self, event):
+        colors = self._hover_colors.get(event.widget)
+        if colors and event.widget['bg'] != Style.SECOND_ACTIVE_BG:
+            event.widget.config(bg=colors[1])
+
+    def _on_button_leave(self, event):
+        colors = self._hover_colors.get(event.widget)
+        if colors and event.widget['bg'] != Style.SECOND_ACTIVE_BG:
+            event.widget.config(bg=colors[0])
+
     def _get_button_colors(self, btn_type):
         """Returns the background and hover color based on button type."""
         if btn_type == 'op': return Style.OPERATOR_BG_COLOR, Style.OPERATOR_HOVER_COLOR
@@ -357,6 +273,12 @@ class ScientificCalculator(tk.Frame):
     def _bind_keys(self):
         key_map = {
             '<Return>': self._evaluate_ui, '<BackSpace>': self._backspace_ui, '<Escape>': self._clear_ui,
+            '<Control-e>': self._cycle_number_mode_ui, '<Control-g>': self._toggle_plot_ui,
+            '<Control-r>': self._solve_ui, '<Control-i>': lambda: self._input('integrate('),
+            '<Control-t>': self._toggle_table_ui, '<Control-d>': self._copy_digits_ui,
+            '<Control-h>': self._toggle_history_ui,
+            '<Up>': lambda: self._browse_history_ui(True), '<Down>': lambda: self._browse_history_ui(False),
+            'x': lambda: self._input('x'), ',': lambda: self._input(','),
             '1': lambda: self._input('1'), '2': lambda: self._input('2'), '3': lambda: self._input('3'), 
             '4': lambda: self._input('4'), '5': lambda: self._input('5'), '6': lambda: self._input('6'), 
             '7': lambda: self._input('7'), '8': lambda: self._input('8'), '9': lambda: self._input('9'), 
@@ -370,16 +292,44 @@ class ScientificCalculator(tk.Frame):
     # --- UI Update and Interaction Methods (Intermediary/Controller) ---
 
     def update_display(self):
-        display_text = self.core._format_for_display(self.core.expression)
-        self.label.config(text=display_text if self.core.expression else "0")
-        self.total_label.config(text=self.core.total_history)
-        self.mode_label.config(text="DEG" if self.core.is_deg_mode else "RAD")
+        self.redraw.request()
+
+    def _redraw_display(self):
+        # Display strings (and the preview) only need recomputing when the input changed
+        state = (self.core.expression, self.core.is_deg_mode, self.core.is_exact_mode, self.core.precision,
+                 self._is_computing(), self.core.last_answer)
+        if state != self._shown_state:
+            self._shown_state = state
+            display_text = self.core._format_for_display(self.core.expression)
+            if self._is_computing():
+                display_text = "computing…"
+            self._set_label(self.label, display_text if self.core.expression else "0")
+            preview = "" if self._is_computing() else self.core.preview()
+            self._set_label(self.preview_label, f"= {preview}" if preview else "")
+        self._set_label(self.total_label, self.core.total_history)
+        self._set_label(self.mode_label, "DEG" if self.core.is_deg_mode else "RAD")
+        self._set_label(self.exact_label, self.core.number_mode_text())
+        if self._plot_visible:
+            self.plot_panel.plot(self.core.expression)
+        if self._table_visible:
+            self.table_panel.show(self.core.expression)
+        if self._history_visible:
+            self.history_panel.refresh()
+
+    def _set_label(self, label, text):
+        # Skip config() (and the repaint it triggers) when the text is unchanged
+        if self._label_texts.get(label) != text:
+            self._label_texts[label] = text
+            label.config(text=text)
 
     def _input(self, value):
         self.core.add_to_expression(value)
         self.update_display()
         
     def _clear_ui(self):
+        # First press while a result is pending aborts the computation only
+        if self._cancel_evaluation():
+            return
         self.core.clear()
         self.update_display()
 
@@ -388,13 +338,79 @@ class ScientificCalculator(tk.Frame):
         self.update_display()
         
     def _evaluate_ui(self):
-        self.core.evaluate()
+        expr = self.core.begin_evaluation()
+        self._pending_expression = expr
+        self.background.submit(expr, self.core.is_deg_mode, self.core.last_answer, self.core.is_exact_mode,
+                               self.core.precision)
+        self.update_display()
+        self._schedule_poll()
+
+    # --- Background Evaluation ---
+
+    def _is_computing(self):
+        return self.background.busy and self.core.expression == self._pending_expression
+
+    def _schedule_poll(self):
+        if self._poll_job is None:
+            self._poll_job = self.master.after(self.WORKER_POLL_MS, self._poll_background)
+
+    def _poll_background(self):
+        self._poll_job = None
+        job = self.background.poll()
+        if job is None:
+            if self.background.busy:
+                self._schedule_poll()
+            return
+
+        if job.job_id == self._digits_job:
+            self._digits_job = None
+            if job.ok:
+                self._copy(job.value)
+            else:
+                self.core.total_history = "Cannot write out ANS"
+            self.update_display()
+            return
+
+        replace = self.core.expression == self._pending_expression
+        expression, self._pending_expression = self._pending_expression, None
+        if job.ok:
+            self.core.record(expression, job.value)
+            self.core.finish_evaluation(job.value, replace)
+        elif replace:
+            self.core.fail_evaluation()
+        self.update_display()
+
+    def _cancel_evaluation(self):
+        """Aborts the in-flight evaluation, if any. Returns True when something was cancelled."""
+        if not self.background.busy:
+            return False
+        self.background.cancel()
+        self._pending_expression = None
+        self.core.total_history = "Cancelled"
         self.update_display()
+        return True
+
+    def _on_close(self):
+        self.background.close()
+        self.core.close_history()
+        histograms = [self.redraw.histogram]
+        if self.plot_panel is not None:
+            histograms.append(self.plot_panel.redraw.histogram)
+        if self.table_panel is not None:
+            histograms.append(self.table_panel.redraw.histogram)
+        if self.history_panel is not None:
+            histograms.append(self.history_panel.redraw.histogram)
+        dump_metrics(histograms)
+        self.master.destroy()
 
     def _recall_ans_ui(self):
         self.core.recall_last_answer()
         self.update_display()
 
+    def _browse_history_ui(self, older):
+        self.core.browse_history(older)
+        self.update_display()
+
     def _mem_clear_ui(self):
         self.core.memory_clear()
     
@@ -414,6 +430,105 @@ class ScientificCalculator(tk.Frame):
         mode = self.core.toggle_deg_rad()
         self.btn_deg.config(text=mode)
         self.mode_label.config(text=mode)
+        self.update_display()  # the preview follows the new angle mode
+
+    def _cycle_number_mode_ui(self):
+        self.core.cycle_number_mode()
+        self.update_display()
+
+    def _copy_digits_ui(self):
+        """Copy ANS with every digit to the clipboard; huge integers are written out in the worker."""
+        value = self.core.last_answer
+        if not is_huge(value):
+            self._copy(self.core._format_result(value))
+            return
+        self._pending_expression = None
+        self._digits_job = self.background.submit_digits(value)
+        self.core.total_history = "Writing out ANS…"
+        self.update_display()
+        self._schedule_poll()
+
+    def _copy(self, text):
+        self.master.clipboard_clear()
+        self.master.clipboard_append(text)
+        self.core.total_history = f"Copied {text}" if len(text) <= 30 else f"Copied {len(text):,} characters"
+        self.update_display()
+
+    def _solve_ui(self):
+        """Find the roots of expression = 0 in x over the graph's x range (or the default one)."""
+        from omnicalc.plotting import default_range
+        from omnicalc.solver import format_report
+        if self._plot_visible:
+            lo, hi = self.plot_panel.x_range()
+        else:
+            lo, hi = default_range(self.core.is_deg_mode)
+        try:
+            report = self.core.solve(self.core.expression, lo, hi)
+            self.core.total_history = format_report(report, self.core._format_result)
+        except Exception:
+            self.core.total_history = "Cannot solve"
+        self.update_display()
+
+    # --- Graph Panel ---
+
+    def _toggle_plot_ui(self):
+        """Show or hide the graph of the current expression (in x) beside the keypad."""
+        if self.plot_panel is None:
+            from omnicalc.plotview import PlotPanel # Only loaded when first asked for
+            self.plot_panel = PlotPanel(self.master, self.core, bg=Style.DISPLAY_BG_COLOR, fg=Style.LABEL_COLOR,
+                                        curve=Style.OPERATOR_BG_COLOR, axis=Style.SPECIAL_BG_COLOR,
+                                        font=Style.AUTHOR_FONT)
+        panel = self.plot_panel
+        self._plot_visible = not self._plot_visible
+        width, height = self.master.winfo_width(), self.master.winfo_height()
+        if self._plot_visible:
+            panel.grid(row=0, column=1, rowspan=2, sticky="nsew", padx=(0, 10), pady=10)
+            self.master.columnconfigure(1, weight=1)
+            self.master.geometry(f"{width + self.PLOT_WIDTH}x{height}")
+            panel.plot(self.core.expression)
+        else:
+            panel.grid_remove()
+            self.master.columnconfigure(1, weight=0)
+            self.master.geometry(f"{max(width - self.PLOT_WIDTH, 400)}x{height}")
+
+    def _toggle_table_ui(self):
+        """Show or hide the table of the current expression (in x) beside the keypad."""
+        if self.table_panel is None:
+            from omnicalc.tableview import TablePanel # Only loaded when first asked for
+            self.table_panel = TablePanel(self.master, self.core, bg=Style.DISPLAY_BG_COLOR, fg=Style.LABEL_COLOR,
+                                          grid=Style.SPECIAL_BG_COLOR, font=Style.AUTHOR_FONT)
+        panel = self.table_panel
+        self._table_visible = not self._table_visible
+        width, height = self.master.winfo_width(), self.master.winfo_height()
+        if self._table_visible:
+            panel.grid(row=0, column=2, rowspan=2, sticky="nsew", padx=(0, 10), pady=10)
+            self.master.columnconfigure(2, weight=1)
+            self.master.geometry(f"{width + self.TABLE_WIDTH}x{height}")
+            panel.show(self.core.expression)
+        else:
+            panel.grid_remove()
+            self.master.columnconfigure(2, weight=0)
+            self.master.geometry(f"{max(width - self.TABLE_WIDTH, 400)}x{height}")
+
+    def _toggle_history_ui(self):
+        """Show or hide the list of past results; clicking one enters its expression."""
+        if self.history_panel is None:
+            from omnicalc.historyview import HistoryPanel # Only loaded when first asked for
+            self.history_panel = HistoryPanel(self.master, self.core, self._input, bg=Style.DISPLAY_BG_COLOR,
+                                              fg=Style.LABEL_COLOR, grid=Style.SPECIAL_BG_COLOR,
+                                              font=Style.AUTHOR_FONT)
+        panel = self.history_panel
+        self._history_visible = not self._history_visible
+        width, height = self.master.winfo_width(), self.master.winfo_height()
+        if self._history_visible:
+            panel.grid(row=0, column=3, rowspan=2, sticky="nsew", padx=(0, 10), pady=10)
+            self.master.columnconfigure(3, weight=1)
+            self.master.geometry(f"{width + self.HISTORY_WIDTH}x{height}")
+            panel.refresh()
+        else:
+            panel.grid_remove()
+            self.master.columnconfigure(3, weight=0)
+            self.master.geometry(f"{max(width - self.HISTORY_WIDTH, 400)}x{height}")
     
     def _toggle_2nd_mode_ui(self):
         is_second = self.core.toggle_second_mode()
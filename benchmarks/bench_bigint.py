@@ -0,0 +1,60 @@
+"""
+Huge integer results: leading digits from the top bits against str().
+
+    python benchmarks/bench_bigint.py [--check]
+
+For each result this times the display form (omnicalc.bigint.scientific),
+the full expansion on demand (full_digits) and plain str() with the
+int-to-str digit limit lifted, which is what showing the number used to need.
+--check exits 1 if the leading digits or the full expansion disagree with
+str().
+"""
+
+import math
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from omnicalc.bigint import scientific, full_digits
+
+CASES = [
+    ("factorial(2000)", lambda: math.factorial(2000)),
+    ("-3**20000", lambda: -3 ** 20000),
+    ("factorial(50000)", lambda: math.factorial(50000)),
+    ("2**10**6", lambda: 2 ** 10 ** 6),
+    ("7**(10**6)", lambda: 7 ** 10 ** 6),
+]
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if hasattr(sys, 'set_int_max_str_digits'):
+        sys.set_int_max_str_digits(0)
+    failed = False
+    print(f"{'result':<18} {'digits':>8} {'shown':>22} {'ms':>7} {'full ms':>9} {'str() ms':>9}")
+    for label, make in CASES:
+        n = make()
+        shown, shown_time = timed(scientific, n)
+        full, full_time = timed(full_digits, n)
+        text, str_time = timed(str, n)
+        digits = text.lstrip('-')
+        mantissa, exponent = shown.lstrip('-').split('e')
+        # The shown digits are the leading ones, rounded to the last place.
+        expected = f"{round(int(digits[:11]), -1) / 10 ** 10:.9f}".rstrip('0').rstrip('.')
+        ok = full == text and int(exponent) == len(digits) - 1 and mantissa == expected
+        failed = failed or not ok
+        print(f"{label:<18} {len(digits):>8} {shown:>22} {shown_time * 1e3:>7.3f} {full_time * 1e3:>9.1f} "
+              f"{str_time * 1e3:>9.1f}{'' if ok else '  WRONG'}")
+    return 1 if failed and '--check' in argv else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,118 @@
+"""
+Editing a long expression: the token buffer against string slicing.
+
+    python benchmarks/bench_buffer.py [--groups N] [--check]
+
+Types an expression of N parenthesized groups (default 5000) one key at a
+time, then times the keys that used to rescan the whole string: negating the
+last group (a walk back to its '('), replacing an operator and backspace.
+"string" repeats the old slicing code on a plain str; "buffer" is
+omnicalc.buffer.ExpressionBuffer. Each key is timed an even number of times,
+so the buffer ends with the text it was typed with (the old negation leaves
+'(-(' unclosed and does not undo cleanly, so the string's text is not
+compared). --check exits 1 if the buffer's text differs from the typed
+expression or a buffer key costs more than KEY_LIMIT_US.
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from omnicalc.buffer import ExpressionBuffer
+
+DEFAULT_GROUPS = 5000
+REPEATS = 200
+KEY_LIMIT_US = 50.0
+GROUP_KEYS = ['(', '1', '2', '+', '3', ')', '*']
+
+
+def negate_string(expression):
+    """The old negate_last_input for a trailing group: find its '(' by counting back."""
+    count, i = 1, len(expression) - 2
+    while i >= 0:
+        if expression[i] == ')':
+            count += 1
+        elif expression[i] == '(':
+            count -= 1
+        if count == 0:
+            break
+        i -= 1
+    if i > 1 and expression[i - 1] == '-' and expression[i - 2] in '+-*/(':
+        return expression[:i - 1] + expression[i + 1:-1]
+    return expression[:i] + '(-' + expression[i:]
+
+
+def replace_string(expression, value):
+    """The old operator replacement: scan back over the trailing operators."""
+    i = len(expression) - 1
+    while i >= 0 and expression[i] in '+*/%' and expression[i] != '-':
+        i -= 1
+    return expression[:i + 1] + value
+
+
+def per_key(function):
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        function()
+    return (time.perf_counter() - start) / REPEATS * 1e6
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    groups = int(argv[argv.index('--groups') + 1]) if '--groups' in argv else DEFAULT_GROUPS
+    keys = (GROUP_KEYS * groups)[:-1]  # no trailing '*'
+
+    start = time.perf_counter()
+    text = ""
+    for key in keys:
+        text += key
+    typed_string = time.perf_counter() - start
+    start = time.perf_counter()
+    buffer = ExpressionBuffer()
+    for key in keys:
+        buffer.insert(key)
+    typed_buffer = time.perf_counter() - start
+    print(f"expression {len(text):>9} chars {len(buffer):>8} tokens")
+    print(f"{'key':<20} {'string µs':>10} {'buffer µs':>10}")
+    print(f"{'type (per key)':<20} {typed_string / len(keys) * 1e6:>10.3f} {typed_buffer / len(keys) * 1e6:>10.3f}")
+
+    state = {'text': text}
+
+    def string_negate():
+        state['text'] = negate_string(state['text'])
+
+    def string_operator():
+        state['text'] = replace_string(state['text'] + '*', '/')[:-1]
+
+    def string_backspace():
+        state['text'] = state['text'][:-1] + ')'
+
+    def buffer_operator():
+        buffer.insert('*')
+        buffer.replace_operator('/')
+        buffer.delete()
+
+    def buffer_backspace():
+        buffer.delete()
+        buffer.insert(')')
+
+    wrong = False
+    for label, string_key, buffer_key in [("negate last group", string_negate, buffer.negate),
+                                          ("replace operator", string_operator, buffer_operator),
+                                          ("backspace + retype", string_backspace, buffer_backspace)]:
+        string_us, buffer_us = per_key(string_key), per_key(buffer_key)
+        print(f"{label:<20} {string_us:>10.2f} {buffer_us:>10.2f}")
+        wrong = wrong or buffer_us > KEY_LIMIT_US
+    start = time.perf_counter()
+    rendered = buffer.text
+    print(f"render once {(time.perf_counter() - start) * 1e3:>8.2f} ms")
+    if rendered != text:
+        print("WRONG: the buffer's text differs from the typed expression")
+        wrong = True
+    return 1 if wrong and '--check' in argv else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,59 @@
+"""
+Exact binomials: prime-factorized nCr against the factorial chain and math.comb.
+
+    python benchmarks/bench_combinatorics.py [--check]
+
+For each size this times nCr(n, n/2) from omnicalc.combinatorics (sieve
+already warm), math.comb and `factorial(n)//factorial(k)//factorial(n-k)`.
+The target is nCr(10**6, 5*10**5) well under a second; --check exits 1 if
+it takes a second or more. The slow baselines are skipped above 10**6.
+"""
+
+import math
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from omnicalc.combinatorics import nCr, primes_up_to, FACTORIAL_CACHE, factorial
+
+TARGET = (10 ** 6, 5 * 10 ** 5)
+TARGET_SECONDS = 1.0
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def factorial_chain(n, k):
+    return math.factorial(n) // math.factorial(k) // math.factorial(n - k)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    print(f"{'n':>9} {'nCr s':>8} {'math.comb s':>12} {'factorials s':>13}")
+    for n in (10 ** 4, 10 ** 5, 3 * 10 ** 5, 10 ** 6):
+        k = n // 2
+        primes_up_to(n)
+        ours = timed(nCr, n, k)
+        comb = timed(math.comb, n, k)
+        chain = timed(factorial_chain, n, k) if n <= 3 * 10 ** 5 else float('nan')
+        print(f"{n:>9} {ours:>8.3f} {comb:>12.3f} {chain:>13.3f}")
+
+    FACTORIAL_CACHE.clear()
+    first = timed(factorial, 2 * 10 ** 5)
+    repeat = timed(factorial, 2 * 10 ** 5)
+    nearby = timed(factorial, 2 * 10 ** 5 + 1000)
+    print(f"\nfactorial(200000): first {first:.4f}s, cached {repeat * 1e6:.1f}us, "
+          f"factorial(201000) from the cached neighbour {nearby:.4f}s")
+
+    cold = timed(nCr, *TARGET)
+    print(f"\nnCr{TARGET}: {cold:.3f}s (target < {TARGET_SECONDS}s)")
+    return 1 if '--check' in argv and cold >= TARGET_SECONDS else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,56 @@
+"""
+Overhead of the pre-evaluation cost check.
+
+    python benchmarks/bench_cost.py
+
+For each corpus this reports the time to parse, to estimate the cost of the
+parsed tree and to compile it, per expression. The cost check runs once per
+compile (cache hits skip it), plus once per call for expressions using ANS.
+The "huge" corpus is what the check exists for: without it every line would
+allocate hundreds of megabytes.
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from omnicalc.core import CalculatorCore
+from omnicalc.cost import estimate_bits, approximate
+from omnicalc.parser import parse, degrees_transform, constants_transform, numeric_constants
+
+KEYPAD = ["12+7*3", "sin(30)+cos(60)", "sqrt(2)/2", "2**10-1", "factorial(10)/3", "log(e**2)",
+          "(1+2)*(3+4)*(5+6", "tan(45)*100/7", "exp(1)-e", "asin(0.5)+acos(0.5)"]
+HUGE = ["10**10**8", "9**9**9", "factorial(10**6)", "2**3**4**2", "factorial(factorial(20))",
+        "(10**10**8)/10**(10**8-5)", "log10(7**7**7**2)", "-3**3**30"]
+
+
+def per_expression(func, count):
+    best = min(timeit.repeat(func, number=200, repeat=5))
+    return best / 200 / count * 1e6
+
+
+def main():
+    core = CalculatorCore()
+    namespace = core.safe_dict
+    transforms = (constants_transform(numeric_constants(namespace)), degrees_transform)
+
+    print(f"{'corpus':<8} {'parse us':>9} {'estimate us':>12} {'compile us':>11} {'approximate us':>15}")
+    for label, corpus in (("keypad", KEYPAD), ("huge", HUGE)):
+        trees = [parse(expr, transforms) for expr in corpus]
+        parse_us = per_expression(lambda: [parse(expr, transforms) for expr in corpus], len(corpus))
+        estimate_us = per_expression(lambda: [estimate_bits(tree, namespace) for tree in trees], len(corpus))
+        if label == "keypad":
+            compile_us = per_expression(lambda: [core.evaluator.compile(tree, namespace) for tree in trees],
+                                        len(corpus))
+            approximate_us = float('nan')
+        else:
+            compile_us = per_expression(
+                lambda: [core.cost_model.compile(tree, core.evaluator, namespace) for tree in trees], len(corpus))
+            approximate_us = per_expression(lambda: [approximate(tree, namespace) for tree in trees], len(corpus))
+        print(f"{label:<8} {parse_us:>9.1f} {estimate_us:>12.1f} {compile_us:>11.1f} {approximate_us:>15.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Throughput of the closure evaluator against the restricted eval() path.
+
+    python benchmarks/bench_evaluator.py
+
+Each corpus is compiled once per backend (as the expression cache would do)
+and then evaluated repeatedly. The "cold" column includes parsing and
+compiling on every call. The variable corpus evaluates expressions in `x`
+so constant folding cannot reduce them to a single value.
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from omnicalc.core import CalculatorCore
+from omnicalc.evaluator import ClosureEvaluator, PythonEvaluator
+from omnicalc.parser import parse, degrees_transform, constants_transform, numeric_constants
+
+KEYPAD = ["12+7*3", "sin(30)+cos(60)", "sqrt(2)/2", "2**10-1", "factorial(10)/3", "log(e**2)",
+          "(1+2)*(3+4)*(5+6", "tan(45)*100/7", "exp(1)-e", "asin(0.5)+acos(0.5)"]
+VARIABLE = ["x*x+2*x+1", "sin(x)**2+cos(x)**2", "sqrt(x+1)/(x+2)", "exp(-x/10)*cos(3*x)",
+            "log10(x+1)*pi", "tan(x/3)-atan(x)", "x**3-2*x**2+x-7", "abs(x-50)/(1+x)"]
+
+
+def compile_corpus(evaluator, corpus, core, variables=()):
+    transforms = (constants_transform(numeric_constants(core.safe_dict)), degrees_transform)
+    return [evaluator.compile(parse(expr, transforms), core.safe_dict, variables) for expr in corpus]
+
+
+def rate(func, number):
+    best = min(timeit.repeat(func, number=number, repeat=5))
+    return number / best
+
+
+def main():
+    core = CalculatorCore()
+    backends = [PythonEvaluator(), ClosureEvaluator()]
+
+    print(f"{'corpus':<10} {'backend':<8} {'cold eval/s':>12} {'warm eval/s':>12}")
+    for label, corpus, env in (("keypad", KEYPAD, None), ("variable", VARIABLE, {'x': 12.5})):
+        variables = tuple(env) if env else ()
+        for evaluator in backends:
+            compiled = compile_corpus(evaluator, corpus, core, variables)
+
+            def warm():
+                for item in compiled:
+                    item(env)
+
+            def cold():
+                for item in compile_corpus(evaluator, corpus, core, variables):
+                    item(env)
+
+            warm_rate = rate(warm, 2000) * len(corpus)
+            cold_rate = rate(cold, 50) * len(corpus)
+            print(f"{label:<10} {evaluator.name:<8} {cold_rate:>12,.0f} {warm_rate:>12,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Exact mode: lazily normalized Rational against fractions.Fraction.
+
+    python benchmarks/bench_exact.py
+
+Times the same operation chains with omnicalc.exact (ints stay ints, gcd
+only past NORMALIZE_BITS) and with fractions.Fraction (gcd after every
+operation), then whole expressions through CalculatorCore in float and
+exact mode.
+"""
+
+import os
+import sys
+import time
+from fractions import Fraction
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from omnicalc.core import CalculatorCore
+from omnicalc.exact import decimal_literal, exact_divide, format_exact, Rational
+
+
+def timed(func, repeat=5):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def decimal_sum(make, count):
+    """0.01 + 0.02 + ... as exact decimals."""
+    def run():
+        total = 0
+        for i in range(1, count + 1):
+            total = total + make(i, 100)
+        return total
+    return run
+
+
+def harmonic_sum(make, count):
+    def run():
+        total = 0
+        for i in range(1, count + 1):
+            total = total + make(1, i)
+        return total
+    return run
+
+
+def price_chain(make, count):
+    """Repeated percentage changes: x * 1.05 * 0.97 * ..."""
+    def run():
+        value = make(100, 1)
+        for i in range(count):
+            value = value * make(105 if i % 2 else 97, 100)
+        return value
+    return run
+
+
+def main(argv=None):
+    cases = [('decimal sum x2000', decimal_sum, 2000),
+             ('harmonic sum x300', harmonic_sum, 300),
+             ('price chain x200', price_chain, 200)]
+    print(f"{'case':<22} {'Rational ms':>12} {'Fraction ms':>12} {'speedup':>8}")
+    for name, build, count in cases:
+        ours = timed(build(exact_divide, count))
+        theirs = timed(build(Fraction, count))
+        ours_value = build(exact_divide, count)()
+        theirs_value = build(Fraction, count)()
+        assert ours_value == theirs_value, name
+        print(f"{name:<22} {ours * 1e3:>12.2f} {theirs * 1e3:>12.2f} {theirs / ours:>7.1f}x")
+
+    expression = "+".join(f"{i}.{i % 97:02d}" for i in range(1, 300)) + "/7"
+    print(f"\nCalculatorCore, {len(expression)}-character decimal sum (uncached):")
+    for exact in (False, True):
+        core = CalculatorCore()
+        core.is_exact_mode = exact
+
+        def run():
+            core.expression_cache.clear()
+            core.expression = expression
+            core.evaluate()
+        print(f"  {'exact' if exact else 'float':<6} {timed(run) * 1e3:8.2f} ms  -> {core.expression[:40]}")
+    assert isinstance(decimal_literal(0.1), Rational) and format_exact(decimal_literal(0.1)) == "0.1"
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+"""
+Persistent history: appending, reopening and lookups as the log grows.
+
+    python benchmarks/bench_history.py [--entries N] [--check]
+
+Appends N entries (default 200000) to a history in a temporary directory,
+then times reopening it, reading entries at random positions and prefix
+searches, the last against a linear scan of every entry. "indexes ms" is
+History.matches, which the history panel filters with: the positions of all
+matches in age order, without reading them. --check exits 1 if a search or
+matches() disagrees with the scan or reopening takes longer than
+OPEN_LIMIT_MS, which should hold for any N since opening only maps the
+index files.
+"""
+
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from omnicalc.history import History
+
+DEFAULT_ENTRIES = 200000
+LOOKUPS = 10000
+PREFIXES = ["sin(", "sin(1", "12", "factorial(7", "1+" * 15, "x"]
+SCANNED_PREFIXES = 2  # the linear scan is slow; compare only on the first few prefixes
+OPEN_LIMIT_MS = 50.0
+
+TEMPLATES = ["sin({})", "{}*{}", "factorial({})", "{}+{}", "sqrt({})", "1+" * 15 + "{}"]
+
+
+def expressions(count, seed=1):
+    rng = random.Random(seed)
+    for _ in range(count):
+        template = rng.choice(TEMPLATES)
+        yield template.format(*(rng.randrange(1000) for _ in range(template.count('{}'))))
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    count = int(argv[argv.index('--entries') + 1]) if '--entries' in argv else DEFAULT_ENTRIES
+    directory = tempfile.mkdtemp(prefix='omnicalc-history-')
+    wrong = False
+    try:
+        start = time.perf_counter()
+        with History(directory) as history:
+            for i, expression in enumerate(expressions(count)):
+                history.append(expression, i * 0.5)
+        appended = time.perf_counter() - start
+        size = os.path.getsize(os.path.join(directory, 'history.log'))
+        print(f"append    {count:>9} entries  {count / appended:>10.0f}/s  log {size / 1e6:.1f} MB")
+
+        start = time.perf_counter()
+        history = History(directory)
+        opened = (time.perf_counter() - start) * 1e3
+        print(f"open      {opened:>9.2f} ms")
+        wrong = opened > OPEN_LIMIT_MS
+
+        rng = random.Random(2)
+        positions = [rng.randrange(count) for _ in range(LOOKUPS)]
+        start = time.perf_counter()
+        for position in positions:
+            history[position]
+        seconds = time.perf_counter() - start
+        print(f"lookup    {seconds / LOOKUPS * 1e6:>9.2f} µs per entry")
+
+        print(f"{'prefix':<32} {'matches':>8} {'first ms':>9} {'all ms':>9} {'indexes ms':>10} {'scan ms':>9}")
+        for number, prefix in enumerate(PREFIXES):
+            start = time.perf_counter()
+            matches = history.search(prefix)
+            first = next(matches, None)
+            first_ms = (time.perf_counter() - start) * 1e3
+            found = ([first.index] if first else []) + [entry.index for entry in matches]
+            all_ms = (time.perf_counter() - start) * 1e3
+            start = time.perf_counter()
+            indexes = history.matches(prefix)
+            indexes_ms = (time.perf_counter() - start) * 1e3
+            scan = ""
+            if number < SCANNED_PREFIXES:
+                start = time.perf_counter()
+                expected = [i for i in range(count) if history[i].expression.startswith(prefix)]
+                scan = f"{(time.perf_counter() - start) * 1e3:.1f}"
+                if sorted(found) != expected or indexes != expected:
+                    wrong = True
+                    scan += "  WRONG"
+            print(f"{prefix:<32} {len(found):>8} {first_ms:>9.3f} {all_ms:>9.1f} {indexes_ms:>10.2f} {scan:>9}")
+        history.close()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return 1 if wrong and '--check' in argv else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+"""
+Integration: adaptive Gauss–Kronrod against composite Simpson's rule.
+
+    python benchmarks/bench_integrate.py [--check]
+
+Each integral is computed with CalculatorCore.integrate (tolerance 1e-10)
+and with a naive composite Simpson's rule that doubles its number of
+intervals until two successive results agree to the same tolerance, or it
+reaches 2**20 intervals. Both evaluate the integrand with evaluate_many,
+one call per round. The table shows evaluations, time and the actual error
+against the exact value. --check exits 1 if Gauss–Kronrod does not converge
+or is off by more than 1e-8 relative.
+"""
+
+import math
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from omnicalc.core import CalculatorCore
+
+TOLERANCE = 1e-10
+MAX_INTERVALS = 2 ** 20
+
+# (integrand, a, b, DEG mode, exact value)
+CASES = [
+    ("x**2", 0, 1, False, 1 / 3),
+    ("sin(x)", 0, 180, True, 360 / math.pi),
+    ("cos(x)**2", 0, 3600, True, 1800.0),
+    ("exp(-x**2)", -10, 10, False, math.sqrt(math.pi)),
+    ("exp(-x**2)", -1e9, 1e9, False, math.sqrt(math.pi)),
+    ("1/(1+x**2)", -100, 100, False, 2 * math.atan(100)),
+    ("log(x)", 1, 10, False, 10 * math.log(10) - 9),
+    ("sqrt(x)", 0, 1, False, 2 / 3),
+    ("abs(x-0.3)", 0, 1, False, 0.29),
+]
+
+
+def simpson(evaluate, a, b):
+    """(value, evaluations) of composite Simpson's rule, doubling the intervals from scratch."""
+    n, previous, evaluations = 2, None, 0
+    while True:
+        h = (b - a) / n
+        ys = evaluate([a + i * h for i in range(n + 1)])
+        evaluations += n + 1
+        value = h / 3 * (ys[0] + ys[-1] + 4 * sum(ys[1:-1:2]) + 2 * sum(ys[2:-1:2]))
+        if previous is not None and abs(value - previous) / 15 <= TOLERANCE * max(1.0, abs(value)):
+            return value, evaluations
+        if n >= MAX_INTERVALS:
+            return value, evaluations
+        previous, n = value, 2 * n
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    core = CalculatorCore()
+    failed = False
+    print(f"{'integral':<26} {'GK evals':>8} {'ms':>7} {'error':>8} {'Simpson evals':>13} {'ms':>7} {'error':>8}")
+    for expression, a, b, deg, exact in CASES:
+        core.is_deg_mode = deg
+        evaluate = lambda xs, expression=expression: core.evaluate_many(expression, xs)
+        evaluate([0.5])  # compile once
+
+        start = time.perf_counter()
+        result = core.integrate(expression, a, b, TOLERANCE)
+        gk_time = time.perf_counter() - start
+        gk_error = abs(result.value - exact) / max(1.0, abs(exact))
+
+        start = time.perf_counter()
+        value, evaluations = simpson(evaluate, a, b)
+        simpson_time = time.perf_counter() - start
+        simpson_error = abs(value - exact) / max(1.0, abs(exact))
+
+        ok = result.converged and gk_error <= 1e-8
+        failed = failed or not ok
+        label = f"{expression} {a:g}..{b:g}{' DEG' if deg else ''}"
+        print(f"{label:<26} {result.evaluations:>8} {gk_time * 1e3:>7.2f} {gk_error:>8.1e} "
+              f"{evaluations:>13} {simpson_time * 1e3:>7.2f} {simpson_error:>8.1e}{'' if ok else '  WRONG'}")
+    return 1 if failed and '--check' in argv else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
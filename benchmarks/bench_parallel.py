@@ -0,0 +1,52 @@
+"""
+Scaling of the process-pool batch evaluator with the number of workers.
+
+    python benchmarks/bench_parallel.py [--count N]
+
+The corpus mixes cheap keypad expressions with moderately expensive
+big-integer work, so each chunk carries real CPU load. Speedup is reported
+relative to a single worker; on an idle machine it should approach the
+number of physical cores.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from omnicalc.parallel import BatchEvaluator
+
+CORPUS = ["factorial(3000)/factorial(2990)", "sin(30)+cos(60)", "2**4000 % 977",
+          "sqrt(2)*pi", "(1+2)*(3+4)", "exp(1.5)-log(7)"]
+
+
+def run(workers, expressions):
+    with BatchEvaluator(workers=workers, timeout=10.0, chunk_size=128) as pool:
+        pool.start()
+        start = time.perf_counter()
+        count = sum(1 for _ in pool.map(expressions))
+        return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--count', type=int, default=60000)
+    args = parser.parse_args()
+
+    # Vary the text so the workers' expression caches cannot short-circuit the work.
+    expressions = [f"{CORPUS[i % len(CORPUS)]}+{i}" for i in range(args.count)]
+    cores = os.cpu_count() or 1
+    counts = sorted({1, 2, 4, 8, cores} & set(range(1, cores + 1)))
+
+    print(f"{'workers':>7} {'expr/s':>12} {'speedup':>8}")
+    baseline = None
+    for workers in counts:
+        throughput = run(workers, expressions)
+        baseline = baseline or throughput
+        print(f"{workers:>7} {throughput:>12,.0f} {throughput / baseline:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Graph panel sampling: adaptive refinement, cached pans and pixel decimation.
+
+    python benchmarks/bench_plot.py [--check]
+
+For each expression (DEG mode, a 600x400 plot over -360..360) this reports
+the values evaluated and the time for the first draw, for a pan of 20
+pixels repeated 10 times and for zooming in and back out, plus the line
+segments the canvas gets. A uniform sampler needs as many values per pixel
+as the finest refinement everywhere; the last column is that count.
+--check exits 1 if any draw creates more segments than the plot has pixel
+columns, or if the pans together evaluate more values than the first draw.
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from omnicalc.core import CalculatorCore
+from omnicalc.plotting import SampleCache, decimate, MIN_PX
+
+WIDTH, HEIGHT = 600, 400
+X_RANGE = (-360.0, 360.0)
+PANS, PAN_PX = 10, 20
+EXPRESSIONS = ["sin(x)", "tan(x)", "x**3/1000-x", "1/(x-45)", "sqrt(x)*sin(5*x)", "exp(x/60)"]
+
+
+def draw(cache, view):
+    xs, ys = cache.samples(*view, WIDTH, HEIGHT)
+    lines = decimate(xs, ys, *view, WIDTH, HEIGHT)
+    return sum(len(line) // 2 - 1 for line in lines)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    core = CalculatorCore()
+    failed = False
+    uniform = int(WIDTH / MIN_PX)
+    print(f"{'expression':<18} {'first':>7} {'ms':>6} {'pans':>6} {'ms':>6} {'zoom':>6} {'ms':>6} "
+          f"{'segments':>9} {'uniform':>8}")
+    for expression in EXPRESSIONS:
+        core.evaluate_many(expression, [0.0])  # compile once
+        cache = SampleCache(lambda xs, expression=expression: core.evaluate_many(expression, xs))
+        x0, x1 = X_RANGE
+        start = time.perf_counter()
+        view = (x0, x1) + cache.fit(x0, x1, WIDTH)
+        segments = draw(cache, view)
+        first_time = time.perf_counter() - start
+        first = cache.evaluations
+
+        step = (x1 - x0) * PAN_PX / WIDTH
+        start = time.perf_counter()
+        for i in range(1, PANS + 1):
+            segments = max(segments, draw(cache, (x0 + i * step, x1 + i * step) + view[2:]))
+        pan_time = time.perf_counter() - start
+        pans = cache.evaluations - first
+
+        y0, y1 = view[2:]
+        start = time.perf_counter()
+        segments = max(segments, draw(cache, (x0 / 4, x1 / 4, y0 / 4, y1 / 4)))
+        segments = max(segments, draw(cache, view))
+        zoom_time = time.perf_counter() - start
+        zoom = cache.evaluations - first - pans
+
+        failed = failed or segments > WIDTH or pans > first
+        print(f"{expression:<18} {first:>7} {first_time * 1e3:>6.1f} {pans:>6} {pan_time * 1e3:>6.1f} "
+              f"{zoom:>6} {zoom_time * 1e3:>6.1f} {segments:>9} {uniform:>8}")
+    return 1 if failed and '--check' in argv else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,60 @@
+"""
+Decimal mode: constants, functions and the per-precision constant cache.
+
+    python benchmarks/bench_precise.py
+
+Times pi and e cold and cached at several precisions, a lower precision
+served from the cached digits of a higher one, and a few functions and
+whole expressions through CalculatorCore at 50 and 1000 digits.
+"""
+
+import os
+import sys
+import time
+from decimal import Decimal, localcontext
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from omnicalc.core import CalculatorCore
+from omnicalc.precise import CONSTANTS, make_context, sin, atan, sinh
+
+PRECISIONS = (50, 1000, 10000)
+EXPRESSIONS = ["pi*e", "sin(30)+cos(45)**2", "sqrt(2)*exp(1)/log(10)", "atan(1)*4-pi"]
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def main(argv=None):
+    print(f"{'constant':<10} {'digits':>7} {'cold ms':>9} {'cached us':>10}")
+    for name in ('pi', 'e'):
+        for precision in PRECISIONS:
+            CONSTANTS.clear()
+            cold = timed(CONSTANTS.get, name, precision)
+            cached = timed(CONSTANTS.get, name, precision)
+            print(f"{name:<10} {precision:>7} {cold * 1e3:>9.2f} {cached * 1e6:>10.1f}")
+    CONSTANTS.clear()
+    CONSTANTS.get('pi', 10000)
+    print(f"pi at 60 digits after 10000 were computed: {timed(CONSTANTS.get, 'pi', 60) * 1e6:.1f}us")
+
+    print(f"\n{'function':<10} {'digits':>7} {'ms':>9}")
+    for precision in (50, 1000):
+        with localcontext(make_context(precision)):
+            for function in (sin, atan, sinh):
+                print(f"{function.__name__:<10} {precision:>7} {timed(function, Decimal('0.7')) * 1e3:>9.3f}")
+
+    print(f"\n{'expression':<26} {'digits':>7} {'ms':>9}")
+    for precision in (50, 1000):
+        core = CalculatorCore()
+        core.set_precision(precision)
+        for expression in EXPRESSIONS:
+            core.expression_cache.clear()
+            print(f"{expression:<26} {precision:>7} {timed(core.calculate, expression) * 1e3:>9.3f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
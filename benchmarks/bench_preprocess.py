@@ -0,0 +1,68 @@
+"""
+Compare the legacy regex preprocessing with the single-pass tokenizer/parser.
+
+    python benchmarks/bench_preprocess.py
+
+The legacy path runs one `re.sub` per DEG-mode function over the whole string
+and then hands the text to CPython's compiler; the new path tokenizes and
+parses once and compiles the resulting tree directly.
+"""
+
+import math
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from omnicalc.parser import parse, to_python_ast, degrees_transform, constants_transform
+
+TRIG = ['sin', 'cos', 'tan', 'asin', 'acos', 'atan']
+CONSTANTS = constants_transform({'pi': math.pi, 'e': math.e})
+
+
+def legacy_compile(expr, functions=TRIG):
+    expr += ')' * (expr.count('(') - expr.count(')'))
+    for func in functions:
+        expr = re.sub(r'\b' + func + r'\(', f'{func}d(', expr)
+    return compile(expr, '<expression>', 'eval')
+
+
+def parser_compile(expr):
+    return compile(to_python_ast(parse(expr, (CONSTANTS, degrees_transform))), '<expression>', 'eval')
+
+
+def build_expression(terms):
+    parts = []
+    for i in range(terms):
+        func = TRIG[i % 3]
+        parts.append(f"{func}({i % 90}+pi)*{i + 1}.5")
+    return '+'.join(parts)
+
+
+def bench(func, expr, number):
+    return min(timeit.repeat(lambda: func(expr), number=number, repeat=5)) / number
+
+
+def main():
+    print(f"{'terms':>6} {'chars':>7} {'legacy us':>11} {'parser us':>11} {'ratio':>7}")
+    for terms in (4, 64, 256, 512):
+        expr = build_expression(terms)
+        number = max(1, 2000 // terms)
+        legacy = bench(legacy_compile, expr, number) * 1e6
+        new = bench(parser_compile, expr, number) * 1e6
+        print(f"{terms:>6} {len(expr):>7} {legacy:>11.1f} {new:>11.1f} {legacy / new:>7.2f}")
+
+    # Cost of the rewrite step alone as the number of rewritten functions grows.
+    expr = build_expression(512)
+    print(f"\n{'rewrites':>8} {'legacy re.sub us':>17} {'parse us':>10}")
+    for count in (6, 24, 96):
+        functions = [f"{name}{i}" for i in range(count // 6) for name in TRIG]
+        legacy = bench(lambda e: legacy_compile(e, functions), expr, 20) * 1e6
+        new = bench(parser_compile, expr, 20) * 1e6
+        print(f"{count:>8} {legacy:>17.1f} {new:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+The live preview while typing: incremental re-parsing against a fresh parse per key.
+
+    python benchmarks/bench_preview.py [--terms N] [--check]
+
+Types an expression of N terms (default 100) one key at a time and times the
+preview of every prefix, once with one LivePreview kept across keys (as the
+calculator does) and once with a new LivePreview per key. --check also types
+CHECK_EXPRESSIONS (exponents, decimals, names that grow while typed) in every
+mode and exits 1 if any prefix previews differently from a fresh parse.
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from omnicalc.functions import create_safe_dict
+from omnicalc.precise import precise_namespace
+from omnicalc.preview import LivePreview
+
+DEFAULT_TERMS = 100
+CHECK_EXPRESSIONS = ["1e5+2", "2.5e-3*4", "1E+2*3-4e-1", "3*1.5e+2/2e1", "sin(30)+1e2",
+                     "12e3e4", "pi*2e-2+e", "2**1e1", ".5e1+1.", "sqrt(2.25e2)*10"]
+MODES = [(True, False, None), (False, False, None), (True, True, None), (True, False, 30)]
+
+
+def typed(expression, preview, deg_mode=True, exact=False, precision=None):
+    """The preview of every prefix of `expression`."""
+    return [preview.update(expression[:i], deg_mode, None, exact, precision) for i in range(1, len(expression) + 1)]
+
+
+def fresh(namespace, expression, deg_mode=True, exact=False, precision=None):
+    return [LivePreview(namespace).update(expression[:i], deg_mode, None, exact, precision)
+            for i in range(1, len(expression) + 1)]
+
+
+def mismatches(namespace):
+    """(expression, mode) pairs where typing key by key previews differently from a fresh parse."""
+    wrong = []
+    for mode in MODES:
+        names = namespace if mode[2] is None else precise_namespace(namespace, mode[2])
+        preview = LivePreview(names)
+        for expression in CHECK_EXPRESSIONS:
+            if typed(expression, preview, *mode) != fresh(names, expression, *mode):
+                wrong.append((expression, mode))
+    return wrong
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    terms = int(argv[argv.index('--terms') + 1]) if '--terms' in argv else DEFAULT_TERMS
+    namespace = create_safe_dict()
+    expression = '+'.join(f"{i % 7 + 1}.5e-{i % 3}*sin({i % 90})" for i in range(terms))
+
+    start = time.perf_counter()
+    typed(expression, LivePreview(namespace))
+    incremental = time.perf_counter() - start
+    start = time.perf_counter()
+    fresh(namespace, expression)
+    rebuilt = time.perf_counter() - start
+    print(f"expression {len(expression):>7} chars")
+    print(f"{'preview per key':<20} {'incremental µs':>15} {'fresh µs':>10}")
+    print(f"{'':<20} {incremental / len(expression) * 1e6:>15.1f} {rebuilt / len(expression) * 1e6:>10.1f}")
+
+    if '--check' not in argv:
+        return 0
+    wrong = mismatches(namespace)
+    for expression, mode in wrong:
+        print(f"WRONG: typing {expression!r} (deg, exact, precision = {mode}) differs from a fresh parse")
+    return 1 if wrong else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,55 @@
+"""
+Root finding: bracketed Newton with automatic derivatives against plain bisection.
+
+    python benchmarks/bench_solve.py [--check]
+
+Each equation is solved over its interval with CalculatorCore.solve (DEG
+mode), which reports the roots, the iterations spent polishing them and the
+total evaluations including the grid scan. The bisection column is how many
+halvings of a grid cell it takes to reach the same tolerance. --check exits 1
+if a root is missing or wrong by more than 1e-9.
+"""
+
+import math
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from omnicalc.core import CalculatorCore
+from omnicalc.solver import DEFAULT_POINTS, EPSILON
+
+# (equation, lo, hi, expected roots)
+CASES = [
+    ("x**2-2", -10, 10, [-math.sqrt(2), math.sqrt(2)]),
+    ("tan(x)-1", -360, 360, [-315, -135, 45, 225]),
+    ("cos(x)-x/100", -200, 200, [55.967012347134]),
+    ("exp(x/10)-3*x", 0, 100, [0.345035224838, 50.132897100189]),
+    ("log_y(2, x)-3", 0.5, 20, [8]),
+    ("y_root_x(x, 3)+x-5", -50, 50, [3.484019772307]),
+    ("(x-1.2345)**2", -10, 10, [1.2345]),
+    ("factorial(3)*x-1", -1, 1, [1 / 6]),
+]
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    core = CalculatorCore()
+    wrong = False
+    print(f"{'equation':<22} {'roots':>5} {'iterations':>10} {'bisection':>10} {'evaluations':>12} {'ms':>7}")
+    for expression, lo, hi, expected in CASES:
+        core.solve(expression, lo, hi)  # compile once
+        report = core.solve(expression, lo, hi)
+        found = [root.x for root in report.roots]
+        cell = (hi - lo) / DEFAULT_POINTS
+        bisection = len(found) * math.ceil(math.log2(cell / (4 * EPSILON * max(abs(lo), abs(hi)))))
+        ok = len(found) == len(expected) and all(abs(x - want) <= 1e-9 * max(1.0, abs(want))
+                                                 for x, want in zip(found, expected))
+        wrong = wrong or not ok
+        print(f"{expression:<22} {len(found):>5} {report.iterations:>10} {bisection:>10} "
+              f"{report.evaluations:>12} {report.seconds * 1e3:>7.2f}{'' if ok else '  WRONG'}")
+    return 1 if wrong and '--check' in argv else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
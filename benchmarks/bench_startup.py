@@ -0,0 +1,122 @@
+"""
+Startup cost: module import time and time to first paint.
+
+    python benchmarks/bench_startup.py [--check]
+
+Import times come from `python -X importtime` (cumulative microseconds of the
+top-level import, bytecode cache warmed first). Time to first paint is
+measured from spawning a fresh interpreter until the main display label of
+the window receives its first <Expose>; it is skipped when no display is
+available. With --check the exit status is 1 if any measurement is over its
+budget, so the numbers can be tracked in CI.
+"""
+
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Budgets in milliseconds.
+BUDGETS = {
+    'import omnicalc.core': 30,
+    'import omnicalc.cli': 35,
+    'import CALCNEW': 60,
+    'first paint CALCNEW.py': 500,
+    'first paint calcv2.0.py': 500,
+}
+
+PAINT_SCRIPT = r"""
+import importlib.util, sys, time
+sys.path.insert(0, {root!r})
+spec = importlib.util.spec_from_file_location('app', {path!r})
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+root = module.tk.Tk()
+if hasattr(module, 'CalculatorCore') and {path!r}.endswith('CALCNEW.py'):
+    app = module.ScientificCalculator(root, module.CalculatorCore())
+else:
+    app = module.ScientificCalculator(root)
+
+def painted(event):
+    print(time.time(), flush=True)
+    root.after(0, root.destroy)
+
+app.label.bind('<Expose>', painted)
+root.after(10000, root.destroy)
+root.mainloop()
+"""
+
+
+def _env():
+    env = dict(os.environ)
+    env.pop('PYTHONDONTWRITEBYTECODE', None)  # measure with the bytecode cache, as users run it
+    env['PYTHONPATH'] = ROOT + os.pathsep + env.get('PYTHONPATH', '')
+    return env
+
+
+def import_time_ms(module, repeat=5):
+    """Best cumulative import time of `module` in a fresh interpreter."""
+    command = [sys.executable, '-X', 'importtime', '-c', f'import {module}']
+    subprocess.run(command, cwd=ROOT, env=_env(), capture_output=True)  # warm the bytecode cache
+    best = None
+    for _ in range(repeat):
+        stderr = subprocess.run(command, cwd=ROOT, env=_env(), capture_output=True, text=True).stderr
+        for line in stderr.splitlines():
+            parts = [part.strip() for part in line.split('|')]
+            if len(parts) == 3 and parts[2] == module:
+                micros = int(parts[1])
+                best = micros if best is None else min(best, micros)
+    return best / 1000 if best is not None else None
+
+
+def imports_tkinter(module):
+    code = f"import sys, {module}; print('tkinter' in sys.modules)"
+    result = subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=_env(), capture_output=True, text=True)
+    return result.stdout.strip() == 'True'
+
+
+def first_paint_ms(path, repeat=3):
+    """Best wall-clock time from spawning the interpreter to the first paint, or None without a display."""
+    script = PAINT_SCRIPT.format(root=ROOT, path=os.path.join(ROOT, path))
+    best = None
+    for _ in range(repeat):
+        start = time.time()
+        result = subprocess.run([sys.executable, '-c', script], cwd=ROOT, env=_env(),
+                                capture_output=True, text=True, timeout=30)
+        if result.returncode != 0 or not result.stdout.strip():
+            return None
+        elapsed = (float(result.stdout.split()[0]) - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    results = {}
+    for module in ('omnicalc.core', 'omnicalc.cli', 'CALCNEW'):
+        results[f'import {module}'] = import_time_ms(module)
+    for path in ('CALCNEW.py', 'calcv2.0.py'):
+        results[f'first paint {path}'] = first_paint_ms(path)
+
+    over = False
+    print(f"{'measurement':<26} {'ms':>8} {'budget':>8}")
+    for name, value in results.items():
+        budget = BUDGETS[name]
+        if value is None:
+            print(f"{name:<26} {'n/a':>8} {budget:>8}")
+            continue
+        status = '' if value <= budget else '  OVER BUDGET'
+        over = over or bool(status)
+        print(f"{name:<26} {value:>8.1f} {budget:>8}{status}")
+
+    for module in ('omnicalc.core', 'omnicalc.cli'):
+        if imports_tkinter(module):
+            print(f"{module} imports tkinter")
+            over = True
+    return 1 if over and '--check' in argv else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,252 @@
+"""
+Headless regression suite for the evaluation, formatting and input hot paths.
+
+    python benchmarks/bench_suite.py [-o results.json] [--baseline old.json]
+                                     [--tolerance 0.25] [-k NAME] [--quick]
+
+Every case reports the best time per operation over several repeats (each
+repeat is sized by `timeit.Timer.autorange`). With --output the results are
+written as JSON together with the interpreter and platform they came from;
+with --baseline each case is compared against an earlier JSON file and the
+exit status is 1 if any case got slower by more than --tolerance.
+
+Corpora are deterministic: short keypad expressions, ~1000-token
+expressions and trig-heavy expressions in DEG mode. The input cases drive
+calcv2.0.py's `add_to_expression` and `negate_last_input` on a calculator
+built without a window (label updates are skipped).
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import random
+import sys
+import time
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from omnicalc.core import CalculatorCore
+from omnicalc.cost import Approximation
+
+# --- Corpora ---
+
+KEYPAD = ["12+7*3", "sin(30)+cos(60)", "sqrt(2)/2", "2**10-1", "factorial(10)/3", "log(e**2)",
+          "(1+2)*(3+4)*(5+6", "tan(45)*100/7", "exp(1)-e", "asin(0.5)+acos(0.5)", "ANS*2", "pi*3**2"]
+TRIG_DEG = ["sin(cos(tan(30)))*asin(0.5)+acos(sin(45))",
+            "tan(atan(1))+sin(30)**2+cos(30)**2",
+            "sinh(sin(60))-cosh(cos(60))+tanh(tan(15))",
+            "asin(sin(80))+acos(cos(80))+atan(tan(80))",
+            "sin(1)*sin(2)*sin(3)*sin(4)*sin(5)*sin(6)*sin(7)*sin(8)"]
+FORMAT_VALUES = [7, 0.1 + 0.2, 3.0, -2.5e-12, 1e22, 2 ** 200, 1 / 3, Approximation(1, 369693099.63)]
+KEYSTROKES = ["7", "pi", "(", "3", "+", "*", "sin(", "4", "5", ")", ")", "e", "/", "-", "2", "**", "/",
+              "(", "1", "-", "3", ")", "pi", "log_y(", "2", ",", "8", ")"]
+
+
+def long_expression(tokens, seed=0):
+    """A valid expression of roughly `tokens` tokens mixing numbers, operators and calls."""
+    rng = random.Random(seed)
+    parts = [str(rng.randint(1, 99))]
+    count = 1
+    while count < tokens:
+        op = rng.choice(['+', '-', '*', '/', '+', '-'])
+        kind = rng.random()
+        if kind < 0.2:
+            operand = f"{rng.choice(['sin', 'cos', 'sqrt', 'log'])}({rng.randint(1, 89)})"
+            count += 4
+        elif kind < 0.35:
+            operand = f"({rng.randint(1, 99)}{rng.choice('+-*')}{rng.randint(1, 99)})"
+            count += 5
+        elif kind < 0.45:
+            operand = f"{rng.randint(1, 9)}**{rng.randint(1, 3)}"
+            count += 3
+        else:
+            operand = f"{rng.randint(1, 999)}.{rng.randint(0, 99)}"
+            count += 1
+        parts.append(op + operand)
+        count += 1
+    return "".join(parts)
+
+
+def nested_expression(depth):
+    return "(" * depth + "1+2" + "*(3-4)" * 3 + ")" * depth
+
+
+# --- Cases ---
+
+def load_calcv2():
+    spec = importlib.util.spec_from_file_location("calcv2", os.path.join(ROOT, "calcv2.0.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def headless_calcv2(module):
+    """A calcv2 ScientificCalculator with only the state the input handlers use."""
+    calc = module.ScientificCalculator.__new__(module.ScientificCalculator)
+    calc.core = CalculatorCore()
+    calc.buffer = module.ExpressionBuffer()
+    calc._update_labels = lambda: None
+    return calc
+
+
+def evaluate_case(corpus, deg_mode=True, cached=True):
+    core = CalculatorCore()
+    core.is_deg_mode = deg_mode
+
+    def run():
+        for expr in corpus:
+            if not cached:
+                core.expression_cache.clear()
+            core.expression = expr
+            core.evaluate()
+    return run, len(corpus)
+
+
+def preprocess_case(corpus, deg_mode=True):
+    core = CalculatorCore()
+    core.is_deg_mode = deg_mode
+    return (lambda: [core._preprocess_expression(expr) for expr in corpus]), len(corpus)
+
+
+def display_case(corpus, deg_mode=True):
+    core = CalculatorCore()
+    core.is_deg_mode = deg_mode
+    return (lambda: [core._format_for_display(expr) for expr in corpus]), len(corpus)
+
+
+def format_case():
+    core = CalculatorCore()
+    return (lambda: [core._format_result(value) for value in FORMAT_VALUES]), len(FORMAT_VALUES)
+
+
+def typing_case(calc, repeat):
+    keys = KEYSTROKES * repeat
+
+    def run():
+        calc.expression = ""
+        for key in keys:
+            calc.add_to_expression(key)
+    return run, len(keys)
+
+
+def negate_case(calc, base):
+    # The expression is tokenized once, as when it was typed; each run presses +/- twice (on, then off again).
+    calc.expression = base
+
+    def run():
+        calc.negate_last_input()
+        calc.negate_last_input()
+    return run, 2
+
+
+def build_cases(names=None):
+    long_corpus = [long_expression(1000, seed) for seed in range(3)]
+    cases = {
+        'evaluate/keypad': lambda: evaluate_case(KEYPAD),
+        'evaluate/keypad-uncached': lambda: evaluate_case(KEYPAD, cached=False),
+        'evaluate/long-1000-uncached': lambda: evaluate_case(long_corpus, cached=False),
+        'evaluate/trig-deg-uncached': lambda: evaluate_case(TRIG_DEG, cached=False),
+        'preprocess/keypad': lambda: preprocess_case(KEYPAD),
+        'preprocess/long-1000': lambda: preprocess_case(long_corpus),
+        'preprocess/trig-deg': lambda: preprocess_case(TRIG_DEG),
+        'format_for_display/keypad': lambda: display_case(KEYPAD),
+        'format_for_display/long-1000': lambda: display_case(long_corpus),
+        'format_result/mixed': format_case,
+    }
+    try:
+        calcv2 = load_calcv2()
+    except ImportError:  # tkinter missing: only the input cases need it
+        calcv2 = None
+    if calcv2 is not None:
+        cases.update({
+            'add_to_expression/keypad': lambda: typing_case(headless_calcv2(calcv2), 1),
+            'add_to_expression/long': lambda: typing_case(headless_calcv2(calcv2), 40),
+            'negate_last_input/number-depth-100': lambda: negate_case(
+                headless_calcv2(calcv2), "(" * 100 + "1+23"),
+            'negate_last_input/paren-depth-100': lambda: negate_case(headless_calcv2(calcv2), nested_expression(100)),
+            'negate_last_input/paren-depth-1000': lambda: negate_case(headless_calcv2(calcv2), nested_expression(1000)),
+        })
+    if names:
+        cases = {name: build for name, build in cases.items() if any(part in name for part in names)}
+    return cases
+
+
+# --- Running and comparing ---
+
+def measure(build, repeat):
+    func, ops = build()
+    func()  # warm caches and lazily built tables
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    times = sorted(t / number / ops for t in timer.repeat(repeat=repeat, number=number))
+    return {'us_per_op': times[0] * 1e6, 'median_us_per_op': times[len(times) // 2] * 1e6,
+            'ops': ops, 'number': number, 'repeat': repeat}
+
+
+def compare(results, baseline, tolerance):
+    """Returns the names of cases slower than the baseline by more than `tolerance`."""
+    regressions = []
+    for name, result in results.items():
+        old = baseline.get(name)
+        if old is None:
+            continue
+        ratio = result['us_per_op'] / old['us_per_op']
+        result['baseline_us_per_op'] = old['us_per_op']
+        result['ratio'] = ratio
+        if ratio > 1 + tolerance:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('-o', '--output', help="write results as JSON to this file ('-' for stdout)")
+    parser.add_argument('--baseline', help="JSON file from an earlier run to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="allowed slowdown relative to the baseline (default: 0.25 = 25%%)")
+    parser.add_argument('-k', dest='names', action='append', help="only run cases whose name contains NAME")
+    parser.add_argument('--quick', action='store_true', help="fewer repeats (noisier)")
+    args = parser.parse_args(argv)
+
+    repeat = 3 if args.quick else 7
+    results = {}
+    for name, build in build_cases(args.names).items():
+        results[name] = measure(build, repeat)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as handle:
+            regressions = compare(results, json.load(handle)['results'], args.tolerance)
+
+    report = sys.stderr if args.output == '-' else sys.stdout
+    print(f"{'case':<38} {'us/op':>11} {'baseline':>11} {'change':>8}", file=report)
+    for name, result in results.items():
+        line = f"{name:<38} {result['us_per_op']:>11.2f}"
+        if 'ratio' in result:
+            flag = "  REGRESSION" if name in regressions else ""
+            line += f" {result['baseline_us_per_op']:>11.2f} {(result['ratio'] - 1) * 100:>+7.1f}%{flag}"
+        print(line, file=report)
+
+    if args.output:
+        document = {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'results': results,
+        }
+        text = json.dumps(document, indent=2, sort_keys=True) + "\n"
+        if args.output == '-':
+            sys.stdout.write(text)
+        else:
+            with open(args.output, 'w', encoding='utf-8') as handle:
+                handle.write(text)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
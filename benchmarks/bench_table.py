@@ -0,0 +1,62 @@
+"""
+Table mode: streaming a large value table to CSV and paging through it.
+
+    python benchmarks/bench_table.py [--rows N] [--check]
+
+Streams N rows (default 1,000,000) of each expression to os.devnull with
+write_csv and reports rows per second, then the peak memory traced while
+streaming TRACED_ROWS rows (tracing is too slow for the timed run), then the
+time to fetch one screenful of rows from the middle of the table, as the
+table panel does when it is scrolled. --check exits 1 if the peak memory
+exceeds PEAK_LIMIT_MB, i.e. if rows are being held in memory.
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from omnicalc.core import CalculatorCore
+from omnicalc.table import Table, write_csv
+
+EXPRESSIONS = ["sin(x)", "x**2/3-1", "sqrt(x)*log(x+1)"]
+SCREEN_ROWS = 30
+TRACED_ROWS = 100000
+PEAK_LIMIT_MB = 8
+
+
+def stream(table):
+    with open(os.devnull, 'w', encoding='utf-8') as devnull:
+        return write_csv(table.rows(), devnull, table.header)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--check', action='store_true')
+    args = parser.parse_args(argv)
+    core = CalculatorCore()
+    failed = False
+    print(f"{'expression':<20} {'rows/s':>10} {'peak MB':>8} {'page ms':>8}")
+    for expression in EXPRESSIONS:
+        table = Table(core, [expression], 0, args.rows - 1, 1)
+        start = time.perf_counter()
+        rows = stream(table)
+        elapsed = time.perf_counter() - start
+        tracemalloc.start()
+        stream(Table(core, [expression], 0, TRACED_ROWS - 1, 1))
+        peak = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+        start = time.perf_counter()
+        page = list(table.rows(args.rows // 2, args.rows // 2 + SCREEN_ROWS))
+        page_time = time.perf_counter() - start
+        failed = failed or rows != args.rows or len(page) != SCREEN_ROWS or peak > PEAK_LIMIT_MB
+        print(f"{expression:<20} {rows / elapsed:>10.0f} {peak:>8.1f} {page_time * 1e3:>8.2f}")
+    return 1 if failed and args.check else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,82 @@
+"""
+CalculatorCore.evaluate_many: one vectorized NumPy pass against the per-value fallback.
+
+    python benchmarks/bench_vectorize.py [--check]
+
+Times each expression over a million values of x with NumPy (compile cached,
+so this is the evaluation alone) and over 10000 values with the pure-Python
+fallback, reported per million. --check also evaluates PARITY_EXPRESSIONS
+over a few float points on both paths (poles, domain edges, negative roots)
+and exits 1 if a vectorized pass takes 100 ms or more or the two paths disagree.
+Without NumPy only the fallback is timed.
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from omnicalc.core import CalculatorCore
+from omnicalc.vectorize import evaluate_scalar, numpy_module, VARIABLE
+
+POINTS = 10 ** 6
+FALLBACK_POINTS = 10 ** 4
+TARGET_SECONDS = 0.1
+EXPRESSIONS = ["x**2+3*x-7", "sin(x)*cos(x)+x/3", "sqrt(abs(x))+log10(abs(x)+1)",
+               "asin(x/200)+cbrt(x)", "y_root_x(x, 3)*log_y(2, abs(x)+2)"]
+PARITY_EXPRESSIONS = ["cbrt(x)", "1/x", "x**-1", "log(x)", "log10(x)", "atanh(x)", "acosh(x)", "sqrt(x)",
+                      "asin(x)", "x**0.5", "y_root_x(x, 3)", "log_y(2, x)", "tand(x*90)",
+                      "(-8)**(1/3)+x", "x*10**400", "1/0+x"]
+PARITY_POINTS = [-8.0, -2.0, -1.0, -0.5, 0.0, 0.5, 1.0, 2.0, 3.0, 27.0]
+
+
+def timed(func, *args):
+    best = None
+    for _ in range(3):
+        start = time.perf_counter()
+        func(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def parity(core, np):
+    """Expressions whose vectorized values differ from the pure-Python fallback's."""
+    xs = np.array(PARITY_POINTS)
+    wrong = []
+    for expression in PARITY_EXPRESSIONS:
+        compiled = core._compile_uncached(expression, core.VARIABLES + (VARIABLE,))
+        expected = np.array(evaluate_scalar(compiled, PARITY_POINTS, {'ANS': 0.0}), dtype=float)
+        if not np.allclose(core.evaluate_many(expression, xs), expected, equal_nan=True):
+            wrong.append(expression)
+    return wrong
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    np = numpy_module()
+    core = CalculatorCore()
+    scalar_xs = [-100 + 200 * i / FALLBACK_POINTS for i in range(FALLBACK_POINTS)]
+    xs = np.linspace(-100, 100, POINTS) if np is not None else None
+    failed = False
+    print(f"{'expression':<36} {'numpy ms':>9} {'python ms':>10} {'speedup':>8}   (per {POINTS:,} points)")
+    for expression in EXPRESSIONS:
+        compiled = core._compile_uncached(expression, core.VARIABLES + (VARIABLE,))
+        python = timed(evaluate_scalar, compiled, scalar_xs, {'ANS': 0.0}) * POINTS / FALLBACK_POINTS
+        if np is None:
+            print(f"{expression:<36} {'n/a':>9} {python * 1e3:>10.0f}")
+            continue
+        core.evaluate_many(expression, xs[:10])  # compile once
+        vectorized = timed(core.evaluate_many, expression, xs)
+        failed = failed or vectorized >= TARGET_SECONDS
+        print(f"{expression:<36} {vectorized * 1e3:>9.1f} {python * 1e3:>10.0f} {python / vectorized:>7.0f}x")
+    if np is not None and '--check' in argv:
+        for expression in parity(core, np):
+            print(f"WRONG: {expression} differs between the NumPy and pure-Python paths")
+            failed = True
+    return 1 if failed and '--check' in argv else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
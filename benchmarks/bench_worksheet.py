@@ -0,0 +1,73 @@
+"""
+Worksheet recomputation: one edit against recomputing every cell.
+
+    python benchmarks/bench_worksheet.py [--cells N] [--check]
+
+The worksheet has a global `g`, CHAINS parameters `p0`, `p1`, ... and N cells
+(default 10000) in CHAINS chains, each cell reading the one before it and the
+first reading its chain's parameter and `g`. An edit of a chain's last cell,
+of a parameter and of `g` is timed against recompute_all() (compiling and
+evaluating everything). --check exits 1 if an edited worksheet disagrees
+with one computed from scratch, or if a parameter edit takes longer than
+EDIT_LIMIT_MS.
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from omnicalc.core import CalculatorCore
+from omnicalc.worksheet import Worksheet
+
+DEFAULT_CELLS = 10000
+CHAINS = 100
+EDIT_LIMIT_MS = 10.0
+
+
+def definitions(cells, g=1):
+    length = cells // CHAINS
+    lines = [f"g = {g}", f"f(t) = t/(1+t**2)"]
+    for chain in range(CHAINS):
+        lines.append(f"p{chain} = {chain}")
+        lines.append(f"c{chain}_0 = p{chain}*g + f(g)")
+        lines.extend(f"c{chain}_{k} = c{chain}_{k - 1}*0.999 + sin({k})" for k in range(1, length))
+    return lines
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    cells = int(argv[argv.index('--cells') + 1]) if '--cells' in argv else DEFAULT_CELLS
+    last = cells // CHAINS - 1
+    sheet = Worksheet(CalculatorCore())
+    start = time.perf_counter()
+    sheet.load(definitions(cells))
+    print(f"load      {len(sheet):>6} cells {(time.perf_counter() - start) * 1e3:>9.1f} ms")
+    start = time.perf_counter()
+    sheet.recompute_all()
+    print(f"{'recompute all':<28} {len(sheet):>6} cells {(time.perf_counter() - start) * 1e3:>9.2f} ms")
+
+    wrong = False
+    for label, line in [("edit a last cell", f"c7_{last} = c7_{last - 1} + 1"),
+                        ("edit a parameter", "p7 = 70"),
+                        ("edit g (every chain)", "g = 2")]:
+        start = time.perf_counter()
+        recomputed = sheet.define(line)
+        ms = (time.perf_counter() - start) * 1e3
+        print(f"{label:<28} {len(recomputed):>6} cells {ms:>9.2f} ms")
+        if label == "edit a parameter" and ms > EDIT_LIMIT_MS:
+            wrong = True
+
+    fresh = Worksheet(CalculatorCore())
+    lines = definitions(cells, g=2)
+    lines += ["p7 = 70", f"c7_{last} = c7_{last - 1} + 1"]
+    fresh.load(lines)
+    if any(fresh.value(name) != sheet.value(name) for name in fresh if not fresh.cells[name].is_function):
+        print("WRONG: the edited worksheet differs from one computed from scratch")
+        wrong = True
+    return 1 if wrong and '--check' in argv else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
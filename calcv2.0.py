@@ -2,8 +2,14 @@
 # Version: 2.1.1 - Fixed SyntaxError in _add_button function
 
 import tkinter as tk
-import math
 import re
+from omnicalc.core import CalculatorCore
+from omnicalc.cost import Approximation, ResultTooLarge
+from omnicalc.exact import Rational, format_exact
+from omnicalc.bigint import is_huge, is_huge_fraction
+from omnicalc.background import BackgroundEvaluator
+from omnicalc.buffer import ExpressionBuffer, OPERATOR
+from omnicalc.metrics import RedrawScheduler, dump as dump_metrics
 
 # --- Constants for Styling ---
 # A modern dark theme with cyan and blue-gray accents.
@@ -31,6 +37,10 @@ class Style:
     MODE_FONT = ("Arial", 12, "bold")
     AUTHOR_FONT = ("Arial", 9, "italic")
     DISPLAY_LIMIT = 35 # Max characters in the smaller total/history display
+    WORKER_POLL_MS = 16 # How often a pending background result is checked (~1 frame)
+    PLOT_WIDTH = 400 # Extra window width while the graph panel is shown
+    TABLE_WIDTH = 300 # ... and while the table panel is shown
+    HISTORY_WIDTH = 260 # ... and while the history panel is shown
 
 class ScientificCalculator:
     """
@@ -39,7 +49,10 @@ class ScientificCalculator:
     Version 2.1.1: Fixed the SyntaxError in the _add_button helper method.
     """
 
-    def __init__(self, master):
+    # Function buttons that start a call (used for implied multiplication)
+    FUNCTIONS = ['sin(', 'cos(', 'tan(', 'log10(', 'log(', 'exp(', 'factorial(', 'sqrt(', 'cbrt(', 'pow(', 'asin(', 'acos(', 'atan(', 'sinh(', 'cosh(', 'tanh(', 'asinh(', 'acosh(', 'atanh(', 'log_y(', 'y_root_x(', 'integrate(']
+
+    def __init__(self, master, cache_size=256, evaluator=None):
         """Initialize the calculator."""
         self.master = master
         master.title("Engineering Scientific Calculator (v2.1.1)")
@@ -47,73 +60,92 @@ class ScientificCalculator:
         master.configure(bg=Style.BG_COLOR)
         master.minsize(400, 700)
 
+        # --- Calculation Engine (tkinter-free, shared with CALCNEW.py) ---
+        # Parsing, the function table, the expression cache and the cost guard live here.
+        self.core = CalculatorCore(cache_size, evaluator)
+
         # --- State Variables ---
-        self.expression = ""
-        self.is_deg_mode = True
+        # Tokens around a cursor; `expression` is its text (edits at the cursor are O(1))
+        self.buffer = ExpressionBuffer()
         self.is_second_mode = False
         self.memory = 0.0 # Use float for memory
-        self.last_answer = 0.0
         self.toggleable_buttons = []
-        self.is_last_input_operator = False
 
-        # --- Safe Evaluation & Display Dictionaries ---
-        self.safe_dict = self._create_safe_dict()
+        # --- Display Dictionaries ---
+        # '=' is evaluated in a worker process so heavy math never freezes the window
+        self.background = BackgroundEvaluator()
+        self._pending_expression = None
+        self._digits_job = None # Ctrl+D: writing out a huge ANS in the worker
+        self._poll_job = None
+        # Label updates are batched into one idle pass per event-loop turn
+        self.redraw = RedrawScheduler(master, self._redraw_labels)
+        self._shown_state = None
+        # Graph of the expression in x beside the keypad (created on first Ctrl+G)
+        self.plot_panel = None
+        self._plot_visible = False
+        # Table of the expression over a range of x (created on first Ctrl+T)
+        self.table_panel = None
+        self._table_visible = False
+        # Past results read from disk as they scroll into view (created on first Ctrl+H)
+        self.history_panel = None
+        self._history_visible = False
         self.DISPLAY_MAP = {'**': '^', '*': '×', '/': '÷', 'sqrt(': '√(', 'cbrt(': '³√(', 'log_y(': 'log(', 'y_root_x(': 'ⁿ√'}
-        self.FUNCTIONS = ['sin(', 'cos(', 'tan(', 'log10(', 'log(', 'exp(', 'factorial(', 'sqrt(', 'cbrt(', 'pow(', 'asin(', 'acos(', 'atan(', 'sinh(', 'cosh(', 'tanh(', 'asinh(', 'acosh(', 'atanh(', 'log_y(', 'y_root_x(']
+        self._token_display = dict(self.DISPLAY_MAP, pi='π') # the main display maps whole tokens
         
         # --- UI Setup ---
         self.display_frame = self._create_display_frame()
         self.buttons_frame = self._create_buttons_frame()
-        self.total_label, self.label, self.mode_label = self._create_display_labels()
+        self.total_label, self.label, self.mode_label, self.exact_label, self.preview_label = \
+            self._create_display_labels()
         self._create_author_label()
         self._configure_grid_weights()
         self.button_definitions = self._get_button_definitions()
+        self._hover_colors = {}
         self._create_buttons()
         self._bind_keys()
-
-    def _log_base_y(self, y, x):
-        """Calculates log base y of x."""
-        try:
-            return math.log(x, y)
-        except ValueError:
-            raise ValueError("Invalid input for log base y: y must be positive and not 1, x must be positive.")
-    
-    def _xth_root(self, y, x):
-        """Calculates the x-th root of y (y^(1/x))."""
-        if x == 0:
-            raise ZeroDivisionError("Cannot take the 0-th root.")
-        if y < 0 and x % 2 == 0:
-            raise ValueError("Cannot take an even root of a negative number.")
-        # Need to handle negative base with odd exponent for real roots
-        if y < 0 and x % 2 != 0:
-            return -((-y)**(1/x))
-        return y**(1/x)
-
-    def _create_safe_dict(self):
-        """Creates the dictionary of allowed functions for safe evaluation, including new functions."""
-        safe_dict = {
-            'pi': math.pi, 'e': math.e, 'sqrt': math.sqrt, 'cbrt': lambda x: x**(1/3),
-            'log10': math.log10, 'exp': math.exp, 'abs': abs,
-            'factorial': math.factorial, 'pow': pow, 
-            'log': math.log, # Natural log (ln)
-            'log_y': self._log_base_y, # New function: log base y of x (log(x, y))
-            'y_root_x': self._xth_root, # New function: x-th root of y (y**(1/x))
-        }
-
-        # Add trig and inverse trig functions (default is RAD mode versions)
-        for func in ['sin', 'cos', 'tan', 'asin', 'acos', 'atan', 'sinh', 'cosh', 'tanh', 'asinh', 'acosh', 'atanh']:
-            safe_dict[func] = getattr(math, func)
-        
-        # Add DEG mode versions
-        safe_dict.update({
-            'sind': lambda x: math.sin(math.radians(x)),
-            'cosd': lambda x: math.cos(math.radians(x)),
-            'tand': lambda x: math.tan(math.radians(x)),
-            'asind': lambda x: math.degrees(math.asin(x)),
-            'acosd': lambda x: math.degrees(math.acos(x)),
-            'atand': lambda x: math.degrees(math.atan(x)),
-        })
-        return safe_dict
+        # Hover effects are not needed for the first paint; attach them once Tk is idle
+        master.after_idle(self._bind_hover_effects)
+        master.protocol("WM_DELETE_WINDOW", self._on_close)
+        master.after(200, self.background.start) # Warm the worker once the window is up
+        master.after(200, self.core.open_history) # Maps the history index; nothing is read up front
+
+    @property
+    def expression(self):
+        return self.buffer.text
+
+    @expression.setter
+    def expression(self, text):
+        self.buffer.set_text(text)
+
+    @property
+    def is_last_input_operator(self):
+        """True when the token before the cursor is a binary operator ('-' may be a sign)."""
+        last = self.buffer.last()
+        return last is not None and last.kind == OPERATOR and last.text != '-'
+
+    @property
+    def last_answer(self):
+        return self.core.last_answer
+
+    @last_answer.setter
+    def last_answer(self, value):
+        self.core.last_answer = value
+
+    @property
+    def is_deg_mode(self):
+        return self.core.is_deg_mode
+
+    @is_deg_mode.setter
+    def is_deg_mode(self, value):
+        self.core.is_deg_mode = value
+
+    @property
+    def is_exact_mode(self):
+        return self.core.is_exact_mode
+
+    @is_exact_mode.setter
+    def is_exact_mode(self, value):
+        self.core.is_exact_mode = value
 
     def _configure_grid_weights(self):
         self.master.rowconfigure(0, weight=2)
@@ -152,7 +184,20 @@ class ScientificCalculator:
                               bg=Style.DISPLAY_BG_COLOR, fg=Style.OPERATOR_BG_COLOR, 
                               padx=10, font=Style.MODE_FONT)
         mode_label.pack(expand=True, fill='x', side='left')
-        return total_label, label, mode_label
+
+        # Number mode (float, exact fractions, N-digit decimals), next to the DEG/RAD indicator (click or Ctrl+E)
+        exact_label = tk.Label(self.display_frame, text="FLOAT", anchor=tk.W, cursor="hand2",
+                               bg=Style.DISPLAY_BG_COLOR, fg=Style.LABEL_COLOR,
+                               padx=10, font=Style.MODE_FONT)
+        exact_label.pack(side='left')
+        exact_label.bind('<Button-1>', lambda event: self.cycle_number_mode())
+
+        # Live result preview label
+        preview_label = tk.Label(self.display_frame, text="", anchor=tk.E,
+                                 bg=Style.DISPLAY_BG_COLOR, fg=Style.LABEL_COLOR,
+                                 padx=10, font=Style.MODE_FONT)
+        preview_label.pack(fill='x', side='right')
+        return total_label, label, mode_label, exact_label, preview_label
         
     def _create_author_label(self):
         author_label = tk.Label(self.display_frame, text="Ankit Singh (ankitscse27) v2.1.1", anchor=tk.E,
@@ -241,18 +286,8 @@ class ScientificCalculator:
                     columnspan=b_info.get('colspan', 1),
                     sticky="nsew", padx=2, pady=2)
         
-        # Hover logic: respect the active background of the '2nd' button
-        def on_enter(event, h_color=hover_color):
-            if event.widget['bg'] != Style.SECOND_ACTIVE_BG:
-                event.widget.config(bg=h_color)
-        
-        def on_leave(event, b_color=bg_color):
-            # Only reset if the button is not the active '2nd' button
-            if event.widget['bg'] != Style.SECOND_ACTIVE_BG:
-                event.widget.config(bg=b_color)
-
-        button.bind("<Enter>", on_enter)
-        button.bind("<Leave>", on_leave)
+        # Hover colors are applied by class-wide bindings (see _bind_hover_effects)
+        self._hover_colors[button] = (bg_color, hover_color)
         
         if is_toggleable:
             self.toggleable_buttons.append((button, b_info))
@@ -261,6 +296,23 @@ class ScientificCalculator:
             setattr(self, f"btn_{b_info['id']}", button)
 
 
+    def _bind_hover_effects(self):
+        """One class binding for every button instead of two bindings per button."""
+        self.master.bind_class("Button", "<Enter>", self._on_button_enter, add="+")
+        self.master.bind_class("Button", "<Leave>", self._on_button_leave, add="+")
+
+    def _on_button_enter(self, event):
+        # Hover logic: respect the active background of the '2nd' button
+        colors = self._hover_colors.get(event.widget)
+        if colors and event.widget['bg'] != Style.SECOND_ACTIVE_BG:
+            event.widget.config(bg=colors[1])
+
+    def _on_button_leave(self, event):
+        # Only reset if the button is not the active '2nd' button
+        colors = self._hover_colors.get(event.widget)
+        if colors and event.widget['bg'] != Style.SECOND_ACTIVE_BG:
+            event.widget.config(bg=colors[0])
+
     def _get_button_colors(self, btn_type):
         """Returns the background and hover color based on button type."""
         if btn_type == 'op': return Style.OPERATOR_BG_COLOR, Style.OPERATOR_HOVER_COLOR
@@ -274,18 +326,34 @@ class ScientificCalculator:
         self.master.bind("<Return>", lambda event: self.evaluate())
         self.master.bind("<BackSpace>", lambda event: self.backspace())
         self.master.bind("<Escape>", lambda event: self.clear())
+        self.master.bind("<Control-e>", lambda event: self.cycle_number_mode())
+        self.master.bind("<Control-g>", lambda event: self.toggle_plot())
+        self.master.bind("<Control-r>", lambda event: self.solve())
+        self.master.bind("<Control-i>", lambda event: self.add_to_expression('integrate('))
+        self.master.bind("<Control-t>", lambda event: self.toggle_table())
+        self.master.bind("<Control-d>", lambda event: self.copy_digits())
+        self.master.bind("<Control-h>", lambda event: self.toggle_history())
+        self.master.bind("<Up>", lambda event: self.browse_history(True))
+        self.master.bind("<Down>", lambda event: self.browse_history(False))
+        self.master.bind("<Left>", lambda event: self.move_cursor(self.buffer.move_left))
+        self.master.bind("<Right>", lambda event: self.move_cursor(self.buffer.move_right))
+        self.master.bind("<Home>", lambda event: self.move_cursor(self.buffer.home))
+        self.master.bind("<End>", lambda event: self.move_cursor(self.buffer.end))
         for key in "1234567890.+-/()":
             self.master.bind(key, lambda event, digit=key: self.add_to_expression(digit))
         self.master.bind("*", lambda event: self.add_to_expression('*'))
         self.master.bind("p", lambda event: self.add_to_expression('pi'))
         self.master.bind("E", lambda event: self.add_to_expression('e'))
+        self.master.bind("x", lambda event: self.add_to_expression('x'))
+        self.master.bind(",", lambda event: self.add_to_expression(','))
     
     def add_to_expression(self, value):
         """
-        Append a value to the current expression.
+        Insert a value into the current expression at the cursor.
         Includes logic for implied multiplication and operator sequencing.
         """
-        if self.expression == "Error":
+        self.core.stop_browsing_history()
+        if self._shows_error():
             self.expression = ""
         
         operators = ('+', '-', '*', '/', '**', '%')
@@ -298,125 +366,175 @@ class ScientificCalculator:
         
         # 1. Implied Multiplication (e.g., 2pi, 3(4+5), e(1), 5sin() )
         requires_multiplication = False
-        if self.expression:
-            last_char = self.expression[-1]
+        last_char = self.buffer.last_char()
+        if last_char:
             
             # Case 1: Digit/Constant followed by constant/function start/parenthesis
-            if last_char.isdigit() or last_char in 'pi e':
-                if value in 'pi e (' or is_function_start:
+            if last_char.isdigit() or last_char in 'pi e x':
+                if value in 'pi e x (' or is_function_start:
                     requires_multiplication = True
             
             # Case 2: Closing parenthesis followed by digit/constant/function start
             elif last_char == ')':
-                if value.isdigit() or value in 'pi e' or is_function_start:
+                if value.isdigit() or value in 'pi e x' or is_function_start:
                     requires_multiplication = True
             
             # Case 3: Constant followed by a digit
-            if value.isdigit() and last_char in 'pi e':
+            if value.isdigit() and last_char in 'pi e x':
                 requires_multiplication = True
 
         if requires_multiplication:
-            self.expression += '*'
+            self.buffer.insert('*')
 
         # 2. Operator Sequencing (prevents '++' or '*/')
         if is_binary_operator and self.is_last_input_operator:
-            # Replace the last operator with the new one
-            # Find the last operator and replace it
-            i = len(self.expression) - 1
-            while i >= 0 and self.expression[i] in operators and self.expression[i] != '-':
-                 i -= 1
-            self.expression = self.expression[:i+1] + value
-            
+            # Replace the operator token before the cursor with the new one
+            self.buffer.replace_operator(value)
         else:
-            # Append the new value
-            self.expression += str(value)
+            # Insert the new value at the cursor
+            self.buffer.insert(str(value))
 
-        # Update operator state: only set True for binary operators
-        self.is_last_input_operator = is_binary_operator
-        
         # 3. Special handling for multi-input functions
         if value in ('log_y(', 'y_root_x('):
-              self.expression += ',' # For functions like log_y(base, value) -> log_y(y, x)
+              self.buffer.insert(',') # For functions like log_y(base, value) -> log_y(y, x)
         
         self._update_labels()
 
     def negate_last_input(self):
-        """Toggles the sign of the last number or section of the expression."""
-        if not self.expression or self.expression == "Error":
-            self.expression = "(-0"
-        
-        # Find the last number or parenthesized expression
-        match = re.search(r'([+\-*/(]|^)([e\d\.]+|pi|ANS)\s*$', self.expression)
-        
-        if match:
-            operator_or_start = match.group(1)
-            value = match.group(2)
-            
-            # Simple case: negate the entire expression if it's currently a single number
-            if re.fullmatch(r'^-?\d+\.?\d*$', self.expression):
-                if self.expression.startswith('-'):
-                    self.expression = self.expression[1:]
-                else:
-                    self.expression = '-' + self.expression
-            
-            # Complex case: wrap the last value in -()
-            else:
-                self.expression = self.expression[:match.start(2)] + '(-' + value + ')'
-                
-        elif self.expression.endswith(')'):
-             # Find the opening parenthesis for the closing one
-            count = 1
-            i = len(self.expression) - 2
-            while i >= 0:
-                if self.expression[i] == ')':
-                    count += 1
-                elif self.expression[i] == '(':
-                    count -= 1
-                if count == 0:
-                    break
-                i -= 1
-            
-            # If the expression is already negated, remove the negation: -(...) -> ...
-            if i > 1 and self.expression[i-1] == '-' and self.expression[i-2] in '+-*/(':
-                 # Remove the '(-' and the trailing ')'
-                 self.expression = self.expression[:i-1] + self.expression[i+1:-1]
-            else:
-                 # Add negation: ...(...) -> ...(-(...)
-                 self.expression = self.expression[:i] + '(-' + self.expression[i:]
-            
-        else:
-             # Just add a minus sign if possible
-             self.expression += '-'
-
+        """Toggles the sign of the number, name or parenthesized group before the cursor."""
+        if self._shows_error():
+            self.expression = ""
+        # The operand and its matching '(' come from the buffer's token links; nothing is rescanned
+        self.buffer.negate()
         self._update_labels()
 
 
     def clear(self):
-        """Clear the entire expression and reset display."""
+        """Clear the entire expression and reset display (first press only cancels a pending result)."""
+        if self.cancel_evaluation():
+            return
         self.expression = ""
         self.total_label.config(text="")
-        self.is_last_input_operator = False
+        self.core.stop_browsing_history()
         self._update_labels()
 
     def backspace(self):
-        """Remove the last character or clear an error."""
-        if self.expression == "Error":
+        """Remove the digit or token before the cursor (or its negation first), or clear an error."""
+        self.core.stop_browsing_history()
+        if self._shows_error():
             self.clear()
-        elif self.expression:
-            last_char = self.expression[-1]
-            self.expression = self.expression[:-1]
-            
-            # Reset operator state if the new last char is NOT an operator
-            operators = ('+', '*', '/', '**', '%')
-            if not self.expression or self.expression[-1] not in operators:
-                 self.is_last_input_operator = False
+        elif len(self.buffer):
+            self.buffer.delete()
             self._update_labels()
 
+    def _shows_error(self):
+        """True when the expression is the "Error" message (one token, so the text is not rendered)."""
+        last = self.buffer.last()
+        return last is not None and last.text == "Error" and len(self.buffer) == 1
+
+    def move_cursor(self, move):
+        """Move the cursor with one of the buffer's moves (move_left, move_right, home, end)."""
+        self.core.stop_browsing_history()
+        move()
+        self._update_labels()
+
     def toggle_deg_rad(self):
         """Toggle between Degree and Radian modes."""
         self.is_deg_mode = not self.is_deg_mode
         self._update_labels() # Forces indicator update
 
+    def cycle_number_mode(self):
+        """Step through floating point, exact fractions and the decimal precisions."""
+        self.core.cycle_number_mode()
+        self._update_labels()
+
+    def solve(self):
+        """Find the roots of expression = 0 in x over the graph's x range (or the default one)."""
+        from omnicalc.plotting import default_range
+        from omnicalc.solver import format_report
+        if self._plot_visible:
+            lo, hi = self.plot_panel.x_range()
+        else:
+            lo, hi = default_range(self.is_deg_mode)
+        try:
+            report = self.core.solve(self.expression, lo, hi)
+            text = format_report(report, self._format_result)
+        except Exception:
+            text = "Cannot solve"
+        self.total_label.config(text=text)
+
+    def copy_digits(self):
+        """Copy ANS with every digit to the clipboard; huge integers are written out in the worker."""
+        if not is_huge(self.last_answer):
+            self._copy(self._format_result(self.last_answer))
+            return
+        self._pending_expression = None
+        self._digits_job = self.background.submit_digits(self.last_answer)
+        self.total_label.config(text="Writing out ANS…")
+        self._schedule_poll()
+
+    def _copy(self, text):
+        self.master.clipboard_clear()
+        self.master.clipboard_append(text)
+        self.total_label.config(text=f"Copied {text}" if len(text) <= 30 else f"Copied {len(text):,} characters")
+
+    def toggle_plot(self):
+        """Show or hide the graph of the current expression (in x) beside the keypad."""
+        if self.plot_panel is None:
+            from omnicalc.plotview import PlotPanel # Only loaded when first asked for
+            self.plot_panel = PlotPanel(self.master, self.core, bg=Style.DISPLAY_BG_COLOR, fg=Style.LABEL_COLOR,
+                                        curve=Style.OPERATOR_BG_COLOR, axis=Style.SPECIAL_BG_COLOR,
+                                        font=Style.AUTHOR_FONT)
+        self._plot_visible = not self._plot_visible
+        width, height = self.master.winfo_width(), self.master.winfo_height()
+        if self._plot_visible:
+            self.plot_panel.grid(row=0, column=1, rowspan=2, sticky="nsew", padx=(0, 10), pady=10)
+            self.master.columnconfigure(1, weight=1)
+            self.master.geometry(f"{width + Style.PLOT_WIDTH}x{height}")
+            self._update_labels()
+        else:
+            self.plot_panel.grid_remove()
+            self.master.columnconfigure(1, weight=0)
+            self.master.geometry(f"{max(width - Style.PLOT_WIDTH, 400)}x{height}")
+
+    def toggle_table(self):
+        """Show or hide the table of the current expression (in x) beside the keypad."""
+        if self.table_panel is None:
+            from omnicalc.tableview import TablePanel # Only loaded when first asked for
+            self.table_panel = TablePanel(self.master, self.core, bg=Style.DISPLAY_BG_COLOR, fg=Style.LABEL_COLOR,
+                                          grid=Style.SPECIAL_BG_COLOR, font=Style.AUTHOR_FONT)
+        self._table_visible = not self._table_visible
+        width, height = self.master.winfo_width(), self.master.winfo_height()
+        if self._table_visible:
+            self.table_panel.grid(row=0, column=2, rowspan=2, sticky="nsew", padx=(0, 10), pady=10)
+            self.master.columnconfigure(2, weight=1)
+            self.master.geometry(f"{width + Style.TABLE_WIDTH}x{height}")
+            self._update_labels()
+        else:
+            self.table_panel.grid_remove()
+            self.master.columnconfigure(2, weight=0)
+            self.master.geometry(f"{max(width - Style.TABLE_WIDTH, 400)}x{height}")
+
+    def toggle_history(self):
+        """Show or hide the list of past results; clicking one enters its expression."""
+        if self.history_panel is None:
+            from omnicalc.historyview import HistoryPanel # Only loaded when first asked for
+            self.history_panel = HistoryPanel(self.master, self.core, self.add_to_expression,
+                                              bg=Style.DISPLAY_BG_COLOR, fg=Style.LABEL_COLOR,
+                                              grid=Style.SPECIAL_BG_COLOR, font=Style.AUTHOR_FONT,
+                                              format_result=self._format_result)
+        self._history_visible = not self._history_visible
+        width, height = self.master.winfo_width(), self.master.winfo_height()
+        if self._history_visible:
+            self.history_panel.grid(row=0, column=3, rowspan=2, sticky="nsew", padx=(0, 10), pady=10)
+            self.master.columnconfigure(3, weight=1)
+            self.master.geometry(f"{width + Style.HISTORY_WIDTH}x{height}")
+            self.history_panel.refresh()
+        else:
+            self.history_panel.grid_remove()
+            self.master.columnconfigure(3, weight=0)
+            self.master.geometry(f"{max(width - Style.HISTORY_WIDTH, 400)}x{height}")
+
     def toggle_second_mode(self):
         """Toggle the second function set for applicable buttons."""
         self.is_second_mode = not self.is_second_mode
@@ -432,19 +550,18 @@ class ScientificCalculator:
             action = cmd if callable(cmd) else lambda x=cmd: self.add_to_expression(x)
             button.config(text=text, command=action)
 
-    def _preprocess_expression(self, expr):
-        """Prepare the expression for safe evaluation, handling degree mode."""
-        if self.is_deg_mode:
-            # Apply 'd' suffix to all trig/inverse trig functions for DEG mode
-            for func in ['sin', 'cos', 'tan', 'asin', 'acos', 'atan']:
-                # Use word boundaries to avoid replacing parts of sinh, cosh etc.
-                expr = re.sub(r'\b' + func + r'\(', f'{func}d(', expr)
-        return expr
-
     def _format_result(self, result):
         """Formats the numerical result for display, handling large/small numbers."""
         if result is None:
             return "0"
+        if isinstance(result, Approximation):
+            return "≈" + str(result)
+        if isinstance(result, Rational):
+            return self.core._format_result(result) if is_huge_fraction(result) else format_exact(result)
+        if is_huge(result):
+            return self.core._format_result(result)  # leading digits only, without str() of the whole number
+        if self.core.precision is not None:
+            return self.core._format_result(result)  # rounded to the chosen precision
             
         try:
             # Round result to 12 decimal places for precision
@@ -465,45 +582,96 @@ class ScientificCalculator:
             return str(result) # Fallback
 
     def evaluate(self):
-        """Evaluate the full expression using the restricted 'eval'."""
+        """Start evaluating the full expression in the background worker."""
         
         temp_expr = self.expression
         display_expr = self._format_for_display(self.expression)
+        self.core.stop_browsing_history()
+        self.buffer.end() # '=' evaluates the whole line, wherever the cursor is
         
         if not temp_expr or self.is_last_input_operator:
             self.total_label.config(text=display_expr)
             return
 
         self.total_label.config(text=display_expr + "=")
-        self.is_last_input_operator = False
         
-        try:
-            # --- PARENTHESIS FIX ---
-            open_parens = temp_expr.count('(')
-            close_parens = temp_expr.count(')')
-            
-            missing_parens = open_parens - close_parens
-            if missing_parens > 0:
-                temp_expr += ')' * missing_parens
-            # -----------------------
-            
-            processed_expr = self._preprocess_expression(temp_expr)
-            result = eval(processed_expr, {"__builtins__": None}, self.safe_dict)
-            
-            self.last_answer = result
-            self.expression = self._format_result(result)
-            
-        except (ZeroDivisionError):
-            self.expression = "Divide by Zero"
-        except (SyntaxError):
-            self.expression = "Syntax Error"
-        except (NameError, TypeError, ValueError) as e:
-            error_msg = str(e).split(':')[-1].strip().split('\n')[0].title()
-            self.expression = f"Math Error ({error_msg})"
-        except Exception:
-            self.expression = "Unknown Error"
-        finally:
-            self._update_labels()
+        self._pending_expression = temp_expr
+        self.background.submit(temp_expr, self.is_deg_mode, self.last_answer, self.is_exact_mode,
+                               self.core.precision)
+        self._update_labels()
+        self._schedule_poll()
+
+    def _describe_error(self, exc):
+        """Turn an evaluation exception into the message shown on the display."""
+        if isinstance(exc, ZeroDivisionError):
+            return "Divide by Zero"
+        if isinstance(exc, ResultTooLarge):
+            return "Result Too Large"
+        if isinstance(exc, SyntaxError):
+            return "Syntax Error"
+        if isinstance(exc, (NameError, TypeError, ValueError)):
+            error_msg = str(exc).split(':')[-1].strip().split('\n')[0].title()
+            return f"Math Error ({error_msg})"
+        return "Unknown Error"
+
+    # --- Background Evaluation ---
+
+    def _is_computing(self):
+        return self.background.busy and self.expression == self._pending_expression
+
+    def _schedule_poll(self):
+        if self._poll_job is None:
+            self._poll_job = self.master.after(Style.WORKER_POLL_MS, self._poll_background)
+
+    def _poll_background(self):
+        """Pick up the worker's result; keeps polling via after() while it is still running."""
+        self._poll_job = None
+        job = self.background.poll()
+        if job is None:
+            if self.background.busy:
+                self._schedule_poll()
+            return
+
+        if job.job_id == self._digits_job:
+            self._digits_job = None
+            if job.ok:
+                self._copy(job.value)
+            else:
+                self.total_label.config(text="Cannot write out ANS")
+            return
+
+        # Keep anything typed while the result was pending
+        replace = self.expression == self._pending_expression
+        expression, self._pending_expression = self._pending_expression, None
+        if job.ok:
+            self.last_answer = job.value
+            self.core.record(expression, job.value)
+        if replace:
+            self.expression = self.core._as_operand(self._format_result(job.value)) if job.ok else self._describe_error(job.value)
+        self._update_labels()
+
+    def cancel_evaluation(self):
+        """Abort the in-flight evaluation, if any. Returns True when something was cancelled."""
+        if not self.background.busy:
+            return False
+        self.background.cancel()
+        self._pending_expression = None
+        self._update_labels()
+        self.total_label.config(text="Cancelled")
+        return True
+
+    def _on_close(self):
+        self.background.close()
+        self.core.close_history()
+        histograms = [self.redraw.histogram]
+        if self.plot_panel is not None:
+            histograms.append(self.plot_panel.redraw.histogram)
+        if self.table_panel is not None:
+            histograms.append(self.table_panel.redraw.histogram)
+        if self.history_panel is not None:
+            histograms.append(self.history_panel.redraw.histogram)
+        dump_metrics(histograms)
+        self.master.destroy()
 
     def _format_for_display(self, expr):
         """Convert internal expression to a more readable format for display, with limit."""
@@ -529,16 +697,39 @@ class ScientificCalculator:
             
         return display_expr
 
+    def _display_text(self):
+        """The main display, rendered token by token with the cursor marked unless it is at the end."""
+        text = self.buffer.render(self._token_display, cursor='│')
+        limit = Style.DISPLAY_LIMIT
+        if len(text) > limit:
+            # Keep the cursor in view: show up to a little past it
+            end = len(text) if self.buffer.at_end else min(max(text.index('│') + limit // 2, limit - 3), len(text))
+            start = max(end - (limit - 3), 0)
+            text = ("..." if start else "") + text[start:end] + ("..." if end < len(text) else "")
+        return text
+
     def _update_labels(self):
+        """Request a refresh of the display labels; it runs once when Tk is idle."""
+        self.redraw.request()
+
+    def _redraw_labels(self):
         """Update the display labels and indicators."""
-        display_text = self._format_for_display(self.expression)
-        
-        # 1. Update main display
-        self.label.config(text=display_text if self.expression and self.expression != "Error" else "0")
-        
-        # 2. Clear history if typing a new expression
-        if not self.total_label.cget('text').endswith('='):
-            self.total_label.config(text=display_text)
+        # 1. Update main display and preview, only if the input actually changed
+        state = (self.expression, self._is_computing(), self.is_deg_mode, self.is_exact_mode, self.core.precision,
+                 self.last_answer, self.buffer.cursor)
+        if state != self._shown_state:
+            expression_changed = self._shown_state is None or self._shown_state[0] != self.expression
+            self._shown_state = state
+            display_text = self._format_for_display(self.expression)
+            if self._is_computing():
+                display_text = "computing…"
+            shown = display_text if self._is_computing() else self._display_text()
+            self.label.config(text=shown if self.expression and self.expression != "Error" else "0")
+            self._refresh_preview()
+
+            # 2. Clear history if typing a new expression
+            if expression_changed and not self.total_label.cget('text').endswith('='):
+                self.total_label.config(text=display_text)
             
         # 3. Update indicators (DEG/RAD, M, ANS)
         mode = "DEG" if self.is_deg_mode else "RAD"
@@ -549,7 +740,25 @@ class ScientificCalculator:
         if self.last_answer != 0.0:
             indicators.append("ANS")
             
-        self.mode_label.config(text=" ".join(indicators))
+        indicators = " ".join(indicators)
+        if self.mode_label.cget('text') != indicators:
+            self.mode_label.config(text=indicators)
+        number_mode = self.core.number_mode_text()
+        if self.exact_label.cget('text') != number_mode:
+            self.exact_label.config(text=number_mode)
+        if self._plot_visible:
+            self.plot_panel.plot("" if self.expression == "Error" else self.expression)
+        if self._table_visible:
+            self.table_panel.show("" if self.expression == "Error" else self.expression)
+        if self._history_visible:
+            self.history_panel.refresh()
+
+    def _refresh_preview(self):
+        text = ""
+        if not self._is_computing() and self.expression != "Error":
+            # The core's preview re-parses only the edited tail, in every number mode
+            text = self.core.preview_for(self.expression, {'ANS': self.last_answer}, self._format_result)
+        self.preview_label.config(text=f"= {text}" if text else "")
 
 
     # --- Memory and Answer Functions ---
@@ -560,10 +769,28 @@ class ScientificCalculator:
         self._update_labels()
         
     def memory_recall(self): 
-        self.add_to_expression(self._format_result(self.memory))
+        self.add_to_expression(self.core._as_operand(self._format_result(self.memory)))
         
+    def browse_history(self, older=True):
+        """Up/Down: the core steps through the history entries starting with the typed text; ANS recalls one."""
+        core = self.core
+        if core.history is None or not (older or core.browsing_history):
+            return
+        core.expression = self.expression # the search prefix
+        entry = core.browse_history(older)
+        if entry is not None:
+            text = core.history_text(entry, self._format_result, self._format_for_display)
+        else:
+            text = core.total_history or self._format_for_display(self.expression) # "No match", or past the newest
+        self.total_label.config(text=text)
+
     def recall_last_answer(self): 
-        self.add_to_expression(self._format_result(self.last_answer))
+        if self.core.recall_history_entry():
+            self.expression = "" # the typed search prefix gives way to the recalled entry
+        if is_huge(self.last_answer):
+            self.add_to_expression('ANS') # Too long to write out; evaluated by name
+            return
+        self.add_to_expression(self.core._as_operand(self._format_result(self.last_answer)))
         
     def memory_op(self, operation):
         """Generic function to handle M+ and M- operations."""
@@ -574,20 +801,14 @@ class ScientificCalculator:
              val_to_add = self.last_answer
         else:
             try:
-                # Evaluate the current expression to get the value
-                processed_expr = self._preprocess_expression(original_expression)
-                # Auto-close parentheses for memory op evaluation
-                open_parens = processed_expr.count('(')
-                close_parens = processed_expr.count(')')
-                processed_expr += ')' * (open_parens - close_parens)
-                
-                val_to_add = eval(processed_expr, {"__builtins__": None}, self.safe_dict)
+                # Evaluate the current expression to get the value (parentheses are auto-closed)
+                val_to_add = self.core._compile_expression(original_expression)({'ANS': self.last_answer})
             except Exception:
                 self.expression = "Error in M-op"
                 self._update_labels()
                 return
             
-        self.memory = operation(self.memory, val_to_add)
+        self.memory = self.core.combine_memory(operation, self.memory, val_to_add)
         self.total_label.config(text=f"M = {self._format_result(self.memory)}")
         
         # CRITICAL UX CHANGE: Only clear the main display if the expression was evaluated just for M-op
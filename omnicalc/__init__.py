@@ -0,0 +1,5 @@
+"""Shared, GUI-independent building blocks for the OmniCalc calculators."""
+
+from omnicalc.cache import ExpressionCache, NamespaceDict
+
+__all__ = ['ExpressionCache', 'NamespaceDict']
@@ -0,0 +1,5 @@
+import sys
+
+from omnicalc.cli import main
+
+sys.exit(main())
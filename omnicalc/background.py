@@ -0,0 +1,134 @@
+"""
+Evaluate expressions in a separate process so a GUI event loop never blocks.
+
+Big-integer arithmetic such as `factorial(10**6)` runs inside C code that
+holds the GIL, so a worker *thread* would still freeze Tk. Instead one worker
+process is kept warm; a job is submitted with `submit()`, the GUI polls with
+`poll()` from an `after()` callback, and `cancel()` kills the process (the
+only way to interrupt such a computation) and lets the next submit start a
+fresh one. `multiprocessing` is only imported when the worker is started, so
+creating a BackgroundEvaluator costs nothing at GUI startup.
+
+The worker also writes out huge integers in full (`submit_digits()`), which
+can take seconds for results with millions of digits (see omnicalc.bigint).
+"""
+
+from collections import namedtuple
+
+JobResult = namedtuple('JobResult', 'job_id ok value')
+
+# Job kinds
+CALCULATE, DIGITS = 'calculate', 'digits'
+
+
+def _worker_main(conn):
+    import pickle
+    from omnicalc.core import CalculatorCore
+
+    core = CalculatorCore()
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            break
+        if message is None:
+            break
+        job_id, kind, *args = message
+        try:
+            if kind == DIGITS:
+                from omnicalc.bigint import full_digits
+                reply = (job_id, True, full_digits(args[0]))
+            else:
+                expression, core.is_deg_mode, core.is_exact_mode, core.precision, core.last_answer = args
+                reply = (job_id, True, core.calculate(expression))
+        except Exception as exc:
+            reply = (job_id, False, exc)
+        try:
+            conn.send(reply)
+        except (pickle.PicklingError, TypeError, AttributeError):
+            conn.send((job_id, False, RuntimeError(str(reply[2]))))
+
+
+class BackgroundEvaluator:
+    """A single warm worker process that evaluates one expression at a time."""
+
+    def __init__(self, mp_context='spawn'):
+        self._mp_context = mp_context
+        self._context = None
+        self._process = None
+        self._conn = None
+        self._job_id = 0
+        self.current_job = None
+
+    @property
+    def busy(self):
+        return self.current_job is not None
+
+    def start(self):
+        """Start the worker ahead of time (e.g. once the window has painted)."""
+        if self._process is None or not self._process.is_alive():
+            if self._context is None:
+                import multiprocessing
+                self._context = multiprocessing.get_context(self._mp_context)
+            self._conn, child_conn = self._context.Pipe()
+            self._process = self._context.Process(target=_worker_main, args=(child_conn,), daemon=True)
+            self._process.start()
+            child_conn.close()
+
+    def submit(self, expression, deg_mode=True, last_answer=0.0, exact=False, precision=None):
+        """Queue `expression`; any job still running is cancelled first. Returns the job id."""
+        return self._submit(CALCULATE, expression, deg_mode, exact, precision, last_answer)
+
+    def submit_digits(self, value):
+        """Queue writing out every digit of the int `value` (the result is the string), like submit()."""
+        return self._submit(DIGITS, value)
+
+    def _submit(self, kind, *args):
+        if self.busy:
+            self.cancel()
+        self.start()
+        self._job_id += 1
+        self.current_job = self._job_id
+        self._conn.send((self._job_id, kind) + args)
+        return self._job_id
+
+    def poll(self):
+        """Return the JobResult of the current job if it has finished, else None."""
+        if not self.busy:
+            return None
+        try:
+            if not self._conn.poll():
+                if self._process.is_alive():
+                    return None
+                raise EOFError
+            job_id, ok, value = self._conn.recv()
+        except (EOFError, OSError):
+            job_id, ok, value = self.current_job, False, RuntimeError("evaluation process exited")
+            self._discard_process()
+        if job_id != self.current_job:
+            return None  # stale reply from a job that was replaced
+        self.current_job = None
+        return JobResult(job_id, ok, value)
+
+    def cancel(self):
+        """Abort the running job by killing the worker process."""
+        if self.busy:
+            self.current_job = None
+            self._discard_process()
+
+    def _discard_process(self):
+        if self._process is not None:
+            self._process.kill()
+            self._process.join()
+            self._conn.close()
+        self._process = self._conn = None
+
+    def close(self):
+        self.current_job = None
+        if self._process is not None and self._process.is_alive():
+            try:
+                self._conn.send(None)
+            except OSError:
+                pass
+            self._process.join(timeout=1)
+        self._discard_process()
@@ -0,0 +1,98 @@
+"""
+Formatting integers too long to write out in full.
+
+str(n) is quadratic in the number of digits, and CPython refuses it outright
+above sys.get_int_max_str_digits() (4300 digits by default), so results such
+as factorial(50000) (213,237 digits) could not be displayed at all.
+
+* `scientific()` needs only the top bits of n: the leading digits and the
+  exponent come from n >> s times 2**s, computed in decimal at a few dozen
+  digits. That is O(log n) small multiplications, whatever the size of n.
+* `full_digits()` writes out every digit, on demand. It converts the binary
+  halves recursively and joins them with decimal multiplications (libmpdec's
+  are subquadratic), instead of the quadratic str(). It is still the
+  expensive path, so the GUIs run it in the background worker.
+"""
+
+import math
+
+# Integers with at most this many digits are shown in full.
+FULL_DIGITS = 1000
+# ... which means up to this many bits (a lower bound, so str() is always safe below it).
+HUGE_BITS = math.floor(FULL_DIGITS * math.log2(10))
+# Significant digits of the scientific form, like the 10 decimals of ordinary results.
+SHOWN_DIGITS = 10
+# Extra decimal digits carried while computing the leading digits.
+GUARD_DIGITS = 20
+# Pieces of at most this many bits are converted by Decimal(int) directly.
+SPLIT_BITS = 1024
+
+
+def is_huge(value):
+    """True for ints (not bools) too long to be shown in full."""
+    return type(value) is int and value.bit_length() > HUGE_BITS
+
+
+def is_huge_fraction(value):
+    """True for an exact-mode Rational whose numerator or denominator is too long to be shown in full."""
+    value.normalize()
+    return value.num.bit_length() > HUGE_BITS or value.den.bit_length() > HUGE_BITS
+
+
+def _context(precision):
+    import decimal  # kept out of `import omnicalc.core`: only huge results need it
+    return decimal.Context(prec=precision, Emax=decimal.MAX_EMAX, Emin=decimal.MIN_EMIN,
+                           rounding=decimal.ROUND_HALF_EVEN)
+
+
+def _top(magnitude, keep):
+    """(m, shift) with m = magnitude >> shift holding at most `keep` bits."""
+    shift = max(magnitude.bit_length() - keep, 0)
+    return magnitude >> shift, shift
+
+
+def scientific(num, den=1, digits=SHOWN_DIGITS):
+    """
+    num/den (ints, den > 0) as "d.ddddddddde+N" with `digits` significant
+    digits, from the top bits of each: nothing is converted in full.
+    """
+    from decimal import Decimal
+    keep = math.ceil((digits + GUARD_DIGITS) * math.log2(10))
+    # The dropped low bits change the value by less than 2**-keep relative: far below the digits shown.
+    top_num, num_shift = _top(abs(num), keep)
+    top_den, den_shift = _top(den, keep)
+    context = _context(digits + GUARD_DIGITS)
+    value = context.divide(Decimal(top_num), Decimal(top_den))
+    value = context.multiply(value, context.power(2, num_shift - den_shift))
+    text = format(_context(digits).plus(value), f'.{digits - 1}e')
+    mantissa, exponent = text.split('e')
+    mantissa = mantissa.rstrip('0').rstrip('.')
+    return f"{'-' if num < 0 else ''}{mantissa}e{int(exponent):+d}"
+
+
+def full_digits(n):
+    """Every decimal digit of `n` (subquadratic; not limited by sys.get_int_max_str_digits())."""
+    import decimal
+    if n.bit_length() <= HUGE_BITS:
+        return str(n)
+    context = _context(decimal.MAX_PREC)
+    context.traps[decimal.Inexact] = True  # every step is exact; a rounding here would be a bug
+    powers = {}
+
+    def power_of_two(bits):
+        if bits not in powers:
+            powers[bits] = context.power(2, bits)
+        return powers[bits]
+
+    def convert(value, bits):
+        if bits <= SPLIT_BITS:
+            return decimal.Decimal(value)
+        low_bits = bits >> 1
+        high = value >> low_bits
+        low = value - (high << low_bits)
+        return context.add(context.multiply(convert(high, bits - low_bits), power_of_two(low_bits)),
+                           convert(low, low_bits))
+
+    magnitude = abs(n)
+    text = format(convert(magnitude, magnitude.bit_length()), 'f')
+    return '-' + text if n < 0 else text
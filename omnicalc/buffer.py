@@ -0,0 +1,285 @@
+"""
+The expression being typed, as tokens around a cursor.
+
+ExpressionBuffer keeps the tokens before the cursor and the tokens after it
+on two stacks (a gap buffer of tokens), so typing, deleting and moving the
+cursor cost O(1) however long the expression is. Every token pushed before
+the cursor is linked to the innermost group still open at that point, so a
+')' knows its '(' (or 'sin(') without scanning back, and "the last operand"
+(a number, a name or a whole parenthesized group) is found in O(1).
+Negating it marks the operand's first and last tokens with '(-' and ')'
+instead of splicing text, and replacing the last operator swaps one token.
+
+The cursor moves a token at a time, so it is inside a number only after
+digits were typed in front of one. That number is then split into two
+NUMBER tokens at the cursor, joined again as soon as the cursor leaves it
+or it is negated: otherwise one number is one token.
+
+The text is rendered from the tokens and cached until the next edit. Text
+that is not an expression (an error message) keeps every character, so
+`text` always gives back what set_text() was given.
+"""
+
+import re
+
+from omnicalc.parser import TOKEN_RE
+
+NUMBER, NAME, FUNCTION, OPEN, CLOSE, OPERATOR, COMMA, OTHER = \
+    'NUMBER', 'NAME', 'FUNCTION', 'OPEN', 'CLOSE', 'OPERATOR', 'COMMA', 'OTHER'
+_KINDS = {'NUMBER': NUMBER, 'NAME': NAME, 'OP': OPERATOR, 'LPAREN': OPEN, 'RPAREN': CLOSE, 'COMMA': COMMA}
+_DIGITS_RE = re.compile(r'[\d.]+')
+NEGATED = '(-'
+# Kinds of the values typed so far that are one token ('+', 'sin(', 'pi'...), so a key press skips the regex.
+_KEY_KINDS = {}
+_KEY_KINDS_LIMIT = 256
+
+
+class Token:
+    """One token; `prefix` and `suffix` hold the '(-' and ')' of a negation around it."""
+
+    __slots__ = ('kind', 'text', 'prefix', 'suffix', 'partner', 'opener', 'outer')
+
+    def __init__(self, kind, text):
+        self.kind = kind
+        self.text = text
+        self.prefix = self.suffix = ''
+        self.partner = None  # the other end of a negation
+        self.opener = None  # for ')' before the cursor: its '(' or function token
+        self.outer = None  # for '(' before the cursor: the group it is in
+
+    def __str__(self):
+        return self.prefix + self.text + self.suffix
+
+    def __repr__(self):
+        return f"Token({self.kind}, {str(self)!r})"
+
+
+def _joins(first, second):
+    """True when `first` followed by `second` is one number split in two (a negation keeps them apart)."""
+    return first.kind == NUMBER and second.kind == NUMBER and not first.suffix and not second.prefix
+
+
+def tokens(text):
+    """Tokens for `text`; a run of digits and points is one NUMBER, a name followed by '(' one FUNCTION."""
+    if _DIGITS_RE.fullmatch(text):
+        return [Token(NUMBER, text)]
+    result = []
+    for match in TOKEN_RE.finditer(text):
+        kind = _KINDS.get(match.lastgroup, OTHER)
+        if kind == OPEN and result and result[-1].kind == NAME and result[-1].text.isidentifier():
+            result[-1].kind, result[-1].text = FUNCTION, result[-1].text + '('
+        else:
+            result.append(Token(kind, match.group()))
+    return result
+
+
+class ExpressionBuffer:
+    """An editable expression: tokens before the cursor (`_left`) and after it (`_right`, reversed)."""
+
+    def __init__(self, text=""):
+        self._left = []
+        self._opens = []  # innermost open group after each token of _left (or None)
+        self._right = []
+        self._text = None
+        self.set_text(text)
+
+    # --- Whole Text ---
+
+    @property
+    def text(self):
+        """The expression as a string (rendered once per edit)."""
+        if self._text is None:
+            self._text = ''.join(map(str, self._left)) + ''.join(map(str, reversed(self._right)))
+        return self._text
+
+    def set_text(self, text):
+        """Replace everything with `text`, cursor at the end."""
+        self._left.clear()
+        self._opens.clear()
+        self._right.clear()
+        for token in tokens(text):
+            self._push(token)
+        self._text = text
+
+    def clear(self):
+        self.set_text("")
+
+    def __len__(self):
+        """Number of tokens."""
+        return len(self._left) + len(self._right)
+
+    @property
+    def cursor(self):
+        """Number of tokens before the cursor."""
+        return len(self._left)
+
+    @property
+    def at_end(self):
+        return not self._right
+
+    def render(self, display_map=None, cursor=None):
+        """The text with tokens replaced through `display_map`, and `cursor` marking the cursor unless at the end."""
+        def shown(token):
+            text = display_map.get(token.text, token.text) if display_map else token.text
+            return token.prefix + text + token.suffix
+        left = ''.join(map(shown, self._left))
+        if not self._right:
+            return left
+        return left + (cursor or '') + ''.join(map(shown, reversed(self._right)))
+
+    # --- Stacks ---
+
+    def _push(self, token):
+        current = self._opens[-1] if self._opens else None
+        kind = token.kind
+        if kind == OPEN or kind == FUNCTION:
+            token.outer = current
+            current = token
+        elif kind == CLOSE:
+            token.opener = current
+            current = current.outer if current is not None else None
+        self._left.append(token)
+        self._opens.append(current)
+        self._text = None
+
+    def _pop(self):
+        self._opens.pop()
+        self._text = None
+        return self._left.pop()
+
+    def _join_last(self):
+        left = self._left
+        if len(left) > 1 and _joins(left[-2], left[-1]):
+            left[-2].text += self._pop().text
+
+    def _split_number(self):
+        """True when the cursor is inside a number, i.e. between two halves of it."""
+        return bool(self._left and self._right) and _joins(self._left[-1], self._right[-1])
+
+    # --- Editing at the Cursor ---
+
+    def last(self):
+        """The token before the cursor, or None."""
+        return self._left[-1] if self._left else None
+
+    def last_char(self):
+        """The character before the cursor ('' at the start)."""
+        if not self._left:
+            return ''
+        token = self._left[-1]
+        return token.suffix[-1:] or token.text[-1:]
+
+    def insert(self, value):
+        """Insert `value` at the cursor; digits typed after a number extend it."""
+        last = self._left[-1] if self._left else None
+        kind = _KEY_KINDS.get(value)
+        if kind is not None:  # a single key: one token, no regex
+            if kind == NUMBER and last is not None and last.kind == NUMBER and not last.suffix:
+                last.text += value
+                self._text = None
+            else:
+                self._push(Token(kind, value))
+            return
+        new = tokens(value)
+        if len(new) == 1 and new[0].text == value and len(_KEY_KINDS) < _KEY_KINDS_LIMIT:
+            _KEY_KINDS[value] = new[0].kind
+        if new and new[0].kind == NUMBER and last is not None and last.kind == NUMBER and not last.suffix:
+            last.text += new.pop(0).text
+            self._text = None
+        for token in new:
+            self._push(token)
+
+    def replace_operator(self, value):
+        """Replace the binary operators before the cursor ('-' excepted, it may be a sign) with `value`."""
+        while self._left and self._left[-1].kind == OPERATOR and self._left[-1].text != '-':
+            self._unlink(self._pop())
+        self.insert(value)
+
+    def delete(self):
+        """Backspace: undo a negation ending here, else drop a digit of a number or the whole token."""
+        last = self.last()
+        if last is None:
+            return
+        if last.suffix:
+            self._unwrap(last.partner, last)
+            self._join_last()
+        elif last.kind == NUMBER and len(last.text) > 1:
+            last.text = last.text[:-1]
+            self._text = None
+        else:
+            self._unlink(self._pop())
+
+    def negate(self):
+        """Toggle the sign of the operand before the cursor; with no operand there, type a minus sign."""
+        if self._split_number():
+            self.move_right()  # the whole number is the operand; the cursor ends after it
+        last = self.last()
+        left = self._left
+        if last is None or last.kind not in (NUMBER, NAME, CLOSE) or (last.kind == CLOSE and last.opener is None):
+            self.insert('-')
+            return
+        if last.suffix:
+            self._unwrap(last.partner, last)
+            self._join_last()  # '1(-2)' -> '12' is one number again
+            return
+        whole = not self._right and last.kind == NUMBER
+        if whole and len(left) == 1:
+            last.prefix = '' if last.prefix == '-' else '-'  # the whole expression is one number
+            self._text = None
+            return
+        if whole and len(left) == 2 and left[0].kind == OPERATOR and left[0].text == '-':
+            self._opens.pop(0)  # '-5' -> '5'
+            left.pop(0)
+            self._text = None
+            return
+        start = last.opener if last.kind == CLOSE else last
+        if start.prefix:
+            self._unwrap(start, start.partner)
+            return
+        start.prefix, last.suffix = NEGATED, ')'
+        start.partner, last.partner = last, start
+        self._text = None
+
+    def _unwrap(self, start, end):
+        if start is not None:
+            start.prefix, start.partner = '', None
+        if end is not None:
+            end.suffix, end.partner = '', None
+        self._text = None
+
+    def _unlink(self, token):
+        """A token is gone: drop the other half of a negation it was part of."""
+        if token.partner is not None and token.partner is not token:
+            self._unwrap(token.partner, token.partner)
+
+    # --- Cursor ---
+
+    def move_left(self):
+        """Move the cursor one token left; False at the start."""
+        if not self._left:
+            return False
+        text = self._text  # moving does not change the text
+        right = self._right
+        right.append(self._pop())
+        if len(right) > 1 and _joins(right[-1], right[-2]):
+            right[-1].text += right.pop(-2).text  # the cursor left the number it split
+        self._text = text
+        return True
+
+    def move_right(self):
+        """Move the cursor one token right; False at the end."""
+        if not self._right:
+            return False
+        text = self._text
+        self._push(self._right.pop())
+        self._join_last()  # the cursor left the number it split
+        self._text = text
+        return True
+
+    def home(self):
+        while self.move_left():
+            pass
+
+    def end(self):
+        while self.move_right():
+            pass
@@ -0,0 +1,122 @@
+from collections import OrderedDict
+
+
+class NamespaceDict(dict):
+    """A dict of allowed names that bumps `version` every time it is mutated."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.version = 0
+
+    def _touch(self):
+        self.version += 1
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self._touch()
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self._touch()
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self._touch()
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self._touch()
+        return super().setdefault(key, default)
+
+    def pop(self, *args):
+        self._touch()
+        return super().pop(*args)
+
+    def popitem(self):
+        self._touch()
+        return super().popitem()
+
+    def clear(self):
+        super().clear()
+        self._touch()
+
+
+class ExpressionCache:
+    """
+    Bounded LRU cache of compiled expressions.
+
+    Keys are whatever the caller uses to describe an expression (typically the
+    raw expression text plus the angle mode). Every lookup is checked against
+    the namespace the entries were compiled for; if that namespace has been
+    replaced or mutated since, the whole cache is dropped.
+    """
+
+    def __init__(self, maxsize=256):
+        if maxsize < 0:
+            raise ValueError("maxsize must be >= 0")
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._stamp = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        """Whether `key` has an entry; unlike get(), no hit or miss is counted and nothing is refreshed."""
+        return key in self._entries
+
+    def _check_namespace(self, namespace):
+        stamp = (id(namespace), getattr(namespace, 'version', None))
+        if stamp != self._stamp:
+            if self._entries:
+                self._entries.clear()
+                self.invalidations += 1
+            self._stamp = stamp
+
+    def get(self, key, namespace):
+        """Return the cached entry for `key`, or None on a miss."""
+        self._check_namespace(namespace)
+        try:
+            value = self._entries[key]
+        except KeyError:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value, namespace):
+        """Store `value` under `key`, evicting the least recently used entries."""
+        self._check_namespace(namespace)
+        if self.maxsize == 0:
+            return
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def resize(self, maxsize):
+        """Change the capacity, evicting entries if the cache shrinks."""
+        if maxsize < 0:
+            raise ValueError("maxsize must be >= 0")
+        self.maxsize = maxsize
+        while len(self._entries) > maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+        self._stamp = None
+
+    def stats(self):
+        """Return the current size and hit/miss/eviction counters."""
+        return {
+            'size': len(self._entries), 'maxsize': self.maxsize,
+            'hits': self.hits, 'misses': self.misses,
+            'evictions': self.evictions, 'invalidations': self.invalidations,
+        }
@@ -0,0 +1,329 @@
+"""
+Headless batch evaluation: one expression per input line, one result per output line.
+
+    python -m omnicalc [--rad] [--exact | --precision N] [--echo] [-o OUT] [--jobs N] [FILE ...]
+    python -m omnicalc --solve LO HI [--rad] [--echo] [FILE ...]
+    python -m omnicalc --table START STOP STEP [--rad] [--exact | --precision N] [-o OUT.csv] [FILE ...]
+    python -m omnicalc --worksheet [--rad] [--exact | --precision N] [--jobs N] [FILE ...]
+
+Input is read lazily line by line (stdin when no FILE is given), so memory use
+stays flat however large the input is. Results are collected into batches and
+written with a single write() per batch. A line that fails to evaluate produces
+an "Error: ..." line and does not stop the run; ANS always refers to the last
+successful result.
+
+With --jobs, lines are evaluated in parallel worker processes (see
+omnicalc.parallel) with a per-expression timeout and optional memory cap;
+lines are then independent of each other, so ANS is always 0.
+
+With --exact, decimals and division are exact fractions (0.1+0.2 prints 0.3,
+1/3 prints 1/3); transcendental functions still return floats. With
+--precision N, numbers are decimals and every function (including pi and e)
+is computed to N significant digits.
+
+Results estimated to need more than --max-bits bits (e.g. `10**10**8`) are
+approximated in log space, or reported as errors with --on-large=reject.
+Integers of more than 1000 digits are shown as their leading digits and
+exponent (≈3.34732051e+213236); --digits writes them out in full.
+
+With --solve LO HI, every line is an expression in x and the output is its
+roots in [LO, HI] with the iteration count and time taken (see
+omnicalc.solver), e.g. `x**2-2` gives `x = -1.4142135624, 1.4142135624 (8
+iterations, 0.9 ms)`. Solving always uses floating point.
+
+With --table START STOP STEP, the input lines are expressions in x and the
+output is CSV: a column for x = START, START+STEP, ..., STOP and one column
+per expression (see omnicalc.table). The bounds may be expressions too, like
+2*pi. Rows are computed and written in batches as they go, so the table can
+be far larger than memory.
+
+With --worksheet, every line defines a named value or function such as
+`r = 5`, `area = pi*r**2` or `f(x) = sin(x)/x` (see omnicalc.worksheet).
+Lines may refer to names defined further down; the cells are computed in
+dependency order and printed as `name = value`, one per input line. --jobs
+then evaluates slow independent cells in that many worker processes.
+
+--profile FILE records how long each stage (parsing, compiling, evaluating,
+formatting) took and writes the counters to FILE on exit, as JSON or, if FILE
+ends in .prom, in the Prometheus text format. It applies to in-process runs.
+"""
+
+import argparse
+import io
+import sys
+
+from omnicalc.core import CalculatorCore
+from omnicalc.cost import CostModel, DEFAULT_MAX_BITS, POLICIES, APPROXIMATE
+
+DEFAULT_BATCH_LINES = 8192
+
+
+def format_error(exc):
+    """One-line description of an evaluation failure."""
+    message = str(exc) or type(exc).__name__
+    return f"Error: {message}"
+
+
+def evaluate_lines(lines, core=None, echo=False, stats=None, format_result=None):
+    """
+    Yield one output line (without newline) for every input line.
+
+    Blank lines are passed through unchanged. If `stats` is a dict, the number
+    of evaluated lines and errors are accumulated into it. Results are
+    formatted with `format_result` (default: the core's own formatting).
+
+    A line seen for the first time is evaluated straight from its parse tree
+    (CalculatorCore.calculate_once), so unique lines are bound by parsing:
+    about 20,000 lines per second for lines like `123*4.5*sin(30)+7`. Lines
+    that repeat are compiled once and then served from the expression cache,
+    at about 300,000 per second.
+    """
+    core = core or CalculatorCore()
+    calculate = core.calculate_once
+    format_result = format_result or core._format_result
+    evaluated = errors = 0
+    try:
+        for line in lines:
+            expr = line.strip()
+            if not expr:
+                yield ""
+                continue
+            evaluated += 1
+            try:
+                output = format_result(calculate(expr))
+            except Exception as exc:
+                errors += 1
+                output = format_error(exc)
+            yield f"{expr} = {output}" if echo else output
+    finally:
+        if stats is not None:
+            stats['evaluated'] = stats.get('evaluated', 0) + evaluated
+            stats['errors'] = stats.get('errors', 0) + errors
+
+
+def solve_lines(lines, core, lo, hi, echo=False, stats=None):
+    """Like evaluate_lines(), but each line is an equation expr = 0 in x, solved for lo <= x <= hi."""
+    from omnicalc.solver import format_report
+    evaluated = errors = 0
+    try:
+        for line in lines:
+            expr = line.strip()
+            if not expr:
+                yield ""
+                continue
+            evaluated += 1
+            try:
+                output = format_report(core.solve(expr, lo, hi), core._format_result)
+            except Exception as exc:
+                errors += 1
+                output = format_error(exc)
+            yield f"{expr} = 0: {output}" if echo else output
+    finally:
+        if stats is not None:
+            stats['evaluated'] = stats.get('evaluated', 0) + evaluated
+            stats['errors'] = stats.get('errors', 0) + errors
+
+
+def worksheet_lines(lines, core, workers=0, stats=None):
+    """--worksheet: the input lines as the cells of one worksheet, printed once all are computed."""
+    from omnicalc.worksheet import Worksheet, parse_definition
+    lines = [line.strip() for line in lines]
+    names = {}
+    outputs = {}
+    evaluated = errors = 0
+    with Worksheet(core, workers) as sheet:
+        for number, line in enumerate(lines):
+            if line:
+                try:
+                    name, params, _ = parse_definition(line)
+                    sheet.check_name(name, params)
+                    names[number] = name
+                except (SyntaxError, ValueError) as exc:
+                    outputs[number] = format_error(exc)
+        sheet.load(line for number, line in enumerate(lines) if number in names)
+        try:
+            for number, line in enumerate(lines):
+                if not line:
+                    yield ""
+                    continue
+                evaluated += 1
+                if number in names:
+                    errors += sheet.cells[names[number]].error is not None
+                    yield sheet.format_cell(names[number])
+                else:
+                    errors += 1
+                    yield outputs[number]
+        finally:
+            if stats is not None:
+                stats['evaluated'] = stats.get('evaluated', 0) + evaluated
+                stats['errors'] = stats.get('errors', 0) + errors
+
+
+def full_digits_formatter(core):
+    """The core's result formatting, except that huge integers are written out in full (--digits)."""
+    from omnicalc.bigint import is_huge, full_digits
+
+    def format_result(result):
+        return full_digits(result) if is_huge(result) else core._format_result(result)
+    return format_result
+
+
+def evaluate_lines_parallel(lines, pool, echo=False, stats=None):
+    """Like evaluate_lines(), but fans the work out over a BatchEvaluator."""
+    evaluated = errors = 0
+    try:
+        for result in pool.map(line.strip() for line in lines):
+            if not result.expression:
+                yield ""
+                continue
+            evaluated += 1
+            errors += not result.ok
+            yield f"{result.expression} = {result.output}" if echo else result.output
+    finally:
+        if stats is not None:
+            stats['evaluated'] = stats.get('evaluated', 0) + evaluated
+            stats['errors'] = stats.get('errors', 0) + errors
+
+
+def write_batched(outputs, stream, batch_lines=DEFAULT_BATCH_LINES):
+    """Write an iterable of output lines to `stream` in bulk."""
+    batch = []
+    append = batch.append
+    for output in outputs:
+        append(output)
+        if len(batch) >= batch_lines:
+            batch.append('')
+            stream.write('\n'.join(batch))
+            batch.clear()
+    if batch:
+        batch.append('')
+        stream.write('\n'.join(batch))
+    stream.flush()
+
+
+def write_table(parser, core, args, lines):
+    """--table: the CSV of every non-blank input line over the range."""
+    from omnicalc.table import Table, write_csv
+    try:
+        table = Table(core, [line.strip() for line in lines if line.strip()], *args.table)
+    except Exception as exc:
+        parser.error(f"--table: {str(exc) or type(exc).__name__}")
+    try:
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8', newline='', buffering=1 << 20) as stream:
+                write_csv(table.rows(), stream, table.header, args.batch_lines)
+        else:
+            write_csv(table.rows(), sys.stdout, table.header, args.batch_lines)
+    finally:
+        if args.profile:
+            core.export_profile(args.profile)
+    return 0
+
+
+def iter_input_lines(paths):
+    """Lazily chain the lines of every input file ('-' means stdin)."""
+    for path in paths or ['-']:
+        if path == '-':
+            yield from io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8', errors='replace')
+        else:
+            with open(path, encoding='utf-8', errors='replace') as handle:
+                yield from handle
+
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(prog='python -m omnicalc',
+                                     description="Evaluate calculator expressions, one per line.")
+    parser.add_argument('files', nargs='*', metavar='FILE', help="input files (default: stdin)")
+    parser.add_argument('--rad', action='store_true', help="use radians for trig functions (default: degrees)")
+    numbers = parser.add_mutually_exclusive_group()
+    numbers.add_argument('--exact', action='store_true',
+                         help="exact rational arithmetic for decimals and '/' (default: floating point)")
+    numbers.add_argument('--precision', type=int, metavar='N',
+                         help="decimal arithmetic with N significant digits (default: floating point)")
+    parser.add_argument('--solve', type=float, nargs=2, metavar=('LO', 'HI'),
+                        help="find the roots in [LO, HI] of each line, an expression in x")
+    parser.add_argument('--table', nargs=3, metavar=('START', 'STOP', 'STEP'),
+                        help="write a CSV table of the lines, expressions in x, for x from START to STOP")
+    parser.add_argument('--worksheet', action='store_true',
+                        help="read the lines as definitions like 'r = 5' and print every name's value")
+    parser.add_argument('--digits', action='store_true',
+                        help="write out integers of any length in full (default: leading digits beyond 1000)")
+    parser.add_argument('--echo', action='store_true', help="print 'expression = result' instead of the result only")
+    parser.add_argument('-o', '--output', help="write results to this file instead of stdout")
+    parser.add_argument('--batch-lines', type=int, default=DEFAULT_BATCH_LINES,
+                        help="number of result lines buffered per write (default: %(default)s)")
+    parser.add_argument('-j', '--jobs', type=int, default=0,
+                        help="evaluate in N worker processes (0: in-process, sequential)")
+    parser.add_argument('--timeout', type=float, default=5.0,
+                        help="per-expression time limit in seconds with --jobs (default: %(default)s)")
+    parser.add_argument('--memory-limit', type=int, metavar='MB',
+                        help="address-space limit per worker process with --jobs")
+    parser.add_argument('--max-bits', type=int, default=DEFAULT_MAX_BITS,
+                        help="largest exact integer result, in bits (default: %(default)s)")
+    parser.add_argument('--on-large', choices=POLICIES, default=APPROXIMATE,
+                        help="what to do with results over --max-bits (default: %(default)s)")
+    parser.add_argument('--profile', metavar='FILE',
+                        help="write per-stage timings to FILE (JSON, or Prometheus text for *.prom)")
+    parser.add_argument('--strict', action='store_true', help="exit with status 1 if any line failed")
+    return parser
+
+
+def main(argv=None):
+    parser = build_arg_parser()
+    args = parser.parse_args(argv)
+    cost_model = CostModel(args.max_bits, args.on_large)
+    core = CalculatorCore(cost_model=cost_model)
+    core.is_deg_mode = not args.rad
+    core.is_exact_mode = args.exact
+    try:
+        core.set_precision(args.precision)
+    except ValueError as exc:
+        parser.error(str(exc))
+    if args.solve and args.jobs:
+        parser.error("--solve runs in-process; it cannot be combined with --jobs")
+    if args.solve and not args.solve[0] < args.solve[1]:
+        parser.error("--solve needs LO < HI")
+    if args.table and (args.jobs or args.solve):
+        parser.error("--table runs in-process; it cannot be combined with --jobs or --solve")
+    if args.digits and args.jobs:
+        parser.error("--digits runs in-process; it cannot be combined with --jobs")
+    if args.worksheet and (args.solve or args.table or args.digits):
+        parser.error("--worksheet cannot be combined with --solve, --table or --digits")
+    if args.profile:
+        core.enable_profiling()
+    stats = {}
+    lines = iter_input_lines(args.files)
+
+    if args.table:
+        return write_table(parser, core, args, lines)
+    if args.worksheet:
+        pool = None
+        outputs = worksheet_lines(lines, core, args.jobs, stats)
+    elif args.solve:
+        pool = None
+        outputs = solve_lines(lines, core, *args.solve, args.echo, stats)
+    elif args.jobs:
+        from omnicalc.parallel import BatchEvaluator
+        memory_limit = args.memory_limit * 2**20 if args.memory_limit else None
+        pool = BatchEvaluator(workers=args.jobs, timeout=args.timeout,
+                              memory_limit=memory_limit, deg_mode=core.is_deg_mode,
+                              cost_model=cost_model, exact=args.exact, precision=args.precision)
+        outputs = evaluate_lines_parallel(lines, pool, args.echo, stats)
+    else:
+        pool = None
+        format_result = full_digits_formatter(core) if args.digits else None
+        outputs = evaluate_lines(lines, core, args.echo, stats, format_result)
+
+    try:
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8', buffering=1 << 20) as stream:
+                write_batched(outputs, stream, args.batch_lines)
+        else:
+            write_batched(outputs, sys.stdout, args.batch_lines)
+    finally:
+        if pool is not None:
+            pool.close()
+        if args.profile:
+            core.export_profile(args.profile)
+
+    return 1 if args.strict and stats.get('errors') else 0
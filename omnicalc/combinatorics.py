@@ -0,0 +1,212 @@
+"""
+Exact counting functions for big integers: nCr, nPr, multinomial, factorial.
+
+Writing `factorial(n)/factorial(k)/factorial(n-k)` builds three integers of
+millions of bits only to divide them (and then float division fails). These
+functions never build the full factorials. The result is factored into prime
+powers instead: the exponent of p in n! is Legendre's sum n//p + n//p**2 + ...,
+so a quotient of factorials is a difference of such sums. The prime powers
+are then multiplied with a balanced product tree (binary splitting), which
+keeps both operands of every multiplication about the same size so CPython's
+Karatsuba multiplication does the heavy lifting.
+
+`factorial()` is math.factorial (itself a binary-splitting implementation)
+behind a bounded LRU cache shared by every calculator in the process, so
+repeat queries are free and n! next to a cached m! only multiplies the gap.
+"""
+
+import math
+from collections import OrderedDict
+from operator import index
+
+# math.comb/math.perm are faster for small k, or k small relative to n; the
+# prime path also needs a sieve up to n, so it is limited to n <= SIEVE_LIMIT.
+SMALL_K = 64
+SIEVE_LIMIT = 1 << 24
+# Factorials below this are cheaper to recompute than to cache.
+FACTORIAL_CACHE_MIN_N = 1024
+
+_sieve_limit = 1
+_primes = []
+
+
+def primes_up_to(n):
+    """List of primes <= n (the largest list computed so far is reused)."""
+    global _sieve_limit, _primes
+    if n <= _sieve_limit:
+        return _primes[:_count_primes_up_to(n)]
+    size = n + 1
+    sieve = bytearray([1]) * size
+    sieve[0:2] = b'\x00\x00'
+    for p in range(2, math.isqrt(n) + 1):
+        if sieve[p]:
+            sieve[p * p::p] = bytes(len(range(p * p, size, p)))
+    _primes = [p for p in range(2, size) if sieve[p]]
+    _sieve_limit = n
+    return _primes
+
+
+def _count_primes_up_to(n):
+    from bisect import bisect_right
+    return bisect_right(_primes, n)
+
+
+def _legendre(n, p):
+    """Exponent of the prime p in n!."""
+    exponent = 0
+    while n:
+        n //= p
+        exponent += n
+    return exponent
+
+
+def product(values, start=0, stop=None):
+    """Product of values[start:stop] by binary splitting."""
+    if stop is None:
+        stop = len(values)
+    count = stop - start
+    if count <= 8:
+        result = 1
+        for i in range(start, stop):
+            result *= values[i]
+        return result
+    middle = (start + stop) // 2
+    return product(values, start, middle) * product(values, middle, stop)
+
+
+def _from_exponents(primes, exponent):
+    """
+    Product of p**exponent(p) over `primes`.
+
+    Evaluated from the top exponent bit down as
+    result = result**2 * (product of the primes whose exponent has that bit),
+    so the work is squarings and balanced products.
+    """
+    factors = []
+    for p in primes:
+        e = exponent(p)
+        if e:
+            factors.append((p, e))
+    if not factors:
+        return 1
+    result = 1
+    for bit in reversed(range(max(e for _, e in factors).bit_length())):
+        result = result * result * product([p for p, e in factors if e >> bit & 1])
+    return result
+
+
+def _non_negative(value, name):
+    value = index(value)
+    if value < 0:
+        raise ValueError(f"{name} must be a non-negative integer")
+    return value
+
+
+def nCr(n, k):
+    """Binomial coefficient C(n, k): the number of k-element subsets of n items."""
+    n = _non_negative(n, 'n')
+    k = _non_negative(k, 'k')
+    if k > n:
+        return 0
+    k = min(k, n - k)
+    if k <= SMALL_K or k < n // 64 or n > SIEVE_LIMIT:
+        return math.comb(n, k)
+    rest = n - k
+    # Primes in (n - k, n] divide n! once and neither k! nor (n - k)!.
+    return _from_exponents(primes_up_to(n), lambda p: _legendre(n, p) - _legendre(k, p) - _legendre(rest, p)
+                           if p <= rest else 1)
+
+
+def nPr(n, k):
+    """Number of ordered arrangements of k out of n items, n! / (n - k)!."""
+    n = _non_negative(n, 'n')
+    k = _non_negative(k, 'k')
+    if k > n:
+        return 0
+    if k <= SMALL_K or k < n // 16 or n > SIEVE_LIMIT:
+        return math.perm(n, k)
+    rest = n - k
+    return _from_exponents(primes_up_to(n), lambda p: _legendre(n, p) - _legendre(rest, p))
+
+
+def multinomial(*counts):
+    """(k1 + k2 + ...)! / (k1! k2! ...): ways to split items into groups of the given sizes."""
+    counts = [_non_negative(count, 'counts') for count in counts]
+    total = sum(counts)
+    counts = [count for count in counts if count]
+    if len(counts) <= 2:
+        return nCr(total, counts[0]) if counts else 1
+    if total - max(counts) < total // 64 or total > SIEVE_LIMIT:
+        # Mostly one group (or too many primes): a chain of binomials.
+        result, seen = 1, 0
+        for count in sorted(counts):
+            seen += count
+            result *= nCr(seen, count)
+        return result
+    return _from_exponents(primes_up_to(total), lambda p: _legendre(total, p)
+                           - sum(_legendre(count, p) for count in counts))
+
+
+# --- Shared factorial cache ---
+
+class FactorialCache:
+    """
+    Bounded LRU cache of factorials. Capacity is counted both in entries and
+    in total bits, so a few huge factorials cannot pin unbounded memory.
+    """
+
+    def __init__(self, maxsize=32, max_bits=1 << 27):
+        self.maxsize = maxsize
+        self.max_bits = max_bits
+        self._entries = OrderedDict()
+        self._bits = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def factorial(self, n):
+        """n!, from the cache when possible."""
+        n = _non_negative(n, 'factorial() argument')
+        if n < FACTORIAL_CACHE_MIN_N:
+            return math.factorial(n)
+        entries = self._entries
+        value = entries.get(n)
+        if value is not None:
+            entries.move_to_end(n)
+            self.hits += 1
+            return value
+        self.misses += 1
+        nearest = max((m for m in entries if m < n), default=None)
+        if nearest is not None and n - nearest <= n // 8:
+            value = entries[nearest] * product(range(nearest + 1, n + 1))
+        else:
+            value = math.factorial(n)
+        self._store(n, value)
+        return value
+
+    def _store(self, n, value):
+        bits = value.bit_length()
+        if bits > self.max_bits:
+            return
+        self._entries[n] = value
+        self._bits += bits
+        while len(self._entries) > self.maxsize or self._bits > self.max_bits:
+            _, evicted = self._entries.popitem(last=False)
+            self._bits -= evicted.bit_length()
+
+    def clear(self):
+        self._entries.clear()
+        self._bits = 0
+
+    def stats(self):
+        return {'size': len(self._entries), 'bits': self._bits, 'hits': self.hits, 'misses': self.misses}
+
+
+FACTORIAL_CACHE = FactorialCache()
+
+
+def factorial(n):
+    """n!, served from the process-wide FactorialCache."""
+    return FACTORIAL_CACHE.factorial(n)
@@ -0,0 +1,593 @@
+"""
+CalculatorCore: the GUI-independent calculator model.
+
+Nothing in this module imports tkinter, so it can be used from scripts and the
+command line (see omnicalc.cli) as well as from the Tk front-ends.
+"""
+
+import operator
+from omnicalc.cache import ExpressionCache, NamespaceDict
+from omnicalc.parser import parse, parse_number, degrees_transform, constants_transform, numeric_constants
+from omnicalc.evaluator import ClosureEvaluator
+from omnicalc.cost import CostModel, Approximation
+from omnicalc.exact import Rational, format_exact, parse_exact, to_exact
+from omnicalc.bigint import is_huge, is_huge_fraction, scientific
+from omnicalc.preview import LivePreview
+from omnicalc.functions import create_safe_dict
+
+# calculate_once() remembers this many expressions it evaluated without compiling, then starts afresh.
+SEEN_ONCE_LIMIT = 1 << 16
+
+class CalculatorCore:
+    """Handles all mathematical state, evaluation, and mode processing."""
+
+    # Names that are read from the evaluation environment rather than safe_dict
+    # (evaluate_many adds omnicalc.vectorize.VARIABLE, `x`).
+    VARIABLES = ('ANS',)
+    
+    def __init__(self, cache_size=256, evaluator=None, cost_model=None):
+        self.expression = ""
+        self.total_history = ""
+        self.is_deg_mode = True
+        self.is_exact_mode = False  # decimals and '/' as exact fractions (see omnicalc.exact)
+        self.precision = None  # significant digits in decimal mode (see omnicalc.precise); None for floats
+        self.is_second_mode = False
+        self.memory = 0.0
+        self.last_answer = 0.0
+        self._safe_dict = None  # the function table is built on first use
+        self._live_preview = None
+        self._precise = None  # (key, namespace, preview) for the current precision
+        self._vector = None  # (key, namespace) for evaluate_many with NumPy
+        self._dual = None  # (key, namespace) of dual numbers for solve()
+        self._transforms = None  # (key, parser transforms) for the current modes
+        self._seen_once = set()  # keys calculate_once() evaluated without compiling
+        self.expression_cache = ExpressionCache(cache_size)
+        self.evaluator = evaluator or ClosureEvaluator()
+        self.cost_model = cost_model or CostModel()
+        self.profiler = None  # see enable_profiling()
+        self.history = None  # persistent omnicalc.history.History; see open_history()
+        self._history_browser = None  # Up/Down through the history
+        
+        self.DISPLAY_MAP = {'**': '^', '*': '×', '/': '÷', 'sqrt(': '√(', 'cbrt(': '³√('}
+        self.DISPLAY_FUNCTIONS = ['sin(', 'cos(', 'tan(', 'log10(', 'log(', 'exp(', 'factorial(', 'sqrt(', 'cbrt(', 'pow(', 'asin(', 'acos', 'atan', 'sinh', 'cosh', 'tanh', 'asinh', 'acosh', 'atanh']
+
+    def _create_safe_dict(self):
+        """Creates the dictionary of allowed functions for safe evaluation."""
+        return create_safe_dict()
+
+    @property
+    def safe_dict(self):
+        if self._safe_dict is None:
+            self._safe_dict = NamespaceDict(self._create_safe_dict())
+        return self._safe_dict
+
+    @safe_dict.setter
+    def safe_dict(self, namespace):
+        self._safe_dict = namespace
+        self._live_preview = None
+
+    @property
+    def live_preview(self):
+        if self._live_preview is None:
+            self._live_preview = LivePreview(self.safe_dict, self._format_result)
+        return self._live_preview
+
+    # --- Profiling ---
+
+    PROFILED_STAGES = {'_preprocess_expression': 'preprocess', '_format_result': 'format_result',
+                       '_format_for_display': 'format_for_display'}
+
+    def enable_profiling(self, profiler=None):
+        """
+        Start recording per-stage call counts and timings; returns the StageProfiler.
+
+        Stages: 'compile' (cache lookup, plus preprocessing and compiling on a
+        miss), 'preprocess' (paren balancing and constant/DEG rewriting happen
+        in the same single parse), 'evaluate', 'format_result' (including the
+        rounding) and 'format_for_display'. The timed wrappers shadow the
+        methods on this instance only, so a core that never enables profiling
+        runs exactly the same code as before.
+        """
+        if profiler is None:
+            from omnicalc.metrics import StageProfiler
+            profiler = StageProfiler()
+        self.disable_profiling()
+        self.profiler = profiler
+        for method, stage in self.PROFILED_STAGES.items():
+            setattr(self, method, profiler.wrap(stage, getattr(self, method)))
+        self._compile_expression = profiler.wrap('compile', self._compile_expression)
+        self._reset_profiled_state()
+        return profiler
+
+    def disable_profiling(self):
+        for method in (*self.PROFILED_STAGES, '_compile_expression'):
+            self.__dict__.pop(method, None)
+        self.profiler = None
+        self._reset_profiled_state()
+
+    def _reset_profiled_state(self):
+        # Cached compiled forms carry the 'evaluate' wrapper of the profiler they were cached
+        # under, and previews hold the _format_result of when they were built: start both afresh.
+        self.expression_cache.clear()
+        self._live_preview = None
+        self._precise = None
+
+    def profile_stats(self):
+        """Per-stage timings (empty when profiling is off) and expression cache counters."""
+        stages = self.profiler.snapshot() if self.profiler else {}
+        return {'stages': stages, 'cache': self.expression_cache.stats()}
+
+    def export_profile(self, path):
+        """Write profile_stats() to `path`: Prometheus text for '*.prom', JSON otherwise."""
+        if self.profiler is None:
+            raise RuntimeError("profiling is not enabled")
+        cache = {f"cache_{name}": value for name, value in self.expression_cache.stats().items()}
+        self.profiler.export(path, cache)
+
+    def add_to_expression(self, value):
+        if self.expression == "Error": self.expression = ""
+        if value == 'π': value = 'pi'
+        elif value == 'e': value = 'e'
+        self._history_browser = None
+        self.expression += str(value)
+
+    def clear(self):
+        self.expression = ""
+        self.total_history = ""
+        self._history_browser = None
+
+    def backspace(self):
+        self._history_browser = None
+        if self.expression == "Error": self.clear()
+        else: self.expression = self.expression[:-1]
+
+    def toggle_deg_rad(self):
+        self.is_deg_mode = not self.is_deg_mode
+        return "DEG" if self.is_deg_mode else "RAD"
+
+    def toggle_exact_mode(self):
+        self.is_exact_mode = not self.is_exact_mode
+        if self.is_exact_mode:
+            self.precision = None
+        return self.number_mode_text()
+
+    # Number modes the GUI toggle steps through: floats, exact fractions, decimal digits.
+    NUMBER_MODES = (None, 'exact', 50, 100)
+
+    def set_precision(self, precision):
+        """Switch to decimal mode with `precision` significant digits (None returns to floats)."""
+        if precision is not None:
+            from omnicalc.precise import check_precision
+            check_precision(precision)
+            self.is_exact_mode = False
+        self.precision = precision
+
+    def cycle_number_mode(self):
+        """Step to the next entry of NUMBER_MODES; returns the new mode's label."""
+        current = 'exact' if self.is_exact_mode else self.precision
+        modes = self.NUMBER_MODES
+        mode = modes[(modes.index(current) + 1) % len(modes)] if current in modes else modes[0]
+        self.is_exact_mode = mode == 'exact'
+        self.set_precision(None if mode in (None, 'exact') else mode)
+        return self.number_mode_text()
+
+    def number_mode_text(self):
+        if self.precision is not None:
+            return f"{self.precision} DIGITS"
+        return "EXACT" if self.is_exact_mode else "FLOAT"
+
+    def toggle_second_mode(self):
+        self.is_second_mode = not self.is_second_mode
+        return self.is_second_mode
+
+    def memory_clear(self):
+        self.memory = 0.0
+
+    def memory_recall(self):
+        self.add_to_expression(self._operand_text(self.memory))
+
+    def recall_last_answer(self):
+        if self.recall_history_entry():
+            self.expression = ""  # the typed search prefix gives way to the recalled entry
+        # An integer too long to write out is entered by name.
+        self.add_to_expression('ANS' if is_huge(self.last_answer) else self._operand_text(self.last_answer))
+
+    def combine_memory(self, op_func, memory, value):
+        """The memory register after M+/M- (`op_func`) of `value`, in the current number mode."""
+        if self.precision is not None:
+            from omnicalc.precise import evaluation_context, to_decimal
+            from decimal import localcontext
+            with localcontext(evaluation_context(self.precision)):
+                return op_func(to_decimal(memory), to_decimal(value))
+        if self.is_exact_mode:
+            # Keep the register exact so repeated M+/M- do not accumulate error.
+            return op_func(to_exact(memory), to_exact(value))
+        return op_func(float(memory), float(value))
+
+    def memory_op(self, op_func):
+        try:
+            current_val = self._compile_expression(self.expression)({'ANS': self.last_answer})
+            self.memory = self.combine_memory(op_func, self.memory, current_val)
+        except:
+            self.expression = "Error"
+            
+    def memory_add(self): 
+        self.memory_op(operator.add)
+        self.clear() 
+        
+    def memory_subtract(self): 
+        self.memory_op(operator.sub)
+        self.clear() 
+
+    def _precise_state(self):
+        """(key, namespace, preview) for decimal mode, rebuilt when the precision or safe_dict changes."""
+        namespace = self.safe_dict
+        key = (self.precision, id(namespace), getattr(namespace, 'version', None))
+        if self._precise is None or self._precise[0] != key:
+            from omnicalc.precise import precise_namespace
+            precise = precise_namespace(namespace, self.precision)
+            self._precise = (key, precise, LivePreview(precise, self._format_result))
+        return self._precise
+
+    def _namespace(self):
+        """The namespace expressions are compiled against in the current number mode."""
+        return self.safe_dict if self.precision is None else self._precise_state()[1]
+
+    def _mode_transforms(self):
+        """The parser transforms of the current modes, rebuilt only when a mode or the namespace changes."""
+        namespace = self._namespace()
+        key = (self.is_deg_mode, id(namespace), getattr(namespace, 'version', None))
+        if self._transforms is None or self._transforms[0] != key:
+            transforms = [constants_transform(numeric_constants(namespace))]
+            if self.is_deg_mode:
+                transforms.append(degrees_transform)
+            self._transforms = (key, transforms)
+        return self._transforms[1]
+
+    def _preprocess_expression(self, expr):
+        """Parses `expr` into a tree, closing open parentheses and applying constant/DEG rewrites."""
+        transforms = self._mode_transforms()
+        if 'integrate' in expr:
+            from omnicalc.integrate import integral_transform
+            transforms = transforms + [integral_transform(self._integrand)]
+        if self.precision is not None:
+            from omnicalc.precise import parse_decimal
+            return parse(expr, transforms, parse_decimal)
+        return parse(expr, transforms, parse_exact if self.is_exact_mode else parse_number)
+
+    def _compile_expression(self, expr):
+        """Returns the compiled form of `expr`, reusing the LRU cache when possible."""
+        key = (expr, self.is_deg_mode, self.is_exact_mode, self.precision)
+        # Entries are stamped with safe_dict in every mode: the decimal namespace is derived from it.
+        compiled = self.expression_cache.get(key, self.safe_dict)
+        if compiled is None:
+            compiled = self._compile_uncached(expr, self.VARIABLES)
+            if self.profiler is not None:
+                compiled = self.profiler.wrap('evaluate', compiled)  # once, not on every cache hit
+            self.expression_cache.put(key, compiled, self.safe_dict)
+        return compiled
+
+    def _compile_uncached(self, expr, variables, namespace=None):
+        """Preprocess and compile `expr` in the current modes; `namespace` replaces the mode's own."""
+        if self.precision is None:
+            return self.cost_model.compile(self._preprocess_expression(expr), self.evaluator,
+                                           namespace or self.safe_dict, variables, self.is_exact_mode)
+        from decimal import localcontext
+        from omnicalc.precise import evaluation_context, in_context
+        # Constant folding happens while compiling, so it needs the context too.
+        with localcontext(evaluation_context(self.precision)):
+            compiled = self.cost_model.compile(self._preprocess_expression(expr), self.evaluator,
+                                               namespace or self._namespace(), variables)
+        return in_context(compiled, self.precision)
+
+    def evaluate_with(self, expr, variables):
+        """Evaluate `expr` with the names in the dict `variables` bound to their values (and ANS)."""
+        names = tuple(sorted(variables))
+        key = ('with', expr, names, self.is_deg_mode, self.is_exact_mode, self.precision)
+        compiled = self.expression_cache.get(key, self.safe_dict)
+        if compiled is None:
+            compiled = self._compile_uncached(expr, self.VARIABLES + names)
+            self.expression_cache.put(key, compiled, self.safe_dict)
+        return compiled({'ANS': self.last_answer, **variables})
+
+    def evaluate_many(self, expr, xs):
+        """
+        Evaluate `expr` for every value of the variable `x` in `xs`, compiling it once.
+
+        In float mode with NumPy installed this is one vectorized pass over a
+        float64 array and returns an array. Otherwise (no NumPy, exact or
+        decimal mode) it returns a list from one call per value. Points where
+        the expression fails, or hits a pole, are nan either way (see
+        omnicalc.vectorize for overflow). ANS is the last answer.
+        """
+        from omnicalc.vectorize import VARIABLE, numpy_module, as_array, evaluate_vector, evaluate_scalar
+        np = numpy_module() if self.precision is None and not self.is_exact_mode else None
+        key = ('many', expr, self.is_deg_mode, self.is_exact_mode, self.precision, np is not None)
+        compiled = self.expression_cache.get(key, self.safe_dict)
+        if compiled is None:
+            namespace = self._vector_namespace(np) if np is not None else None
+            compiled = self._compile_uncached(expr, self.VARIABLES + (VARIABLE,), namespace)
+            self.expression_cache.put(key, compiled, self.safe_dict)
+        if np is None:
+            return evaluate_scalar(compiled, xs, {'ANS': self.last_answer})
+        return evaluate_vector(compiled, as_array(xs, np), {'ANS': float(self.last_answer)}, np)
+
+    def _vector_namespace(self, np):
+        namespace = self.safe_dict
+        key = (id(namespace), getattr(namespace, 'version', None))
+        if self._vector is None or self._vector[0] != key:
+            from omnicalc.vectorize import vector_namespace
+            self._vector = (key, vector_namespace(namespace, np))
+        return self._vector[1]
+
+    def _integrand(self, tree):
+        """The integrand of integrate(tree, a, b) in an expression: `tree` over arrays of x, in floats."""
+        from omnicalc.integrate import Integrand, float_literals
+        from omnicalc.vectorize import VARIABLE, numpy_module, as_array, evaluate_vector, evaluate_scalar
+        np = numpy_module()
+        namespace = self._vector_namespace(np) if np is not None else self.safe_dict
+        compiled = self.cost_model.compile(float_literals(tree), self.evaluator, namespace, (VARIABLE,))
+        if np is None:
+            return Integrand(lambda xs: evaluate_scalar(compiled, xs, None))
+        return Integrand(lambda xs: evaluate_vector(compiled, as_array(xs, np), None, np))
+
+    def integrate(self, expr, a, b, tolerance=None, max_evaluations=None):
+        """
+        ∫ `expr` dx from a to b (an expression in the variable `x`), as an
+        omnicalc.integrate.IntegrationResult (value, error estimate, evaluations).
+
+        Adaptive Gauss–Kronrod quadrature whose panels are evaluated together
+        with evaluate_many. Integration always uses floats; DEG mode applies as
+        usual. Raises ValueError if the integrand is not finite at a node.
+        """
+        from omnicalc.integrate import DEFAULT_TOLERANCE, DEFAULT_MAX_EVALUATIONS, gauss_kronrod
+        return self._float_mode(lambda: gauss_kronrod(lambda xs: self.evaluate_many(expr, xs),
+                                                      float(a), float(b),
+                                                      tolerance or DEFAULT_TOLERANCE,
+                                                      max_evaluations or DEFAULT_MAX_EVALUATIONS))
+
+    def _float_mode(self, function, *args):
+        """Call `function(*args)` with floats as the number mode (e.g. for plotting and solving)."""
+        modes = self.is_exact_mode, self.precision
+        self.is_exact_mode, self.precision = False, None
+        try:
+            return function(*args)
+        finally:
+            self.is_exact_mode, self.precision = modes
+
+    def solve(self, expr, lo, hi, points=None):
+        """
+        The roots of `expr` = 0 in the variable `x` for lo <= x <= hi, as an
+        omnicalc.solver.SolveReport (roots with iteration counts, evaluations, time).
+
+        The interval is scanned with evaluate_many on a grid of `points` steps
+        and every sign change is refined by Newton's method inside its bracket,
+        with derivatives by automatic differentiation (see omnicalc.solver).
+        Solving always uses floats; DEG mode applies as usual.
+        """
+        from omnicalc.solver import DEFAULT_POINTS, find_roots
+        if not lo < hi:
+            raise ValueError("the interval must have lo < hi")
+        return self._float_mode(lambda: find_roots(lambda xs: self.evaluate_many(expr, xs),
+                                                   self._derivative_function(expr), lo, hi,
+                                                   points or DEFAULT_POINTS))
+
+    def _derivative_function(self, expr):
+        from omnicalc.solver import derivative_function
+        from omnicalc.vectorize import VARIABLE
+        key = ('dual', expr, self.is_deg_mode)
+        compiled = self.expression_cache.get(key, self.safe_dict)
+        if compiled is None:
+            compiled = self._compile_uncached(expr, self.VARIABLES + (VARIABLE,), self._dual_namespace())
+            self.expression_cache.put(key, compiled, self.safe_dict)
+        return derivative_function(compiled, {'ANS': float(self.last_answer)}, VARIABLE)
+
+    def _dual_namespace(self):
+        namespace = self.safe_dict
+        key = (id(namespace), getattr(namespace, 'version', None))
+        if self._dual is None or self._dual[0] != key:
+            from omnicalc.solver import dual_namespace
+            self._dual = (key, dual_namespace(namespace))
+        return self._dual[1]
+
+    def calculate(self, expr):
+        """Evaluates `expr` without touching the display state; ANS refers to the previous result."""
+        result = self._compile_expression(expr)({'ANS': self.last_answer})
+        self.last_answer = result
+        return result
+
+    def calculate_once(self, expr):
+        """
+        Like calculate(), for an expression that will probably not come again
+        (a line of batch input). On a cache miss the tree is evaluated as it
+        is parsed, without compiling closures or filling the cache; the second
+        time an expression comes, it is compiled and cached as usual. Decimal
+        mode and profiling always compile.
+        """
+        if self.precision is not None or self.profiler is not None:
+            return self.calculate(expr)
+        key = (expr, self.is_deg_mode, self.is_exact_mode, None)
+        compiled = self.expression_cache.get(key, self.safe_dict)
+        if compiled is None:
+            seen = self._seen_once
+            if key not in seen:
+                if len(seen) >= SEEN_ONCE_LIMIT:
+                    seen.clear()
+                seen.add(key)
+                result = self.cost_model.evaluate(self._preprocess_expression(expr), self.safe_dict,
+                                                  {'ANS': self.last_answer}, self.is_exact_mode)
+                self.last_answer = result
+                return result
+            seen.discard(key)
+            compiled = self._compile_uncached(expr, self.VARIABLES)
+            self.expression_cache.put(key, compiled, self.safe_dict)
+        result = compiled({'ANS': self.last_answer})
+        self.last_answer = result
+        return result
+
+    def preview(self):
+        """Returns the live result of the expression being typed ('' when there is none)."""
+        return self.preview_for(self.expression, {'ANS': self.last_answer})
+
+    def preview_for(self, expression, env=None, format_result=None):
+        """The live preview of `expression` in the current modes (formatted by `format_result` if given)."""
+        if self.precision is not None:
+            return self._precise_state()[2].update(expression, self.is_deg_mode, env, precision=self.precision,
+                                                   format_result=format_result)
+        return self.live_preview.update(expression, self.is_deg_mode, env, self.is_exact_mode, format_result=format_result)
+
+    def _format_result(self, result):
+        """Formats a numerical result for display (whole numbers without a decimal part)."""
+        if isinstance(result, Approximation):
+            return "≈" + str(result)
+        if type(result) is Rational:
+            if is_huge_fraction(result):
+                return "≈" + scientific(result.num, result.den)
+            return format_exact(result)
+        if is_huge(result):
+            return "≈" + scientific(result)  # leading digits only: str() would be quadratic (see omnicalc.bigint)
+        if self.precision is not None:
+            from omnicalc.precise import format_decimal
+            return format_decimal(result, self.precision)
+        result = round(result, 10)  # before the test, so 1.99999999999 shows as 2 like 2.0 does
+        if result == int(result):
+            result = int(result)
+        return str(result)
+
+    @staticmethod
+    def _as_operand(text):
+        """Parenthesize a formatted fraction so it stays one operand when more is typed."""
+        return f"({text})" if '/' in text else text
+
+    def _operand_text(self, value):
+        if type(value) is Rational:
+            return self._as_operand(format_exact(value))
+        return str(value)
+
+    def begin_evaluation(self):
+        """Shows the expression being evaluated on the history line and returns it."""
+        self._history_browser = None
+        self.total_history = self._format_for_display(self.expression) + "="
+        return self.expression
+
+    def finish_evaluation(self, result, replace_expression=True):
+        """
+        Applies a result computed elsewhere (e.g. in a background process). If the
+        user has typed since the evaluation started, the new input is kept and the
+        result only goes to the history line and ANS.
+        """
+        self.last_answer = result
+        try:
+            formatted = self._format_result(result)
+        except Exception:
+            formatted = "Error"
+        if replace_expression:
+            self.expression = self._as_operand(formatted)
+        else:
+            self.total_history += formatted
+
+    # --- Persistent History ---
+
+    def open_history(self, directory=None):
+        """Start recording evaluations in the history at `directory` (see omnicalc.history.default_directory)."""
+        from omnicalc.history import open_history
+        self.close_history()
+        self.history = open_history(directory)
+        return self.history
+
+    def close_history(self):
+        if self.history is not None:
+            self.history.close()
+            self.history = None
+        self._history_browser = None
+
+    def record(self, expression, result):
+        """Append a successful evaluation to the history, if one is open."""
+        if self.history is None or not expression:
+            return
+        try:
+            self.history.append(expression, result, self.is_deg_mode, self.is_exact_mode, self.precision)
+        except (TypeError, ValueError, OverflowError):
+            pass  # a value the log cannot store (complex, say) is left out
+        except OSError:
+            self.history = None  # the disk went away: stop recording
+
+    def browse_history(self, older=True):
+        """
+        Up/Down: step to the next older (newer) history entry starting with the
+        text typed so far, showing it on the history line. The ANS key then
+        recalls its value. Returns the entry, or None past the newest.
+        """
+        if self.history is None:
+            return None
+        if self._history_browser is None:
+            if not older:
+                return None
+            from omnicalc.history import HistoryBrowser
+            prefix = "" if self.expression == "Error" else self.expression
+            self._history_browser = HistoryBrowser(self.history, prefix)
+        browser = self._history_browser
+        entry = browser.older() if older else browser.newer()
+        if entry is None and browser.current is None:
+            self.total_history = "No match" if older else ""
+            self._history_browser = None
+        elif entry is not None:
+            self.total_history = self.history_text(entry)
+        return entry
+
+    @property
+    def browsing_history(self):
+        """True while Up/Down is stepping through the history."""
+        return self._history_browser is not None
+
+    def stop_browsing_history(self):
+        """Forget the Up/Down position; the next Up searches with the text typed by then."""
+        self._history_browser = None
+
+    def recall_history_entry(self):
+        """Make the entry browse_history is showing ANS; False when none is shown."""
+        browser = self._history_browser
+        if browser is None or browser.current is None:
+            return False
+        self.last_answer = browser.current.value
+        return True
+
+    def history_text(self, entry, format_result=None, format_for_display=None):
+        """How a history entry is shown: '#n expression=result' (a view may pass its own formatters)."""
+        try:
+            formatted = (format_result or self._format_result)(entry.value)
+        except Exception:
+            formatted = str(entry.value)
+        return f"#{entry.index + 1} {(format_for_display or self._format_for_display)(entry.expression)}={formatted}"
+
+    def fail_evaluation(self):
+        self.expression = "Error"
+
+    def evaluate(self):
+        self.begin_evaluation()
+        
+        expression = self.expression
+        try:
+            result = self.calculate(expression)
+            self.expression = self._as_operand(self._format_result(result))
+        except Exception:
+            self.expression = "Error"
+        else:
+            self.record(expression, result)
+        
+        return self.expression, self.total_history
+
+    def _format_for_display(self, expr):
+        display_expr = expr
+        for op, symbol in self.DISPLAY_MAP.items():
+            display_expr = display_expr.replace(op, symbol)
+        
+        if self.is_deg_mode:
+            display_expr = display_expr.replace('sind(', 'sin(')
+            display_expr = display_expr.replace('cosd(', 'cos(')
+            display_expr = display_expr.replace('tand(', 'tan(')
+            display_expr = display_expr.replace('asind(', 'sin⁻¹(')
+            display_expr = display_expr.replace('acosd(', 'cos⁻¹(')
+            display_expr = display_expr.replace('atand(', 'tan⁻¹(')
+
+        return display_expr
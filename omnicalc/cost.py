@@ -0,0 +1,537 @@
+"""
+Pre-evaluation cost model for expressions that can blow up.
+
+`**`, `pow`, `factorial` and the counting functions (nCr, nPr,
+multinomial) accept integers of any size, and a single
+`10**10**8` allocates hundreds of megabytes before anything can stop it. The
+estimator walks the parsed tree once and bounds the bit length of every exact
+integer the evaluation (including compile-time constant folding) would
+produce. Expressions over the budget are either rejected with
+`ResultTooLarge` or evaluated in log space, which returns a float or, beyond
+float range, an `Approximation`.
+"""
+
+import math
+
+from omnicalc import combinatorics
+from omnicalc.exact import Rational
+from omnicalc.parser import Number, Name, UnaryOp, BinOp, Call
+from omnicalc.evaluator import BINARY_OPERATORS, EXACT_BINARY_OPERATORS, CompiledExpression, evaluate_tree
+
+# Default budget: ~4.2 million bits (about 1.26 million decimal digits).
+DEFAULT_MAX_BITS = 1 << 22
+
+REJECT = 'reject'
+APPROXIMATE = 'approximate'
+POLICIES = (REJECT, APPROXIMATE)
+
+# Values up to this many bits are computed exactly while estimating, so
+# exponents such as the `10**8` in `10**10**8` are known precisely.
+SMALL_BITS = 64
+
+INF = float('inf')
+LOG10_2 = math.log10(2)
+FLOAT_MAX_LOG10 = math.log10(2.0 ** 1023)  # stay clear of float overflow when converting back
+
+
+class ResultTooLarge(OverflowError):
+    """Raised when an expression's estimated result exceeds the cost budget."""
+
+
+class Approximation:
+    """A number beyond float range, kept as a sign and the base-10 logarithm of its magnitude."""
+
+    __slots__ = ('sign', 'log10')
+
+    def __init__(self, sign, log10):
+        self.sign = sign
+        self.log10 = log10
+
+    def __float__(self):
+        raise OverflowError("approximation exceeds float range")
+
+    def __eq__(self, other):
+        return isinstance(other, Approximation) and (self.sign, self.log10) == (other.sign, other.log10)
+
+    def __hash__(self):
+        return hash((self.sign, self.log10))
+
+    def __str__(self):
+        exponent = math.floor(self.log10)
+        mantissa = round(10 ** (self.log10 - exponent), 9)
+        if mantissa >= 10:
+            mantissa, exponent = mantissa / 10, exponent + 1
+        digits = f"{mantissa:.9f}".rstrip('0').rstrip('.')
+        return f"{'-' if self.sign < 0 else ''}{digits}e+{exponent}"
+
+    def __repr__(self):
+        return f"Approximation({self.sign}, {self.log10!r})"
+
+
+# --- Estimation ---
+# Every node is summarized as (is_int, bits, value): whether the result is an
+# exact integer, an upper estimate of its bit length, and the value itself when
+# it is small enough to be computed for free (None otherwise).
+
+_FLOAT = (False, 0, None)
+
+FACTORIALS = (math.factorial, combinatorics.factorial)
+COUNTING = (combinatorics.nCr, combinatorics.nPr, combinatorics.multinomial)
+
+
+def _leaf(value):
+    if type(value) is Rational:
+        value.normalize()
+        if value.den != 1:
+            # Exact-mode fraction: its size is that of numerator and denominator.
+            return True, value.num.bit_length() + value.den.bit_length(), None
+        value = value.num
+    if isinstance(value, bool) or not isinstance(value, (int, Approximation)):
+        return _FLOAT
+    if isinstance(value, Approximation):
+        return True, INF, None
+    bits = value.bit_length()
+    return True, bits, value if bits <= SMALL_BITS else None
+
+
+def _log2_magnitude(estimate):
+    """log2 of an integer's magnitude (exact when its value is known)."""
+    _, bits, value = estimate
+    if value is not None:
+        return math.log2(abs(value)) if value else -INF
+    return bits
+
+
+def _scaled(log2_base, exponent_bits):
+    """log2_base * 2**exponent_bits, saturating to infinity."""
+    try:
+        return math.ldexp(log2_base, exponent_bits)
+    except OverflowError:
+        return INF
+
+
+def _with_value(bits, compute):
+    if bits > SMALL_BITS:
+        return True, bits, None
+    try:
+        value = compute()
+    except Exception:
+        return True, bits, None
+    return True, value.bit_length(), value
+
+
+def _estimate_power(base, exponent):
+    if not (base[0] and exponent[0]):
+        return _FLOAT
+    base_value, exp_value = base[2], exponent[2]
+    if base_value is not None and abs(base_value) <= 1:
+        return True, 1, None
+    if exp_value is not None:
+        if exp_value < 0:
+            return _FLOAT
+        bits = math.ceil(_log2_magnitude(base) * exp_value) + 1 if exp_value else 1
+        if base_value is not None:
+            return _with_value(bits, lambda: base_value ** exp_value)
+        return True, bits, None
+    # Exponent too large to compute: it is at least 2**(bits - 1).
+    return True, _scaled(_log2_magnitude(base), exponent[1] - 1), None
+
+
+def _estimate_factorial(arg):
+    if not arg[0]:
+        return _FLOAT
+    if arg[2] is not None:
+        n = arg[2]
+        if n < 2:
+            return True, 1, 1 if n >= 0 else None
+        bits = math.ceil(math.lgamma(n + 1) / math.log(2)) + 1
+        return _with_value(bits, lambda: math.factorial(n))
+    # n >= 2**(bits - 1), and log2(n!) > n * (log2(n) - log2(e)).
+    n_log2 = arg[1] - 1
+    return True, _scaled(n_log2 - math.log2(math.e), n_log2), None
+
+
+def _log_count(target, values):
+    """Natural log of nCr / nPr / multinomial of valid arguments, via lgamma."""
+    lgamma = math.lgamma
+    if target is combinatorics.multinomial:
+        return lgamma(sum(values) + 1) - sum(lgamma(value + 1) for value in values)
+    n, k = values
+    log = lgamma(n + 1) - lgamma(n - k + 1)
+    return log - lgamma(k + 1) if target is combinatorics.nCr else log
+
+
+def _valid_count(target, values):
+    if any(not isinstance(value, int) or value < 0 for value in values):
+        return False
+    return target is combinatorics.multinomial or (len(values) == 2 and values[1] <= values[0])
+
+
+def _estimate_counting(target, args):
+    if not all(arg[0] for arg in args):
+        return _FLOAT
+    values = [arg[2] for arg in args]
+    if None in values:
+        # All of them are at most N! for N the sum of the arguments.
+        return _estimate_factorial((True, max(arg[1] for arg in args) + len(args).bit_length(), None))
+    if not _valid_count(target, values):
+        return True, 1, None  # 0, or an error raised before any allocation
+    bits = math.ceil(_log_count(target, values) / math.log(2)) + 1
+    return _with_value(bits, lambda: target(*values))
+
+
+def _estimate_binary(op, left, right, exact=False):
+    if op == '**':
+        return _estimate_power(left, right)
+    if not (left[0] and right[0]) or (op == '/' and not exact):
+        return _FLOAT
+    a, b = left[2], right[2]
+    if op == '/':
+        # Exact division: a fraction as large as both operands together.
+        if a is not None and b and a % b == 0:
+            return True, (a // b).bit_length(), a // b
+        return True, left[1] + right[1], None
+    if op in ('+', '-'):
+        bits = max(left[1], right[1]) + 1
+    elif op == '*':
+        bits = left[1] + right[1]
+    elif op == '//':
+        bits = left[1]
+    else:  # '%'
+        bits = right[1]
+    if a is None or b is None:
+        return True, bits, None
+    return _with_value(bits, lambda: BINARY_OPERATORS[op](a, b))
+
+
+def _estimate_call(func, args, namespace):
+    target = namespace.get(func)
+    if target in FACTORIALS and len(args) == 1:
+        return _estimate_factorial(args[0])
+    if target in COUNTING:
+        return _estimate_counting(target, args)
+    if target is pow and len(args) == 2:
+        return _estimate_power(*args)
+    if target is pow and len(args) == 3:
+        return (True, args[2][1], None) if all(arg[0] for arg in args) else _FLOAT
+    if target is abs and len(args) == 1:
+        is_int, bits, value = args[0]
+        return is_int, bits, abs(value) if value is not None else None
+    return _FLOAT
+
+
+def estimate_bits(tree, namespace, env=None, exact=False):
+    """
+    Estimate the bit length of the largest exact integer evaluating `tree` creates.
+
+    Variables are read from `env`; a variable that is not supplied is assumed
+    to be a float. Only integer (and, with `exact`, rational) arithmetic is
+    counted: float operations fail fast with OverflowError instead of allocating.
+    """
+    worst = 0
+    results = []
+    stack = [(tree, False)]
+    while stack:
+        node, children_done = stack.pop()
+        node_type = type(node)
+        if node_type is Number:
+            estimate = _leaf(node.value)
+        elif node_type is Name:
+            if env is not None and node.id in env:
+                estimate = _leaf(env[node.id])
+            else:
+                estimate = _leaf(namespace.get(node.id))
+        elif not children_done:
+            stack.append((node, True))
+            children = (node.left, node.right) if node_type is BinOp else \
+                (node.operand,) if node_type is UnaryOp else node.args
+            stack.extend((child, False) for child in reversed(children))
+            continue
+        elif node_type is BinOp:
+            right = results.pop()
+            estimate = _estimate_binary(node.op, results.pop(), right, exact)
+        elif node_type is UnaryOp:
+            is_int, bits, value = results.pop()
+            estimate = is_int, bits, (-value if node.op == '-' else value) if value is not None else None
+        else:
+            count = len(node.args)
+            args = results[len(results) - count:]
+            del results[len(results) - count:]
+            estimate = _estimate_call(node.func, args, namespace)
+        if estimate[0] and estimate[1] > worst:
+            worst = estimate[1]
+        results.append(estimate)
+    return worst
+
+
+# --- Log-Space Approximation ---
+# Values are (sign, log10 of the magnitude, exact value or None); zero has a
+# log10 of -inf. The exact value is kept while it is float-sized, so small
+# subexpressions (such as the exponent in `10**10**8`) lose no precision.
+
+EXACT_LOG10 = 300
+
+
+def _item(value):
+    if isinstance(value, Approximation):
+        return value.sign, value.log10, None
+    if type(value) is Rational:
+        if not value:
+            return 0, -INF, 0
+        # A small fraction can still have huge terms, so fractions are never carried exactly.
+        return (1 if value.num > 0 else -1), math.log10(abs(value.num)) - math.log10(value.den), None
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise TypeError(f"unsupported operand type: {type(value).__name__}")
+    if value == 0:
+        return 0, -INF, value
+    if isinstance(value, float) and not math.isfinite(value):
+        raise OverflowError("result is not finite")
+    log10 = math.log10(abs(value))
+    return (1 if value > 0 else -1), log10, value if log10 < EXACT_LOG10 else None
+
+
+def _from_log(sign, log10):
+    if sign == 0:
+        return 0.0
+    if log10 == INF:
+        raise ResultTooLarge("Result too large to approximate")
+    if log10 < FLOAT_MAX_LOG10:
+        return sign * 10.0 ** log10
+    return Approximation(sign, log10)
+
+
+def _as_number(item):
+    if item[2] is not None:
+        return item[2]
+    value = _from_log(item[0], item[1])
+    if isinstance(value, Approximation):
+        raise ResultTooLarge("Intermediate value too large to approximate")
+    return value
+
+
+def _combine(sign, log10, exact, args):
+    """Use the exact result when every operand is known and the result is float-sized."""
+    if log10 < EXACT_LOG10 and all(arg[2] is not None for arg in args):
+        return _item(exact(*[arg[2] for arg in args]))
+    return sign, log10, None
+
+
+def _log_add(a, b):
+    if a[0] == 0:
+        return b[:2]
+    if b[0] == 0:
+        return a[:2]
+    high, low = (a, b) if a[1] >= b[1] else (b, a)
+    ratio = 10.0 ** (low[1] - high[1])
+    if high[0] == low[0]:
+        return high[0], high[1] + math.log10(1 + ratio)
+    if ratio == 1:
+        return 0, -INF
+    return high[0], high[1] + math.log10(1 - ratio)
+
+
+def _log_div(a, b):
+    if b[0] == 0:
+        raise ZeroDivisionError("division by zero")
+    if a[0] == 0:
+        return 0, -INF
+    return a[0] * b[0], a[1] - b[1]
+
+
+def _log_pow(base, exponent):
+    power = _as_number(exponent)
+    if base[0] == 0:
+        if power < 0:
+            raise ZeroDivisionError("0.0 cannot be raised to a negative power")
+        return (0, -INF) if power else (1, 0.0)
+    sign = 1
+    if base[0] < 0:
+        if power != int(power):
+            raise ValueError("negative number cannot be raised to a fractional power")
+        sign = -1 if int(power) % 2 else 1
+    return sign, power * base[1]
+
+
+def _log_factorial(arg):
+    n = _as_number(arg)
+    if n < 0 or n != int(n):
+        raise ValueError("factorial() only accepts non-negative integral values")
+    return 1, math.lgamma(n + 1) / math.log(10)
+
+
+def _log_binary(op, a, b, operators=BINARY_OPERATORS):
+    if op == '%':
+        return _item(_as_number(a) % _as_number(b))
+    if op == '+':
+        sign, log10 = _log_add(a, b)
+    elif op == '-':
+        sign, log10 = _log_add(a, (-b[0], b[1]))
+    elif op == '*':
+        sign, log10 = (0, -INF) if a[0] == 0 or b[0] == 0 else (a[0] * b[0], a[1] + b[1])
+    elif op in ('/', '//'):
+        sign, log10 = _log_div(a, b)
+        if op == '//' and log10 < 15 and (a[2] is None or b[2] is None):
+            return _item(_as_number(a) // _as_number(b))  # small enough for the floor to matter
+    else:
+        sign, log10 = _log_pow(a, b)
+    return _combine(sign, log10, operators[op], (a, b))
+
+
+def _log_call(func, target, args):
+    if target in FACTORIALS and len(args) == 1:
+        return _combine(*_log_factorial(args[0]), target, args)
+    if target in COUNTING:
+        values = [_as_number(arg) for arg in args]
+        if not _valid_count(target, values):
+            return _item(target(*values))
+        return _combine(1, _log_count(target, values) / math.log(10), target, args)
+    if target is pow and len(args) == 2:
+        return _combine(*_log_pow(*args), target, args)
+    if target is abs and len(args) == 1:
+        sign, log10, value = args[0]
+        return abs(sign), log10, abs(value) if value is not None else None
+    # Functions that shrink huge inputs are applied to the logarithm directly.
+    if len(args) == 1 and args[0][2] is None and args[0][0] > 0:
+        log10 = args[0][1]
+        if func == 'log10':
+            return _item(log10)
+        if func == 'log':
+            return _item(log10 * math.log(10))
+        if func == 'sqrt':
+            return 1, log10 / 2, None
+        if func == 'cbrt':
+            return 1, log10 / 3, None
+    return _item(target(*[_as_number(arg) for arg in args]))
+
+
+def approximate(tree, namespace, env=None, exact=False):
+    """
+    Evaluate `tree` in log space without building any large integer.
+
+    Returns a float (or a small exact int) when the result fits, an
+    `Approximation` otherwise. `%` and functions other than pow, factorial,
+    the counting functions, abs, log, log10, sqrt and cbrt need their
+    operands within float range. `exact` selects exact-mode division for
+    float-sized subresults.
+    """
+    operators = EXACT_BINARY_OPERATORS if exact else BINARY_OPERATORS
+    results = []
+    stack = [(tree, False)]
+    while stack:
+        node, children_done = stack.pop()
+        node_type = type(node)
+        if node_type is Number:
+            results.append(_item(node.value))
+        elif node_type is Name:
+            if env is not None and node.id in env:
+                results.append(_item(env[node.id]))
+            elif node.id in namespace:
+                results.append(_item(namespace[node.id]))
+            else:
+                raise NameError(f"name '{node.id}' is not defined")
+        elif not children_done:
+            stack.append((node, True))
+            children = (node.left, node.right) if node_type is BinOp else \
+                (node.operand,) if node_type is UnaryOp else node.args
+            stack.extend((child, False) for child in reversed(children))
+        elif node_type is BinOp:
+            right = results.pop()
+            results[-1] = _log_binary(node.op, results[-1], right, operators)
+        elif node_type is UnaryOp:
+            sign, log10, value = results[-1]
+            if node.op == '-':
+                results[-1] = -sign, log10, -value if value is not None else None
+        else:
+            if node.func not in namespace:
+                raise NameError(f"name '{node.func}' is not defined")
+            count = len(node.args)
+            args = results[len(results) - count:]
+            del results[len(results) - count:]
+            results.append(_log_call(node.func, namespace[node.func], args))
+    sign, log10, value = results[0]
+    return value if value is not None else _from_log(sign, log10)
+
+
+# --- Guarded Compilation ---
+
+def free_variables(tree, variables):
+    """Return the names from `variables` that occur in `tree`."""
+    found = set()
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        node_type = type(node)
+        if node_type is Name:
+            if node.id in variables:
+                found.add(node.id)
+        elif node_type is BinOp:
+            stack.extend((node.left, node.right))
+        elif node_type is UnaryOp:
+            stack.append(node.operand)
+        elif node_type is Call:
+            stack.extend(node.args)
+    return found
+
+
+class CostModel:
+    """
+    Guards compilation against results larger than `max_bits`.
+
+    `policy` decides what happens to an expression over budget: REJECT raises
+    `ResultTooLarge`, APPROXIMATE evaluates it in log space instead.
+    """
+
+    def __init__(self, max_bits=DEFAULT_MAX_BITS, policy=APPROXIMATE):
+        if policy not in POLICIES:
+            raise ValueError(f"policy must be one of {', '.join(POLICIES)}")
+        self.max_bits = max_bits
+        self.policy = policy
+
+    def over_budget(self, tree, namespace, env=None, exact=False):
+        return estimate_bits(tree, namespace, env, exact) > self.max_bits
+
+    def _too_large(self, tree, namespace, env, exact=False):
+        if self.policy == APPROXIMATE:
+            return approximate(tree, namespace, env, exact)
+        bits = estimate_bits(tree, namespace, env, exact)
+        if bits == INF:
+            raise ResultTooLarge("Result too large")
+        raise ResultTooLarge(f"Result too large (about {int(bits * LOG10_2):,} digits)")
+
+    def evaluate(self, tree, namespace, env=None, exact=False):
+        """Evaluate `tree` once without compiling it (see evaluator.evaluate_tree), after the same cost check."""
+        if self.over_budget(tree, namespace, env, exact):
+            return self._too_large(tree, namespace, env, exact)
+        return evaluate_tree(tree, namespace, env, exact)
+
+    def compile(self, tree, evaluator, namespace, variables=(), exact=False):
+        """
+        Compile `tree` with `evaluator`, checking the cost first.
+
+        The check runs once here, before constant folding can do any big-int
+        work. Expressions that reference variables (ANS) are checked again on
+        every call, against the actual values. `exact` compiles for exact
+        mode (see omnicalc.exact).
+        """
+        if self.over_budget(tree, namespace, None, exact):
+            if self.policy == REJECT:
+                self._too_large(tree, namespace, None, exact)
+            return CompiledExpression(tree, lambda env: approximate(tree, namespace, env, exact), variables)
+
+        if exact:
+            compiled = evaluator.compile(tree, namespace, variables, exact=True)
+        else:
+            compiled = evaluator.compile(tree, namespace, variables)
+        if not free_variables(tree, variables):
+            return compiled
+
+        function = compiled.function
+
+        def guarded(env):
+            # Float variables estimate exactly as the missing ones did above, so
+            # the check only has to run again when some variable is not a float.
+            if env and any(type(value) is not float for value in env.values()) \
+                    and self.over_budget(tree, namespace, env, exact):
+                return self._too_large(tree, namespace, env, exact)
+            return function(env)
+        return CompiledExpression(tree, guarded, variables)
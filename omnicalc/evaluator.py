@@ -0,0 +1,418 @@
+"""
+Evaluation backends for parsed expression trees.
+
+`ClosureEvaluator` turns a tree into nested Python closures once: function
+names are looked up in the namespace at compile time, constant subtrees are
+folded, and evaluating the result never touches eval() or CPython's compiler.
+Trees are walked with an explicit stack, and a tree too deep for nested
+closures (their calls would exceed the recursion limit) runs as a flat
+postfix program instead, so `1+1+...` with thousands of terms still works.
+`PythonEvaluator` keeps the previous behaviour (compile the tree to a code
+object and run it through a restricted eval()) for comparison.
+
+Both accept `exact=True` for exact mode, where `/` is omnicalc.exact's
+exact_divide instead of true division. Number literals may be of any numeric
+type (e.g. decimal.Decimal in precision mode).
+"""
+
+import operator
+
+from omnicalc.exact import Rational, exact_divide
+from omnicalc.parser import Number, Name, UnaryOp, BinOp, Call, to_python_ast
+
+
+BINARY_OPERATORS = {
+    '+': operator.add, '-': operator.sub, '*': operator.mul, '/': operator.truediv,
+    '//': operator.floordiv, '%': operator.mod, '**': operator.pow,
+}
+UNARY_OPERATORS = {'-': operator.neg, '+': operator.pos}
+EXACT_BINARY_OPERATORS = {**BINARY_OPERATORS, '/': exact_divide}
+
+# Specialized closure factories per operator, for (closure, closure),
+# (closure, constant) and (constant, closure) operands. Spelling the operator
+# out inline saves a function call per node compared to operator.add etc.
+_BINARY_CLOSURES = {
+    '+': (lambda l, r: lambda env: l(env) + r(env),
+          lambda l, r: lambda env: l(env) + r,
+          lambda l, r: lambda env: l + r(env)),
+    '-': (lambda l, r: lambda env: l(env) - r(env),
+          lambda l, r: lambda env: l(env) - r,
+          lambda l, r: lambda env: l - r(env)),
+    '*': (lambda l, r: lambda env: l(env) * r(env),
+          lambda l, r: lambda env: l(env) * r,
+          lambda l, r: lambda env: l * r(env)),
+    '/': (lambda l, r: lambda env: l(env) / r(env),
+          lambda l, r: lambda env: l(env) / r,
+          lambda l, r: lambda env: l / r(env)),
+    '//': (lambda l, r: lambda env: l(env) // r(env),
+           lambda l, r: lambda env: l(env) // r,
+           lambda l, r: lambda env: l // r(env)),
+    '%': (lambda l, r: lambda env: l(env) % r(env),
+          lambda l, r: lambda env: l(env) % r,
+          lambda l, r: lambda env: l % r(env)),
+    '**': (lambda l, r: lambda env: l(env) ** r(env),
+           lambda l, r: lambda env: l(env) ** r,
+           lambda l, r: lambda env: l ** r(env)),
+}
+_EXACT_BINARY_CLOSURES = {
+    **_BINARY_CLOSURES,
+    '/': (lambda l, r: lambda env: exact_divide(l(env), r(env)),
+          lambda l, r: lambda env: exact_divide(l(env), r),
+          lambda l, r: lambda env: exact_divide(l, r(env))),
+}
+
+
+class CompiledExpression:
+    """A compiled expression; call it with a mapping of variable values (or nothing)."""
+
+    __slots__ = ('tree', 'function', 'variables')
+
+    def __init__(self, tree, function, variables=()):
+        self.tree = tree
+        self.function = function
+        self.variables = frozenset(variables)
+
+    def __call__(self, env=None):
+        return self.function(env)
+
+
+class _Constant:
+    """Marks a subtree whose value is already known at compile time."""
+
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+
+def _as_closure(item):
+    if type(item) is _Constant:
+        value = item.value
+        return lambda env: value
+    return item
+
+
+def _binary(op, left, right, fold, exact=False):
+    both, with_right_constant, with_left_constant = (_EXACT_BINARY_CLOSURES if exact else _BINARY_CLOSURES)[op]
+    left_const = type(left) is _Constant
+    right_const = type(right) is _Constant
+    if left_const and right_const:
+        if fold:
+            try:
+                operators = EXACT_BINARY_OPERATORS if exact else BINARY_OPERATORS
+                return _Constant(operators[op](left.value, right.value))
+            except Exception:
+                pass  # leave the error to be raised when the expression is evaluated
+        left, left_const = _as_closure(left), False
+    if right_const:
+        return with_right_constant(left, right.value)
+    if left_const:
+        return with_left_constant(left.value, right)
+    return both(left, right)
+
+
+def _unary(op, operand, fold):
+    if type(operand) is _Constant:
+        if fold:
+            try:
+                return _Constant(UNARY_OPERATORS[op](operand.value))
+            except Exception:
+                pass
+        operand = _as_closure(operand)
+    if op == '-':
+        return lambda env: -operand(env)
+    return lambda env: +operand(env)
+
+
+def _call(func, args, fold):
+    if fold and all(type(arg) is _Constant for arg in args):
+        try:
+            return _Constant(func(*[arg.value for arg in args]))
+        except Exception:
+            pass
+    if len(args) == 1:
+        arg = args[0]
+        if type(arg) is _Constant:
+            value = arg.value
+            return lambda env: func(value)
+        return lambda env: func(arg(env))
+    if len(args) == 2:
+        first, second = (_as_closure(arg) for arg in args)
+        return lambda env: func(first(env), second(env))
+    closures = tuple(_as_closure(arg) for arg in args)
+    return lambda env: func(*[arg(env) for arg in closures])
+
+
+# Nested closures call each other once per level; deeper trees run as a postfix program.
+MAX_CLOSURE_DEPTH = 200
+
+_PUSH, _LOAD, _BINARY, _UNARY, _CALL = range(5)
+
+
+def compile_tree(tree, namespace, variables=(), fold_constants=True, exact=False):
+    """
+    Compile an expression tree into a `CompiledExpression`.
+
+    Names listed in `variables` are read from the mapping passed at call time;
+    every other name must resolve in `namespace`, otherwise NameError is raised.
+    Functions in the namespace are assumed to be pure, so calls with constant
+    arguments are folded when `fold_constants` is true. With `exact`, `/` is
+    exact division (see omnicalc.exact).
+    """
+    variables = frozenset(variables)
+    # Post-order walk with an explicit stack; `results` holds a closure or _Constant per finished
+    # subtree and `depths` how deeply its closures nest.
+    results = []
+    depths = []
+    stack = [(tree, False)]
+    while stack:
+        node, children_done = stack.pop()
+        node_type = type(node)
+        if node_type is Number:
+            results.append(_Constant(node.value))
+            depths.append(0)
+        elif node_type is Name:
+            name = node.id
+            if name in variables:
+                results.append(lambda env, name=name: env[name])
+                depths.append(1)
+            elif name not in namespace:
+                raise NameError(f"name '{name}' is not defined")
+            else:
+                results.append(_Constant(namespace[name]))
+                depths.append(0)
+        elif not children_done:
+            stack.append((node, True))
+            if node_type is BinOp:
+                stack.append((node.right, False))
+                stack.append((node.left, False))
+            elif node_type is UnaryOp:
+                stack.append((node.operand, False))
+            else:
+                if node.func not in namespace:
+                    raise NameError(f"name '{node.func}' is not defined")
+                stack.extend([(arg, False) for arg in reversed(node.args)])
+        else:
+            if node_type is BinOp:
+                right = results.pop()
+                built = _binary(node.op, results.pop(), right, fold_constants, exact)
+                depth = max(depths.pop(), depths.pop())
+            elif node_type is UnaryOp:
+                built = _unary(node.op, results.pop(), fold_constants)
+                depth = depths.pop()
+            else:
+                count = len(node.args)
+                args = results[len(results) - count:]
+                del results[len(results) - count:]
+                built = _call(namespace[node.func], args, fold_constants)
+                depth = max(depths[len(depths) - count:], default=0)
+                del depths[len(depths) - count:]
+            results.append(built)
+            depths.append(0 if type(built) is _Constant else depth + 1)
+
+    if depths[0] > MAX_CLOSURE_DEPTH:
+        # Calling closures nested this deep would exceed the recursion limit.
+        program = _postfix(tree, namespace, variables, fold_constants, exact)
+        return CompiledExpression(tree, _program_function(program), variables)
+    return CompiledExpression(tree, _as_closure(results[0]), variables)
+
+
+def _postfix(tree, namespace, variables, fold_constants, exact):
+    """`tree` as a list of (code, argument, count) instructions, constant subtrees folded to one push."""
+    operators = EXACT_BINARY_OPERATORS if exact else BINARY_OPERATORS
+    program = []
+    starts = []  # where each finished subtree's instructions begin
+    stack = [(tree, False)]
+    while stack:
+        node, children_done = stack.pop()
+        node_type = type(node)
+        start = len(program)
+        if node_type is Number:
+            program.append((_PUSH, node.value, 0))
+        elif node_type is Name:
+            name = node.id
+            program.append((_LOAD, name, 0) if name in variables else (_PUSH, namespace[name], 0))
+        elif not children_done:
+            stack.append((node, True))
+            children = (node.left, node.right) if node_type is BinOp else \
+                (node.operand,) if node_type is UnaryOp else node.args
+            stack.extend((child, False) for child in reversed(children))
+            continue
+        else:
+            count = 2 if node_type is BinOp else 1 if node_type is UnaryOp else len(node.args)
+            if count:
+                start = starts[len(starts) - count]
+                del starts[len(starts) - count:]
+            if node_type is BinOp:
+                function, instruction = operators[node.op], (_BINARY, operators[node.op], 0)
+            elif node_type is UnaryOp:
+                function, instruction = UNARY_OPERATORS[node.op], (_UNARY, UNARY_OPERATORS[node.op], 0)
+            else:
+                function = namespace[node.func]
+                instruction = (_CALL, function, count)
+            children = program[start:]
+            if fold_constants and len(children) == count and all(code == _PUSH for code, _, _ in children):
+                try:
+                    value = function(*[argument for _, argument, _ in children])
+                except Exception:
+                    program.append(instruction)  # leave the error to be raised when evaluated
+                else:
+                    del program[start:]
+                    program.append((_PUSH, value, 0))
+            else:
+                program.append(instruction)
+        starts.append(start)
+    return program
+
+
+def _program_function(program):
+    """Evaluate a postfix `program` with a value stack (no recursion, whatever the depth)."""
+    def run(env):
+        stack = []
+        push, pop = stack.append, stack.pop
+        for code, argument, count in program:
+            if code == _PUSH:
+                push(argument)
+            elif code == _LOAD:
+                push(env[argument])
+            elif code == _BINARY:
+                right = pop()
+                stack[-1] = argument(stack[-1], right)
+            elif code == _UNARY:
+                stack[-1] = argument(stack[-1])
+            else:
+                args = stack[len(stack) - count:]
+                del stack[len(stack) - count:]
+                push(argument(*args))
+        return stack[0]
+    return run
+
+
+def evaluate_tree(tree, namespace, env=None, exact=False):
+    """
+    Evaluate `tree` once by walking it, without compiling or folding anything.
+
+    For an expression evaluated only once this is cheaper than compile_tree()
+    followed by a call. Names are read from `env` first, then `namespace`;
+    any other name raises NameError.
+    """
+    operators = EXACT_BINARY_OPERATORS if exact else BINARY_OPERATORS
+    env = env or {}
+    results = []
+    stack = [(tree, False)]
+    while stack:
+        node, children_done = stack.pop()
+        node_type = type(node)
+        if node_type is Number:
+            results.append(node.value)
+        elif node_type is Name:
+            name = node.id
+            if name in env:
+                results.append(env[name])
+            elif name in namespace:
+                results.append(namespace[name])
+            else:
+                raise NameError(f"name '{name}' is not defined")
+        elif not children_done:
+            stack.append((node, True))
+            if node_type is BinOp:
+                stack.append((node.right, False))
+                stack.append((node.left, False))
+            elif node_type is UnaryOp:
+                stack.append((node.operand, False))
+            else:
+                if node.func not in namespace:
+                    raise NameError(f"name '{node.func}' is not defined")
+                stack.extend([(arg, False) for arg in reversed(node.args)])
+        elif node_type is BinOp:
+            right = results.pop()
+            results[-1] = operators[node.op](results[-1], right)
+        elif node_type is UnaryOp:
+            results[-1] = UNARY_OPERATORS[node.op](results[-1])
+        else:
+            count = len(node.args)
+            args = results[len(results) - count:]
+            del results[len(results) - count:]
+            results.append(namespace[node.func](*args))
+    return results[0]
+
+
+# --- Pluggable Backends ---
+
+class ClosureEvaluator:
+    """Compiles trees to closures; the default backend."""
+
+    name = 'closure'
+
+    def __init__(self, fold_constants=True):
+        self.fold_constants = fold_constants
+
+    def compile(self, tree, namespace, variables=(), exact=False):
+        return compile_tree(tree, namespace, variables, self.fold_constants, exact)
+
+
+class PythonEvaluator:
+    """Compiles trees to CPython code objects and runs them with a restricted eval()."""
+
+    name = 'eval'
+
+    def compile(self, tree, namespace, variables=(), exact=False):
+        # Code objects can only hold plain constants: spell exact values and
+        # exact division as calls to helpers, and other literals (Decimal) as
+        # names, all added to the namespace.
+        tree, constants = _code_tree(tree, exact)
+        if exact:
+            namespace = {**namespace, '_rational': Rational, '_exact_divide': exact_divide}
+        if constants:
+            namespace = {**namespace, **constants}
+        code = compile(to_python_ast(tree), '<expression>', 'eval')
+        restricted_globals = {"__builtins__": None}
+
+        def function(env):
+            scope = namespace if not env else {**namespace, **env}
+            return eval(code, restricted_globals, scope)
+        return CompiledExpression(tree, function, variables)
+
+
+def _code_tree(tree, exact):
+    """
+    Rewrite `tree` for PythonEvaluator: Rational literals (and `/` when
+    `exact`) become helper calls, literals that are not int/float become
+    names. Returns the tree and a dict of those names.
+    """
+    constants = {}
+    results = []
+    stack = [(tree, False)]
+    while stack:
+        node, children_done = stack.pop()
+        node_type = type(node)
+        if node_type is Number:
+            value = node.value
+            value_type = type(value)
+            if value_type is Rational:
+                node = Call('_rational', (Number(value.num), Number(value.den)))
+            elif value_type is not int and value_type is not float:
+                name = f'_c{len(constants)}'
+                constants[name] = value
+                node = Name(name)
+            results.append(node)
+        elif node_type is Name:
+            results.append(node)
+        elif not children_done:
+            stack.append((node, True))
+            children = (node.left, node.right) if node_type is BinOp else \
+                (node.operand,) if node_type is UnaryOp else node.args
+            stack.extend((child, False) for child in reversed(children))
+        elif node_type is BinOp:
+            right = results.pop()
+            left = results.pop()
+            results.append(Call('_exact_divide', (left, right)) if exact and node.op == '/'
+                           else BinOp(node.op, left, right))
+        elif node_type is UnaryOp:
+            results.append(UnaryOp(node.op, results.pop()))
+        else:
+            count = len(node.args)
+            args = tuple(results[len(results) - count:])
+            del results[len(results) - count:]
+            results.append(Call(node.func, args))
+    return results[0], constants
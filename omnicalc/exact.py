@@ -0,0 +1,375 @@
+"""
+Exact rational arithmetic for the calculator's exact mode.
+
+In exact mode decimal literals are parsed digit for digit into `Rational`
+values (see parse_exact) and `/` between exact operands is exact, so `0.1+0.2`, percentages and M+/M- chains carry no
+binary rounding error. Transcendental functions receive the value through
+__float__ and return floats, which then propagate as usual.
+
+Two things keep this fast compared with fractions.Fraction:
+
+* Integers stay plain ints. `exact_divide` returns an int when the division
+  is exact, so integer-only work never leaves CPython's int fast paths, and
+  Rational falls back to int operands without converting them.
+* Normalization is lazy. Results are reduced by their gcd only when the
+  numerator or denominator grows past NORMALIZE_BITS (and before output,
+  hashing or `int()`), so a chain of `+`/`*` pays one gcd now and then
+  instead of one per operation. Once the operands themselves are that large,
+  `+` and `*` switch to the cross-gcd formulas (Knuth, TAOCP 4.5.1) that
+  fractions.Fraction uses, so every gcd runs on the smaller operands.
+  Comparisons cross-multiply and never reduce.
+"""
+
+import math
+from numbers import Rational as _RationalABC
+
+
+NORMALIZE_BITS = 256
+# Literals with a larger power of ten (1e99999999) are read as floats, like
+# float mode, rather than building the power before the cost check runs.
+MAX_LITERAL_EXPONENT = 4096
+# Decimal digits shown for terminating results before falling back to n/d.
+MAX_DECIMAL_DIGITS = 40
+
+
+def _large(den, other_den):
+    return den.bit_length() > NORMALIZE_BITS or other_den.bit_length() > NORMALIZE_BITS
+
+
+def _reduced(num, den):
+    """Rational (or int) from ints already in lowest terms with den > 0."""
+    if den == 1:
+        return num
+    result = Rational.__new__(Rational)
+    result.num = num
+    result.den = den
+    return result
+
+
+def _add(na, da, nb, db):
+    if da == db:
+        return _make(na + nb, da)
+    if not _large(da, db):
+        return _make(na * db + nb * da, da * db)
+    g = math.gcd(da, db)
+    if g == 1:
+        return _reduced(na * db + nb * da, da * db)
+    s = da // g
+    t = na * (db // g) + nb * s
+    g2 = math.gcd(t, g)
+    if g2 == 1:
+        return _reduced(t, s * db)
+    return _reduced(t // g2, s * (db // g2))
+
+
+def _mul(na, da, nb, db):
+    if not _large(da, db):
+        return _make(na * nb, da * db)
+    g1 = math.gcd(na, db)
+    if g1 > 1:
+        na //= g1
+        db //= g1
+    g2 = math.gcd(nb, da)
+    if g2 > 1:
+        nb //= g2
+        da //= g2
+    return _reduced(na * nb, da * db)
+
+
+def _make(num, den):
+    """Rational from ints with den > 0, reducing only when they have grown large."""
+    if num.bit_length() > NORMALIZE_BITS or den.bit_length() > NORMALIZE_BITS:
+        g = math.gcd(num, den)
+        if g != 1:
+            num //= g
+            den //= g
+    if den == 1:
+        return num
+    result = Rational.__new__(Rational)
+    result.num = num
+    result.den = den
+    return result
+
+
+class Rational:
+    """A fraction num/den (den > 0) that is not necessarily in lowest terms."""
+
+    __slots__ = ('num', 'den')
+
+    def __init__(self, num, den=1):
+        if den == 0:
+            raise ZeroDivisionError("division by zero")
+        if den < 0:
+            num, den = -num, -den
+        self.num = num
+        self.den = den
+
+    def normalize(self):
+        """Reduce to lowest terms in place; returns self."""
+        g = math.gcd(self.num, self.den)
+        if g != 1:
+            self.num //= g
+            self.den //= g
+        return self
+
+    def _pair(self, other):
+        """(num, den) of `other`, or None if it is not exact."""
+        other_type = type(other)
+        if other_type is int:
+            return other, 1
+        if other_type is Rational:
+            return other.num, other.den
+        if isinstance(other, _RationalABC):  # e.g. fractions.Fraction
+            return other.numerator, other.denominator
+        return None
+
+    # --- Arithmetic ---
+
+    def __add__(self, other):
+        pair = self._pair(other)
+        if pair is None:
+            return float(self) + other if isinstance(other, float) else NotImplemented
+        return _add(self.num, self.den, *pair)
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        pair = self._pair(other)
+        if pair is None:
+            return float(self) - other if isinstance(other, float) else NotImplemented
+        return _add(self.num, self.den, -pair[0], pair[1])
+
+    def __rsub__(self, other):
+        return -self + other
+
+    def __mul__(self, other):
+        pair = self._pair(other)
+        if pair is None:
+            return float(self) * other if isinstance(other, float) else NotImplemented
+        return _mul(self.num, self.den, *pair)
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, other):
+        pair = self._pair(other)
+        if pair is None:
+            return float(self) / other if isinstance(other, float) else NotImplemented
+        num, den = pair
+        if num == 0:
+            raise ZeroDivisionError("division by zero")
+        if num < 0:
+            num, den = -num, -den
+        return _mul(self.num, self.den, den, num)
+
+    def __rtruediv__(self, other):
+        if isinstance(other, float):
+            return other / float(self)
+        pair = self._pair(other)
+        if pair is None:
+            return NotImplemented
+        return Rational(*pair).__truediv__(self)
+
+    def __floordiv__(self, other):
+        pair = self._pair(other)
+        if pair is None:
+            return float(self) // other if isinstance(other, float) else NotImplemented
+        return (self.num * pair[1]) // (self.den * pair[0])
+
+    def __rfloordiv__(self, other):
+        if isinstance(other, float):
+            return other // float(self)
+        pair = self._pair(other)
+        return NotImplemented if pair is None else (pair[0] * self.den) // (pair[1] * self.num)
+
+    def __mod__(self, other):
+        pair = self._pair(other)
+        if pair is None:
+            return float(self) % other if isinstance(other, float) else NotImplemented
+        return self - other * (self // other)
+
+    def __rmod__(self, other):
+        if isinstance(other, float):
+            return other % float(self)
+        return NotImplemented if self._pair(other) is None else other - self * (other // self)
+
+    def __pow__(self, other):
+        exponent = _integral(other)
+        if exponent is None:
+            return float(self) ** other
+        if exponent >= 0:
+            return _make(self.num ** exponent, self.den ** exponent)
+        if self.num == 0:
+            raise ZeroDivisionError("0.0 cannot be raised to a negative power")
+        result = Rational(self.den ** -exponent, self.num ** -exponent)
+        return result.num if result.den == 1 else result
+
+    def __rpow__(self, other):
+        exponent = _integral(self)
+        if exponent is not None:
+            return other ** exponent
+        return other ** float(self)
+
+    def __neg__(self):
+        return _make(-self.num, self.den)
+
+    def __pos__(self):
+        return self
+
+    def __abs__(self):
+        return _make(abs(self.num), self.den)
+
+    # --- Comparison and conversion ---
+
+    def _compare(self, other, compare):
+        if isinstance(other, float):
+            if not math.isfinite(other):
+                return compare(0, other)
+            other = Rational(*other.as_integer_ratio())
+        pair = self._pair(other)
+        if pair is None:
+            return NotImplemented
+        return compare(self.num * pair[1], pair[0] * self.den)
+
+    def __eq__(self, other):
+        return self._compare(other, lambda a, b: a == b)
+
+    def __lt__(self, other):
+        return self._compare(other, lambda a, b: a < b)
+
+    def __le__(self, other):
+        return self._compare(other, lambda a, b: a <= b)
+
+    def __gt__(self, other):
+        return self._compare(other, lambda a, b: a > b)
+
+    def __ge__(self, other):
+        return self._compare(other, lambda a, b: a >= b)
+
+    def __hash__(self):
+        from fractions import Fraction
+        return hash(Fraction(self.num, self.den))
+
+    def __bool__(self):
+        return self.num != 0
+
+    def __float__(self):
+        return self.num / self.den  # correctly rounded, even for huge operands
+
+    def __int__(self):
+        quotient = abs(self.num) // self.den
+        return quotient if self.num >= 0 else -quotient
+
+    def __index__(self):
+        self.normalize()
+        if self.den != 1:
+            raise TypeError("only integral values can be used as integers")
+        return self.num
+
+    def __round__(self, ndigits=None):
+        if ndigits is None:
+            return round(float(self))
+        return round(float(self), ndigits)
+
+    @property
+    def numerator(self):
+        return self.normalize().num
+
+    @property
+    def denominator(self):
+        return self.normalize().den
+
+    def __str__(self):
+        self.normalize()
+        return str(self.num) if self.den == 1 else f"{self.num}/{self.den}"
+
+    def __repr__(self):
+        return f"Rational({self.num}, {self.den})"
+
+
+def _integral(value):
+    """`value` as an int if it is an exactly integral int/Rational, else None."""
+    if type(value) is int:
+        return value
+    if type(value) is Rational:
+        value.normalize()
+        return value.num if value.den == 1 else None
+    return None
+
+
+# --- Helpers for the evaluator and the parser ---
+
+def exact_divide(left, right):
+    """`/` for exact mode: int / int is an int when it divides evenly, a Rational otherwise."""
+    if type(left) is int and type(right) is int:
+        if right == 0:
+            raise ZeroDivisionError("division by zero")
+        if left % right == 0:
+            return left // right
+        return _make(left, right) if right > 0 else _make(-left, -right)
+    if type(left) is int and type(right) is Rational:
+        return right.__rtruediv__(left)
+    return left / right
+
+
+def _decimal_text(text):
+    """The exact int or Rational for decimal text such as '2.5', '.5', '1.' or '1e-3'."""
+    mantissa, _, exponent = text.lower().partition('e')
+    whole, _, fraction = mantissa.partition('.')
+    digits = int(whole + fraction)
+    scale = int(exponent or 0) - len(fraction)
+    if scale >= 0:
+        return digits * 10 ** scale
+    return _make(digits, 10 ** -scale)
+
+
+def parse_exact(text):
+    """Parser number hook for exact mode: every NUMBER token becomes an exact int or Rational."""
+    if text.isdigit():
+        return int(text)
+    _, _, exponent = text.lower().partition('e')
+    if exponent and abs(int(exponent)) > MAX_LITERAL_EXPONENT:
+        return float(text)
+    return _decimal_text(text)
+
+
+def decimal_literal(value):
+    """
+    The exact Rational for a float that came from a decimal literal (a stored
+    value such as the memory register; typed literals go through parse_exact).
+
+    repr() gives the shortest string that round-trips, which is the literal
+    as typed for anything up to 17 significant digits.
+    """
+    if not math.isfinite(value):
+        return value
+    return _decimal_text(repr(value))
+
+
+def to_exact(value):
+    """Convert a stored value (e.g. the memory register) for use in exact mode."""
+    if isinstance(value, float) and math.isfinite(value):
+        if value == int(value):
+            return int(value)
+        return decimal_literal(value)
+    return value
+
+
+def format_exact(value):
+    """Show a Rational as a terminating decimal when it has one, as n/d otherwise."""
+    value.normalize()
+    num, den = value.num, value.den
+    twos = (den & -den).bit_length() - 1
+    rest = den >> twos
+    fives = 0
+    while rest % 5 == 0:
+        rest //= 5
+        fives += 1
+    places = max(twos, fives)
+    if rest != 1 or places > MAX_DECIMAL_DIGITS:
+        return f"{num}/{den}"
+    if places == 0:
+        return str(num)
+    scaled = abs(num) * (10 ** places // den)
+    text = str(scaled).rjust(places + 1, '0')
+    sign = '-' if num < 0 else ''
+    return f"{sign}{text[:-places]}.{text[-places:]}"
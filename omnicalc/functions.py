@@ -0,0 +1,60 @@
+"""The table of functions and constants an expression is allowed to use."""
+
+import math
+
+from omnicalc.combinatorics import factorial, nCr, nPr, multinomial
+from omnicalc.integrate import integral
+
+
+def log_base_y(y, x):
+    """Calculates log base y of x."""
+    try:
+        return math.log(x, y)
+    except ValueError:
+        raise ValueError("Invalid input for log base y: y must be positive and not 1, x must be positive.")
+
+
+def xth_root(y, x):
+    """Calculates the x-th root of y (y^(1/x))."""
+    if x == 0:
+        raise ZeroDivisionError("Cannot take the 0-th root.")
+    if y < 0 and x % 2 == 0:
+        raise ValueError("Cannot take an even root of a negative number.")
+    # Need to handle negative base with odd exponent for real roots
+    if y < 0 and x % 2 != 0:
+        return -((-y)**(1/x))
+    return y**(1/x)
+
+
+def cbrt(x):
+    """The real cube root of x (negative for negative x, as in decimal mode)."""
+    return math.copysign(abs(x) ** (1 / 3), x)
+
+
+def create_safe_dict():
+    """Creates the dictionary of allowed functions for safe evaluation."""
+    safe_dict = {
+        'pi': math.pi, 'e': math.e, 'sqrt': math.sqrt,
+        'cbrt': cbrt,
+        'log': math.log, 'log10': math.log10, 'exp': math.exp, 'abs': abs,
+        'factorial': factorial, 'pow': pow,
+        'nCr': nCr, 'nPr': nPr, 'multinomial': multinomial,  # exact, without building factorials
+        'log_y': log_base_y,  # log base y of x (log(x, y))
+        'y_root_x': xth_root,  # x-th root of y (y**(1/x))
+        'integrate': integral,  # integrate(f, a, b): f is an expression in x (see omnicalc.integrate)
+    }
+
+    # Trig, inverse trig and hyperbolic functions (RAD mode versions)
+    for func in ['sin', 'cos', 'tan', 'asin', 'acos', 'atan', 'sinh', 'cosh', 'tanh', 'asinh', 'acosh', 'atanh']:
+        safe_dict[func] = getattr(math, func)
+
+    # DEG mode versions
+    safe_dict.update({
+        'sind': lambda x: math.sin(math.radians(x)),
+        'cosd': lambda x: math.cos(math.radians(x)),
+        'tand': lambda x: math.tan(math.radians(x)),
+        'asind': lambda x: math.degrees(math.asin(x)),
+        'acosd': lambda x: math.degrees(math.acos(x)),
+        'atand': lambda x: math.degrees(math.atan(x)),
+    })
+    return safe_dict
@@ -0,0 +1,397 @@
+"""
+Persistent calculation history: an append-only log with on-disk indexes.
+
+Three files live in the history directory:
+
+* `history.log` holds the entries, one length-prefixed binary record each:
+  timestamp, mode (DEG, exact, decimal precision), the expression and the
+  result value. Values are stored exactly (ints of any size, exact-mode
+  fractions, decimals), so recalling an old entry gives back the same number.
+* `history.idx` is the byte offset of every record as a little-endian uint64,
+  memory-mapped, so entry i is found in O(1) without reading the log.
+* `history.key` lists fixed-size (first KEY_BYTES of the expression, entry
+  number) records in sorted order, also memory-mapped. A prefix lookup is two
+  binary searches in it, O(log n) page touches.
+
+Opening maps the two index files and reads only the entries appended since
+the key index was last merged (at most MERGE_ENTRIES of them), so start-up
+does not depend on the size of the history. New entries are appended to the
+log and the offset index as they come, and their keys are kept in a small
+sorted list that is merged into `history.key` on close() (or when it grows
+past MERGE_ENTRIES). A record that was half-written when the program died is
+cut off the next time the history is opened. One process at a time has the
+history open: another calculator window started meanwhile keeps none.
+
+Set OMNICALC_HISTORY to choose the directory, or to an empty string to keep
+no history.
+"""
+
+import bisect
+import heapq
+import mmap
+import os
+import struct
+import time
+from collections import namedtuple
+from decimal import Decimal
+
+from omnicalc.cost import Approximation
+from omnicalc.exact import Rational
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+LOG_MAGIC = b'OMNIHST1'
+KEY_MAGIC = b'OMNIKEY1'
+# Leading bytes of the expression stored in the key index; longer prefixes are checked in the log.
+KEY_BYTES = 24
+# Keys kept in memory before they are merged into history.key.
+MERGE_ENTRIES = 65536
+
+_LENGTH = struct.Struct('<I')
+_HEAD = struct.Struct('<dBHBH')  # timestamp, mode flags, precision (0: none), value kind, expression length
+_OFFSET = struct.Struct('<Q')
+_KEY_HEADER = struct.Struct('<8sQ')  # magic, number of entries merged
+_ENTRY_NUMBER = struct.Struct('>Q')  # big-endian, so a key record sorts by expression, then by age
+KEY_RECORD = KEY_BYTES + _ENTRY_NUMBER.size
+
+DEG, EXACT = 1, 2
+FLOAT, INT, RATIONAL, DECIMAL, APPROXIMATION = range(5)
+_FLOAT_VALUE = struct.Struct('<d')
+_APPROXIMATION_VALUE = struct.Struct('<bd')
+
+Entry = namedtuple('Entry', 'index expression value deg exact precision timestamp')
+
+
+def default_directory():
+    """The history directory: $OMNICALC_HISTORY, else ~/.omnicalc; None when the variable is empty."""
+    directory = os.environ.get('OMNICALC_HISTORY')
+    if directory is None:
+        return os.path.join(os.path.expanduser('~'), '.omnicalc')
+    return directory or None
+
+
+# --- Records ---
+
+def _int_bytes(n):
+    return n.to_bytes(n.bit_length() // 8 + 1, 'little', signed=True)
+
+
+def _encode_value(value):
+    if type(value) is int or type(value) is bool:
+        return INT, _int_bytes(int(value))
+    if type(value) is Rational:
+        value.normalize()
+        num = _int_bytes(value.num)
+        return RATIONAL, _LENGTH.pack(len(num)) + num + _int_bytes(value.den)
+    if isinstance(value, Decimal):
+        return DECIMAL, str(value).encode('ascii')
+    if isinstance(value, Approximation):
+        return APPROXIMATION, _APPROXIMATION_VALUE.pack(value.sign, value.log10)
+    return FLOAT, _FLOAT_VALUE.pack(float(value))
+
+
+def _decode_value(kind, data):
+    if kind == INT:
+        return int.from_bytes(data, 'little', signed=True)
+    if kind == RATIONAL:
+        (size,) = _LENGTH.unpack_from(data)
+        num = int.from_bytes(data[4:4 + size], 'little', signed=True)
+        return Rational(num, int.from_bytes(data[4 + size:], 'little', signed=True))
+    if kind == DECIMAL:
+        return Decimal(data.decode('ascii'))
+    if kind == APPROXIMATION:
+        return Approximation(*_APPROXIMATION_VALUE.unpack(data))
+    return _FLOAT_VALUE.unpack(data)[0]
+
+
+def _key(expression_bytes, index):
+    return expression_bytes[:KEY_BYTES].ljust(KEY_BYTES, b'\0') + _ENTRY_NUMBER.pack(index)
+
+
+class _KeyRecords:
+    """The sorted key records of a mapped history.key as a sequence of bytes, for bisect."""
+
+    def __init__(self, mapped, count):
+        self.mapped = mapped
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        start = _KEY_HEADER.size + i * KEY_RECORD
+        return self.mapped[start:start + KEY_RECORD]
+
+
+def _map(handle):
+    size = os.fstat(handle.fileno()).st_size
+    return mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+
+
+# --- History ---
+
+class History:
+    """The history in `directory` (created if needed); entries are numbered from 0, oldest first."""
+
+    def __init__(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self._log = open(os.path.join(directory, 'history.log'), 'a+b')
+        if fcntl is not None:
+            try:
+                fcntl.flock(self._log.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                self._log.close()
+                raise
+        self._idx = open(os.path.join(directory, 'history.idx'), 'a+b')
+        self._log_map = self._idx_map = self._key_map = b''
+        self._recover()
+        self._log_map = _map(self._log)
+        self._idx_map = _map(self._idx)
+        self._mapped_entries = len(self._idx_map) // _OFFSET.size
+        self._offsets = []  # offsets of the entries appended since the index was mapped
+        self._open_keys()
+
+    def _recover(self):
+        """Cut off a torn record (or offset) at the end and index records the offset file missed."""
+        log, idx = self._log, self._idx
+        log_size = os.fstat(log.fileno()).st_size
+        if log_size < len(LOG_MAGIC):
+            log.truncate(0)
+            log.write(LOG_MAGIC)
+            log.flush()
+            log_size = len(LOG_MAGIC)
+        idx_size = os.fstat(idx.fileno()).st_size
+        idx.truncate(idx_size - idx_size % _OFFSET.size)
+        count = idx_size // _OFFSET.size
+        end = len(LOG_MAGIC)
+        while count:
+            idx.seek((count - 1) * _OFFSET.size)
+            (offset,) = _OFFSET.unpack(idx.read(_OFFSET.size))
+            record_end = self._record_end(offset, log_size)
+            if record_end is not None:
+                end = record_end
+                break
+            count -= 1  # its record never made it to the log
+        idx.truncate(count * _OFFSET.size)
+        missing = []
+        while True:
+            record_end = self._record_end(end, log_size)
+            if record_end is None:
+                break
+            missing.append(end)
+            end = record_end
+        if end < log_size:
+            log.truncate(end)
+        if missing:
+            idx.write(b''.join(_OFFSET.pack(offset) for offset in missing))
+            idx.flush()
+
+    def _record_end(self, offset, log_size):
+        if offset + _LENGTH.size > log_size:
+            return None
+        self._log.seek(offset)
+        (length,) = _LENGTH.unpack(self._log.read(_LENGTH.size))
+        end = offset + _LENGTH.size + length
+        return end if end <= log_size else None
+
+    def _open_keys(self):
+        path = os.path.join(self.directory, 'history.key')
+        merged = 0
+        self._key_file = None
+        if os.path.exists(path):
+            self._key_file = open(path, 'rb')
+            self._key_map = _map(self._key_file)
+            if len(self._key_map) >= _KEY_HEADER.size:
+                magic, merged = _KEY_HEADER.unpack_from(self._key_map)
+                if magic != KEY_MAGIC or merged > len(self):
+                    merged = 0
+        self._keys = _KeyRecords(self._key_map, merged)
+        # Entries after the merged ones: their keys are rebuilt from the log, in memory.
+        self._recent_keys = sorted(_key(self._expression_bytes(i), i) for i in range(merged, len(self)))
+
+    def __len__(self):
+        return self._mapped_entries + len(self._offsets)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # --- Reading ---
+
+    def _offset(self, index):
+        if index < self._mapped_entries:
+            return _OFFSET.unpack_from(self._idx_map, index * _OFFSET.size)[0]
+        return self._offsets[index - self._mapped_entries]
+
+    def _record(self, index):
+        offset = self._offset(index)
+        if offset + _LENGTH.size <= len(self._log_map):
+            (length,) = _LENGTH.unpack_from(self._log_map, offset)
+            start = offset + _LENGTH.size
+            return self._log_map[start:start + length]
+        self._log.seek(offset)
+        (length,) = _LENGTH.unpack(self._log.read(_LENGTH.size))
+        return self._log.read(length)
+
+    def _expression_bytes(self, index):
+        record = self._record(index)
+        size = _HEAD.unpack_from(record)[4]
+        return record[_HEAD.size:_HEAD.size + size]
+
+    def __getitem__(self, index):
+        """Entry `index` (negative counts from the newest, -1 is the last answer)."""
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("history index out of range")
+        record = self._record(index)
+        timestamp, flags, precision, kind, size = _HEAD.unpack_from(record)
+        expression = record[_HEAD.size:_HEAD.size + size].decode('utf-8')
+        value = _decode_value(kind, record[_HEAD.size + size:])
+        return Entry(index, expression, value, bool(flags & DEG), bool(flags & EXACT),
+                     precision or None, timestamp)
+
+    def _prefix_keys(self, prefix_bytes):
+        """Sorted key records whose stored prefix agrees with `prefix_bytes` (two binary searches)."""
+        low, high = prefix_bytes[:KEY_BYTES], prefix_bytes[:KEY_BYTES] + b'\xff'  # 0xff never occurs in UTF-8
+        keys = self._keys
+        merged = (keys[i] for i in range(bisect.bisect_left(keys, low), bisect.bisect_left(keys, high)))
+        recent = self._recent_keys[bisect.bisect_left(self._recent_keys, low):
+                                   bisect.bisect_left(self._recent_keys, high)]
+        return heapq.merge(merged, recent)
+
+    def search(self, prefix):
+        """Entries whose expression starts with `prefix`, sorted by expression, then oldest first."""
+        prefix_bytes = prefix.encode('utf-8')
+        for key in self._prefix_keys(prefix_bytes):
+            index = _ENTRY_NUMBER.unpack_from(key, KEY_BYTES)[0]
+            if len(prefix_bytes) <= KEY_BYTES or self._expression_bytes(index).startswith(prefix_bytes):
+                yield self[index]
+
+    def matches(self, prefix, within=None):
+        """
+        Indexes of the entries starting with `prefix`, oldest first, without
+        reading them. `within` may list the matches of a shorter prefix (the
+        query before the last keystroke); a prefix longer than the keys is then
+        checked against those only instead of every entry sharing its key.
+        """
+        prefix_bytes = prefix.encode('utf-8')
+        if within is not None and len(prefix_bytes) > KEY_BYTES:
+            return [index for index in within if self._expression_bytes(index).startswith(prefix_bytes)]
+        indexes = sorted(_ENTRY_NUMBER.unpack_from(key, KEY_BYTES)[0] for key in self._prefix_keys(prefix_bytes))
+        if len(prefix_bytes) > KEY_BYTES:
+            indexes = [index for index in indexes if self._expression_bytes(index).startswith(prefix_bytes)]
+        return indexes
+
+    # --- Writing ---
+
+    def append(self, expression, value, deg=True, exact=False, precision=None, timestamp=None):
+        """Add an evaluation to the end of the history; returns its index."""
+        expression_bytes = expression.encode('utf-8')[:0xFFFF]
+        kind, payload = _encode_value(value)
+        flags = (DEG if deg else 0) | (EXACT if exact else 0)
+        head = _HEAD.pack(time.time() if timestamp is None else timestamp, flags, precision or 0,
+                          kind, len(expression_bytes))
+        body = head + expression_bytes + payload
+        offset = self._log.seek(0, os.SEEK_END)
+        self._log.write(_LENGTH.pack(len(body)) + body)
+        self._log.flush()
+        self._idx.write(_OFFSET.pack(offset))
+        self._idx.flush()
+        index = len(self)
+        self._offsets.append(offset)
+        bisect.insort(self._recent_keys, _key(expression_bytes, index))
+        if len(self._recent_keys) > MERGE_ENTRIES:
+            self.merge()
+        return index
+
+    def merge(self):
+        """Merge the in-memory keys into history.key (rewritten, then swapped in atomically)."""
+        if not self._recent_keys:
+            return
+        path = os.path.join(self.directory, 'history.key')
+        temporary = path + '.tmp'
+        keys = self._keys
+        with open(temporary, 'wb') as handle:
+            handle.write(_KEY_HEADER.pack(KEY_MAGIC, len(self)))
+            merged = heapq.merge((keys[i] for i in range(len(keys))), self._recent_keys)
+            handle.writelines(merged)
+        self._close_keys()
+        os.replace(temporary, path)
+        self._open_keys()
+
+    def _close_keys(self):
+        if isinstance(self._key_map, mmap.mmap):
+            self._key_map.close()
+        self._key_map = b''
+        if self._key_file is not None:
+            self._key_file.close()
+            self._key_file = None
+
+    def close(self):
+        if self._log.closed:
+            return
+        try:
+            self.merge()
+        finally:
+            self._close_keys()
+            for mapped in (self._log_map, self._idx_map):
+                if isinstance(mapped, mmap.mmap):
+                    mapped.close()
+            self._log.close()
+            self._idx.close()
+
+
+def open_history(directory=None):
+    """The History in `directory` (default: default_directory()), or None if there is none or it cannot be opened."""
+    directory = directory or default_directory()
+    if not directory:
+        return None
+    try:
+        return History(directory)
+    except OSError:
+        return None
+
+
+class HistoryBrowser:
+    """Steps through the entries of a History matching a prefix, newest first (Up/Down in the GUIs)."""
+
+    def __init__(self, history, prefix=""):
+        self.history = history
+        self.prefix = prefix
+        # Without a prefix every entry matches: walk the positions. Otherwise list the matches.
+        self._matches = history.matches(prefix) if prefix else None
+        self._position = None  # index into the matches (or history positions), counted from the newest
+        self.current = None  # the entry last shown
+
+    def _count(self):
+        return len(self.history) if self._matches is None else len(self._matches)
+
+    def _entry(self):
+        back = self._position + 1
+        index = len(self.history) - back if self._matches is None else self._matches[-back]
+        return self.history[index]
+
+    def older(self):
+        """The next older matching entry, or None at the oldest."""
+        position = 0 if self._position is None else self._position + 1
+        if position >= self._count():
+            return None
+        self._position = position
+        self.current = self._entry()
+        return self.current
+
+    def newer(self):
+        """The next newer matching entry, or None when back at the newest (browsing is over)."""
+        if not self._position:
+            self._position = self.current = None
+            return None
+        self._position -= 1
+        self.current = self._entry()
+        return self.current
@@ -0,0 +1,162 @@
+"""
+The history panel: past expressions and results, newest first.
+
+Like the table panel, only the rows that fit on the canvas are drawn, and
+they are read from the core's omnicalc.history.History on demand (a window
+of rows around the view is kept), so a history of millions of entries scrolls
+as smoothly as one of ten. The search entry filters by expression prefix
+through the history's key index; each keystroke that extends the query only
+narrows the previous matches. Clicking a row enters its expression.
+"""
+
+import tkinter as tk
+
+from omnicalc.metrics import RedrawScheduler, LatencyHistogram
+
+
+class HistoryPanel(tk.Frame):
+    """Lists `core.history`; a click passes the entry's expression to `insert` (add_to_expression)."""
+
+    ROW_HEIGHT = 36  # two lines: the expression, then its result
+    # Entries read beyond each edge of the view, so small scrolls touch no file.
+    MARGIN_ROWS = 64
+
+    def __init__(self, master, core, insert, bg, fg, grid, font=None, format_result=None):
+        tk.Frame.__init__(self, master, bg=bg)
+        self.core = core
+        self.insert = insert
+        self.format_result = format_result or core._format_result
+        self.bg, self.fg, self.grid_color, self.font = bg, fg, grid, font
+        self.redraw = RedrawScheduler(self, self._redraw, LatencyHistogram('history_redraw'))
+        self.first = 0  # row on top of the view; row 0 is the newest match
+        self._query = ""
+        self._matches = None  # indexes matching the query, oldest first; None: every entry
+        self._matched = None  # (history, length) the matches were computed for
+        self._window = (0, 0, [])  # (first, last, entries) read around the view
+        self._drawn = None
+
+        controls = tk.Frame(self, bg=bg)
+        controls.pack(fill='x')
+        tk.Label(controls, text="search", bg=bg, fg=fg, font=font).pack(side='left', padx=(4, 2))
+        self.search = tk.Entry(controls, font=font)
+        self.search.pack(side='left', fill='x', expand=True, padx=(0, 4))
+        # Typing here must not also reach the calculator's key bindings on the window.
+        self.search.bindtags((self.search, 'Entry', 'all'))
+        self.search.bind('<KeyRelease>', lambda event: self.redraw.request())
+
+        self.scrollbar = tk.Scrollbar(self, orient='vertical', command=self._yview)
+        self.scrollbar.pack(side='right', fill='y')
+        self.canvas = tk.Canvas(self, bg=bg, highlightthickness=0, width=260, height=400)
+        self.canvas.pack(expand=True, fill='both')
+        canvas = self.canvas
+        canvas.bind('<Configure>', lambda event: self.redraw.request())
+        canvas.bind('<ButtonPress-1>', self._on_click)
+        canvas.bind('<MouseWheel>', lambda event: self.scroll(-3 if event.delta > 0 else 3))
+        canvas.bind('<Button-4>', lambda event: self.scroll(-3))  # X11 wheel
+        canvas.bind('<Button-5>', lambda event: self.scroll(3))
+
+    def refresh(self):
+        """Show entries appended since the last redraw (redrawn when Tk is idle)."""
+        self.redraw.request()
+
+    def scroll(self, rows):
+        self.first += rows
+        self.redraw.request()
+
+    # --- Rows ---
+
+    def _length(self):
+        history = self.core.history
+        if history is None:
+            return 0
+        return len(history) if self._matches is None else len(self._matches)
+
+    def _index(self, row):
+        """The history index shown in `row`."""
+        if self._matches is None:
+            return len(self.core.history) - 1 - row
+        return self._matches[-1 - row]
+
+    def _update_matches(self):
+        history = self.core.history
+        query = self.search.get()
+        state = (history, len(history) if history is not None else 0)
+        if query == self._query and state == self._matched:
+            return
+        if history is None or not query:
+            self._matches = None
+        else:
+            # A longer query only narrows what the previous one matched (unless entries came in since).
+            within = self._matches if query.startswith(self._query) and state == self._matched else None
+            self._matches = history.matches(query, within)
+        if query != self._query:
+            self.first = 0
+        self._query, self._matched = query, state
+        self._window = (0, 0, [])
+
+    def _entries(self, first, last):
+        window_first, window_last, window = self._window
+        if first < window_first or last > window_last:
+            window_first = max(first - self.MARGIN_ROWS, 0)
+            window_last = min(last + self.MARGIN_ROWS, self._length())
+            history = self.core.history
+            window = [history[self._index(row)] for row in range(window_first, window_last)]
+            self._window = (window_first, window_last, window)
+        return window[first - window_first:last - window_first]
+
+    # --- Scrolling and clicks ---
+
+    def _visible_rows(self):
+        return max(self.canvas.winfo_height() // self.ROW_HEIGHT, 1)
+
+    def _yview(self, action, amount, unit=None):
+        if action == 'moveto':
+            self.first = int(float(amount) * self._length())
+        elif action == 'scroll':
+            self.first += int(amount) * (self._visible_rows() if unit == 'pages' else 1)
+        self.redraw.request()
+
+    def _on_click(self, event):
+        row = self.first + event.y // self.ROW_HEIGHT
+        if 0 <= row < self._length():
+            self.insert(self.core.history[self._index(row)].expression)
+
+    # --- Drawing ---
+
+    def _redraw(self):
+        self._update_matches()
+        rows = self._visible_rows()
+        length = self._length()
+        self.first = max(min(self.first, length - rows), 0)
+        state = (self._query, self._matched, self.first, rows, self.canvas.winfo_width(),
+                 self.core.is_exact_mode, self.core.precision)
+        if state == self._drawn:
+            return
+        self._drawn = state
+
+        canvas = self.canvas
+        canvas.delete('all')
+        width = canvas.winfo_width()
+        if not length:
+            text = "No history" if self.core.history is None else "No matches" if self._query else "Empty"
+            canvas.create_text(width // 2, self.ROW_HEIGHT // 2, text=text, fill=self.grid_color, font=self.font)
+            self.scrollbar.set(0, 1)
+            return
+        for position, entry in enumerate(self._entries(self.first, min(self.first + rows, length))):
+            self._draw_row(position, entry, width)
+        self.scrollbar.set(self.first / length, min(self.first + rows, length) / length)
+
+    def _draw_row(self, position, entry, width):
+        top = position * self.ROW_HEIGHT
+        try:
+            result = self.format_result(entry.value)
+        except Exception:
+            result = str(entry.value)
+        canvas = self.canvas
+        # Right-aligned like the display: an expression too long to fit shows its end.
+        canvas.create_text(width - 6, top + self.ROW_HEIGHT // 4, anchor='e', text=entry.expression,
+                           fill=self.grid_color, font=self.font)
+        canvas.create_text(width - 6, top + 3 * self.ROW_HEIGHT // 4, anchor='e', text=f"= {result}",
+                           fill=self.fg, font=self.font)
+        if position:
+            canvas.create_line(0, top, width, top, fill=self.grid_color)
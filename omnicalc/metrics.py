@@ -0,0 +1,219 @@
+"""
+Lightweight latency instrumentation for the GUIs.
+
+`LatencyHistogram` buckets durations on a log2 scale (1 us up to ~1 min), so
+recording is O(1) and memory is constant however long the session runs.
+`RedrawScheduler` coalesces display refresh requests into a single
+`after_idle` pass per event-loop turn and records, for every request, the
+time until the refresh has been painted. `StageProfiler` wraps functions to
+record per-stage call counts and timings (see CalculatorCore.enable_profiling)
+and exports them as JSON or in the Prometheus text format.
+
+Set OMNICALC_METRICS to a file path (or '-' for stderr) to have the GUIs
+write their histograms there on exit.
+"""
+
+import json
+import math
+import os
+import sys
+import time
+
+BUCKETS = 27  # bucket i holds durations in [2**(i-1), 2**i) microseconds; the last one is open-ended
+
+
+class LatencyHistogram:
+    """Log2-bucketed histogram of durations in seconds."""
+
+    def __init__(self, name):
+        self.name = name
+        self.counts = [0] * BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def record(self, seconds):
+        micros = seconds * 1e6
+        index = min(BUCKETS - 1, int(micros).bit_length())
+        self.counts[index] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, fraction):
+        """Upper bound of the bucket holding the given fraction (0..1) of samples, in seconds."""
+        if not self.count:
+            return 0.0
+        target = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= target:
+                return min(self.max, (1 << index) / 1e6)
+        return self.max
+
+    def summary(self):
+        """Return count, mean, min/max and p50/p90/p99 in milliseconds."""
+        if not self.count:
+            return {'name': self.name, 'count': 0}
+        return {
+            'name': self.name, 'count': self.count,
+            'mean_ms': self.total / self.count * 1e3,
+            'min_ms': self.min * 1e3, 'max_ms': self.max * 1e3,
+            'p50_ms': self.percentile(0.5) * 1e3,
+            'p90_ms': self.percentile(0.9) * 1e3,
+            'p99_ms': self.percentile(0.99) * 1e3,
+        }
+
+    def format(self):
+        """Human-readable summary followed by one line per non-empty bucket."""
+        stats = self.summary()
+        if not self.count:
+            return f"{self.name}: no samples\n"
+        lines = [f"{self.name}: n={stats['count']} mean={stats['mean_ms']:.3f}ms "
+                 f"p50<={stats['p50_ms']:.3f}ms p90<={stats['p90_ms']:.3f}ms "
+                 f"p99<={stats['p99_ms']:.3f}ms max={stats['max_ms']:.3f}ms"]
+        widest = max(self.counts)
+        for index, count in enumerate(self.counts):
+            if count:
+                bound = f"< {(1 << index) / 1e3:g}ms" if index < BUCKETS - 1 else "longer"
+                lines.append(f"  {bound:>12} {count:>8} {'#' * max(1, round(40 * count / widest))}")
+        return "\n".join(lines) + "\n"
+
+
+def dump(histograms, destination=None):
+    """Write histograms to `destination` (path or '-'), defaulting to $OMNICALC_METRICS."""
+    destination = destination or os.environ.get('OMNICALC_METRICS')
+    if not destination:
+        return
+    text = "".join(histogram.format() for histogram in histograms)
+    if destination == '-':
+        sys.stderr.write(text)
+    else:
+        with open(destination, 'a', encoding='utf-8') as handle:
+            handle.write(text)
+
+
+def prometheus_text(histograms, metric='omnicalc_stage_seconds', label='stage'):
+    """Render histograms in the Prometheus text exposition format (one labelled series each)."""
+    lines = [f"# HELP {metric} Time spent per {label}.", f"# TYPE {metric} histogram"]
+    for histogram in histograms:
+        tag = f'{label}="{histogram.name}"'
+        cumulative = 0
+        for index, count in enumerate(histogram.counts[:-1]):
+            cumulative += count
+            lines.append(f'{metric}_bucket{{{tag},le="{(1 << index) / 1e6:g}"}} {cumulative}')
+        lines.append(f'{metric}_bucket{{{tag},le="+Inf"}} {histogram.count}')
+        lines.append(f'{metric}_sum{{{tag}}} {histogram.total!r}')
+        lines.append(f'{metric}_count{{{tag}}} {histogram.count}')
+    return "\n".join(lines) + "\n"
+
+
+class StageProfiler:
+    """
+    Call counts and timings per named stage.
+
+    `wrap(stage, func)` returns a function that times every call of `func`
+    (failed calls included) into the stage's LatencyHistogram. Nothing is
+    recorded for functions that were never wrapped, so code that only wraps
+    when profiling is switched on pays nothing otherwise.
+    """
+
+    def __init__(self):
+        self.stages = {}
+
+    def histogram(self, stage):
+        histogram = self.stages.get(stage)
+        if histogram is None:
+            histogram = self.stages[stage] = LatencyHistogram(stage)
+        return histogram
+
+    def wrap(self, stage, func):
+        record = self.histogram(stage).record
+        clock = time.perf_counter
+
+        def timed(*args, **kwargs):
+            start = clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(clock() - start)
+        timed.__wrapped__ = func
+        return timed
+
+    def reset(self):
+        self.stages.clear()
+
+    def snapshot(self):
+        """Return {stage: summary} with call counts, total seconds and percentiles in ms."""
+        result = {}
+        for name, histogram in self.stages.items():
+            summary = histogram.summary()
+            summary['total_seconds'] = histogram.total
+            result[name] = summary
+        return result
+
+    def to_prometheus(self, metric='omnicalc_stage_seconds'):
+        return prometheus_text(self.stages.values(), metric)
+
+    def export(self, path, extra=None):
+        """
+        Write the counters to `path`: Prometheus text if it ends in '.prom',
+        JSON otherwise. `extra` maps further names to plain numbers (e.g. cache
+        counters); they become gauges / top-level JSON keys.
+        """
+        extra = extra or {}
+        if path.endswith('.prom'):
+            text = self.to_prometheus()
+            for name, value in extra.items():
+                text += f"# TYPE omnicalc_{name} gauge\nomnicalc_{name} {value}\n"
+        else:
+            text = json.dumps({'stages': self.snapshot(), **extra}, indent=2, sort_keys=True) + "\n"
+        with open(path, 'w', encoding='utf-8') as handle:
+            handle.write(text)
+
+
+class RedrawScheduler:
+    """
+    Batches display refreshes: any number of `request()` calls in one
+    event-loop turn result in a single call of `redraw` when Tk goes idle.
+
+    Tk repaints widgets in an idle handler queued by `config()`; a second
+    `after_idle` queued from inside the redraw runs after that repaint, which
+    is where request-to-paint latency is recorded into `histogram`.
+    """
+
+    def __init__(self, widget, redraw, histogram=None):
+        self.widget = widget
+        self.redraw = redraw
+        self.histogram = histogram if histogram is not None else LatencyHistogram('keystroke_to_paint')
+        self.redraws = 0
+        self._job = None
+        self._marks = []
+
+    def request(self):
+        self._marks.append(time.perf_counter())
+        if self._job is None:
+            self._job = self.widget.after_idle(self._flush)
+
+    def _flush(self):
+        self._job = None
+        marks, self._marks = self._marks, []
+        self.redraws += 1
+        self.redraw()
+        self.widget.after_idle(self._painted, marks)
+
+    def _painted(self, marks):
+        now = time.perf_counter()
+        for mark in marks:
+            self.histogram.record(now - mark)
+
+    def flush(self):
+        """Redraw now if a refresh is pending (e.g. before reading label text)."""
+        if self._job is not None:
+            self.widget.after_cancel(self._job)
+            self._flush()
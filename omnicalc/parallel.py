@@ -0,0 +1,266 @@
+"""
+Parallel batch evaluation across a pool of worker processes.
+
+Expressions are split into chunks and fanned out to workers, each running its
+own CalculatorCore. Every worker publishes the index of the expression it is
+currently evaluating through shared memory, so the parent can tell exactly
+which expression is stuck: when one runs longer than the per-expression
+timeout (for example `9**9**9`), the worker is killed, that expression is
+reported as timed out, a fresh worker is spawned and the rest of its chunk is
+requeued. An optional address-space cap turns runaway allocations into
+MemoryError inside the worker instead of swapping the machine. Results are
+yielded in input order.
+
+An item may also be an (expression, variables) pair, where `variables` maps
+names used in the expression to their values (worksheet cells, see
+omnicalc.worksheet), and with `values=True` a result's output is the value
+itself rather than its display text.
+"""
+
+import itertools
+import multiprocessing
+import os
+import time
+from collections import deque, namedtuple
+from multiprocessing.connection import wait
+
+from omnicalc.cli import format_error
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+BatchResult = namedtuple('BatchResult', 'index expression output ok')
+
+IDLE = -1
+POLL_INTERVAL = 0.05
+
+
+def _apply_memory_limit(memory_limit):
+    if memory_limit and resource is not None:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+
+
+def _worker_main(conn, progress, deg_mode, memory_limit, cost_model=None, exact=False, precision=None,
+                 values=False):
+    """Worker loop: evaluate chunks and send back one list of results per chunk."""
+    from omnicalc.core import CalculatorCore
+
+    _apply_memory_limit(memory_limit)
+    core = CalculatorCore(cost_model=cost_model)
+    core.is_deg_mode = deg_mode
+    core.is_exact_mode = exact
+    core.precision = precision
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            break
+        if message is None:
+            break
+        chunk_id, expressions = message
+        results = []
+        for position, item in enumerate(expressions):
+            progress.value = position
+            expr, variables = item if type(item) is tuple else (item, None)
+            if not expr.strip():
+                results.append(("", True))
+                continue
+            try:
+                # Chunks are independent, so ANS never leaks between expressions.
+                core.last_answer = 0.0
+                value = core.evaluate_with(expr, variables) if variables else core.calculate(expr)
+                results.append((value if values else core._format_result(value), True))
+            except Exception as exc:
+                results.append((format_error(exc), False))
+        progress.value = IDLE
+        conn.send((chunk_id, results))
+
+
+class _Worker:
+    """One worker process plus the bookkeeping for the chunk it is running."""
+
+    def __init__(self, context, deg_mode, memory_limit, cost_model=None, exact=False, precision=None,
+                 values=False):
+        self.conn, child_conn = context.Pipe()
+        self.progress = context.RawValue('q', IDLE)
+        self.process = context.Process(target=_worker_main, daemon=True,
+                                       args=(child_conn, self.progress, deg_mode, memory_limit, cost_model, exact,
+                                             precision, values))
+        self.process.start()
+        child_conn.close()
+        self.chunk = None          # (chunk_id, start index, expressions)
+        self.position = IDLE       # last observed progress value
+        self.position_since = 0.0  # when that progress value was first observed
+
+    def submit(self, chunk):
+        self.chunk = chunk
+        self.position = IDLE
+        self.position_since = time.monotonic()
+        self.conn.send((chunk[0], chunk[2]))
+
+    def observe(self, now):
+        """Return how long the current expression has been running."""
+        position = self.progress.value
+        if position != self.position:
+            self.position = position
+            self.position_since = now
+        return now - self.position_since
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout=1)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+class BatchEvaluator:
+    """
+    Evaluate many independent expressions in parallel.
+
+    Use as a context manager; `map()` accepts any iterable (consumed lazily,
+    with a bounded number of chunks in flight) and yields `BatchResult`s in
+    input order. `timeout` is the wall-clock limit per expression in seconds,
+    `memory_limit` the address-space cap per worker in bytes (POSIX only) and
+    `cost_model` an optional omnicalc.cost.CostModel used by every worker;
+    `exact` evaluates in exact mode (see omnicalc.exact) and `precision` in
+    decimal mode with that many digits (see omnicalc.precise). With `values`,
+    the output of a successful result is its value instead of its text.
+    """
+
+    def __init__(self, workers=None, timeout=5.0, memory_limit=None, chunk_size=256,
+                 deg_mode=True, mp_context=None, cost_model=None, exact=False, precision=None, values=False):
+        self.workers = workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self.memory_limit = memory_limit
+        self.chunk_size = chunk_size
+        self.deg_mode = deg_mode
+        self.exact = exact
+        self.precision = precision
+        self.values = values
+        self.cost_model = cost_model
+        self._context = multiprocessing.get_context(mp_context)
+        self._pool = []
+        self.respawns = 0
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _spawn(self):
+        return _Worker(self._context, self.deg_mode, self.memory_limit, self.cost_model, self.exact,
+                       self.precision, self.values)
+
+    def start(self):
+        while len(self._pool) < self.workers:
+            self._pool.append(self._spawn())
+
+    def close(self):
+        for worker in self._pool:
+            worker.stop()
+        self._pool = []
+
+    def _replace(self, worker):
+        worker.kill()
+        self._pool[self._pool.index(worker)] = replacement = self._spawn()
+        self.respawns += 1
+        return replacement
+
+    def map(self, expressions):
+        """Yield a BatchResult for every expression, in input order."""
+        self.start()
+        source = enumerate(expressions)
+        pending = deque()   # chunks waiting for a worker (requeued ones go first)
+        results = {}
+        chunk_ids = itertools.count()
+        exhausted = False
+
+        def fill():
+            nonlocal exhausted
+            # Keep roughly two chunks per worker in flight, and stop reading ahead
+            # while a slow chunk holds back too many finished results.
+            while not exhausted and len(pending) < self.workers \
+                    and len(results) < 4 * self.workers * self.chunk_size:
+                batch = list(itertools.islice(source, self.chunk_size))
+                if not batch:
+                    exhausted = True
+                    break
+                pending.append((next(chunk_ids), batch[0][0], [expr for _, expr in batch]))
+
+        next_index = 0
+        try:
+            while True:
+                fill()
+                for worker in self._pool:
+                    if worker.chunk is None and pending:
+                        worker.submit(pending.popleft())
+                busy = [worker for worker in self._pool if worker.chunk is not None]
+
+                while next_index in results:
+                    yield results.pop(next_index)
+                    next_index += 1
+                if not busy:
+                    if exhausted and not pending:
+                        return
+                    continue
+                self._collect(busy, results, pending)
+        finally:
+            # The consumer may stop early: discard whatever is still running.
+            for worker in list(self._pool):
+                if worker.chunk is not None:
+                    worker.chunk = None
+                    self._replace(worker)
+
+    def _collect(self, busy, results, pending):
+        """Wait briefly for busy workers; store finished chunks and handle stuck or dead workers."""
+        ready = wait([worker.conn for worker in busy] + [worker.process.sentinel for worker in busy],
+                     timeout=POLL_INTERVAL)
+        now = time.monotonic()
+        for worker in busy:
+            chunk_id, start, chunk = worker.chunk
+            if worker.conn in ready:
+                try:
+                    _, outputs = worker.conn.recv()
+                except (EOFError, OSError):
+                    outputs = None
+                if outputs is not None:
+                    for offset, (output, ok) in enumerate(outputs):
+                        results[start + offset] = BatchResult(start + offset, chunk[offset], output, ok)
+                    worker.chunk = None
+                    continue
+            if worker.process.sentinel in ready or worker.conn in ready:
+                reason = f"Error: worker exited (code {worker.process.exitcode})"
+            elif self.timeout is not None and worker.observe(now) > self.timeout:
+                reason = f"Error: timed out after {self.timeout:g}s"
+            else:
+                continue
+            self._fail_current(worker, reason, results, pending)
+
+    def _fail_current(self, worker, reason, results, pending):
+        """Record the expression the worker is stuck on and requeue the rest of its chunk."""
+        chunk_id, start, chunk = worker.chunk
+        position = max(worker.progress.value, 0)
+        results[start + position] = BatchResult(start + position, chunk[position], reason, False)
+        worker.chunk = None
+        self._replace(worker)
+        # Results for the chunk are only sent once it completes, so earlier
+        # expressions are simply evaluated again by the new worker.
+        if position > 0:
+            pending.appendleft((chunk_id, start, chunk[:position]))
+        if position + 1 < len(chunk):
+            pending.appendleft((chunk_id, start + position + 1, chunk[position + 1:]))
@@ -0,0 +1,328 @@
+"""
+Single-pass tokenizer and operator-precedence parser for calculator expressions.
+
+The parser is an iterative shunting-yard: it consumes tokens left to right,
+keeps explicit operand/operator stacks (so deeply nested parentheses never hit
+the recursion limit) and treats the end of input as closing every parenthesis
+that is still open. Rewrites such as DEG-mode trig names or constant
+substitution are applied as transforms to each node at the moment it is built,
+so the whole pipeline stays linear in the length of the expression.
+"""
+
+import re
+from collections import namedtuple
+
+
+# --- AST Nodes ---
+# Nodes are immutable and hash/compare structurally, so a tree can be used as a
+# cache key. No two node types with the same arity can hold equal fields
+# (operators are never valid function names), so tuple equality is safe.
+# (collections.namedtuple rather than typing.NamedTuple keeps `typing` out of
+# the import path.)
+
+Number = namedtuple('Number', 'value')
+Name = namedtuple('Name', 'id')
+UnaryOp = namedtuple('UnaryOp', 'op operand')
+BinOp = namedtuple('BinOp', 'op left right')
+Call = namedtuple('Call', 'func args')
+
+
+class ParseError(SyntaxError):
+    """Raised when an expression cannot be tokenized or parsed."""
+
+
+# --- Tokenizer ---
+
+TOKEN_RE = re.compile(r"""
+    (?P<NUMBER>(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+  | (?P<NAME>[^\W\d]\w*)
+  | (?P<OP>\*\*|//|[+\-*/%])
+  | (?P<LPAREN>\()
+  | (?P<RPAREN>\))
+  | (?P<COMMA>,)
+  | (?P<SPACE>\s+)
+  | (?P<ERROR>.)
+""", re.VERBOSE)
+
+
+def tokenize(text, pos=0):
+    """Yield (kind, text, position) tuples for `text` in a single regex scan."""
+    for match in TOKEN_RE.finditer(text, pos):
+        kind = match.lastgroup
+        if kind == 'SPACE':
+            continue
+        if kind == 'ERROR':
+            raise ParseError(f"Unexpected character {match.group()!r} at position {match.start()}")
+        yield kind, match.group(), match.start()
+
+
+def parse_number(text):
+    """Convert a NUMBER token to int where possible, float otherwise."""
+    if text.isdigit():
+        return int(text)
+    return float(text)
+
+
+# --- Parser ---
+
+# Binding power and associativity of binary operators (mirrors Python).
+BINARY_PRECEDENCE = {'+': 1, '-': 1, '*': 2, '/': 2, '//': 2, '%': 2, '**': 4}
+RIGHT_ASSOCIATIVE = frozenset(['**'])
+UNARY_PRECEDENCE = 3
+
+# Operator-stack entries are (kind, operator or function name, operand depth).
+BINARY, UNARY, PAREN, CALL = range(4)
+
+
+def _identity(node):
+    return node
+
+
+def compose_transforms(transforms):
+    """Fold a sequence of node transforms into a single callable."""
+    transforms = tuple(transforms)
+    if not transforms:
+        return _identity
+    if len(transforms) == 1:
+        return transforms[0]
+
+    def transform(node):
+        for step in transforms:
+            node = step(node)
+        return node
+    return transform
+
+
+def reduce_operator(operands, operators, transform):
+    """Pop one operator off the stack and build its node."""
+    kind, op, _ = operators.pop()
+    if kind == BINARY:
+        right = operands.pop()
+        operands[-1] = transform(BinOp(op, operands[-1], right))
+    else:
+        operands[-1] = transform(UnaryOp(op, operands[-1]))
+
+
+def reduce_for(precedence, right_associative, operands, operators, transform):
+    """Reduce every stacked operator that binds at least as tightly as `precedence`."""
+    while operators:
+        kind, op, _ = operators[-1]
+        if kind == BINARY:
+            top = BINARY_PRECEDENCE[op]
+        elif kind == UNARY:
+            top = UNARY_PRECEDENCE
+        else:
+            return
+        if top > precedence or (top == precedence and not right_associative):
+            reduce_operator(operands, operators, transform)
+        else:
+            return
+
+
+def close_group(operands, operators, transform):
+    """Reduce up to the innermost '(' or call and close it; returns False if none is open."""
+    reduce_for(0, False, operands, operators, transform)
+    if not operators:
+        return False
+    kind, func, depth = operators.pop()
+    if kind == CALL:
+        args = tuple(operands[depth:])
+        del operands[depth:]
+        operands.append(transform(Call(func, args)))
+    return True
+
+
+class ParseState:
+    """
+    The shunting-yard state between two tokens.
+
+    `feed()` consumes one token match and `finish()` closes whatever is still
+    open and returns the tree. A copy of the state can be stored and resumed
+    later, which is how the live preview re-parses only the edited tail of an
+    expression. `number` converts NUMBER tokens (parse_number by default).
+    """
+
+    __slots__ = ('operands', 'operators', 'expect_operand', 'last_name', 'transform', 'number')
+
+    def __init__(self, transform=_identity, number=parse_number):
+        self.operands = []
+        self.operators = []
+        self.expect_operand = True
+        self.last_name = None
+        self.transform = transform
+        self.number = number
+
+    def copy(self):
+        state = ParseState.__new__(ParseState)
+        state.operands = self.operands[:]
+        state.operators = self.operators[:]
+        state.expect_operand = self.expect_operand
+        state.last_name = self.last_name
+        state.transform = self.transform
+        state.number = self.number
+        return state
+
+    def feed(self, match):
+        """Consume one TOKEN_RE match."""
+        kind = match.lastgroup
+        if kind == 'SPACE':
+            return
+        value = match.group()
+        operands = self.operands
+        operators = self.operators
+        transform = self.transform
+
+        if self.last_name is not None:
+            if kind == 'LPAREN':
+                operands.pop()
+                operators.append((CALL, self.last_name, len(operands)))
+                self.last_name = None
+                self.expect_operand = True
+                return
+            # A bare name that is not followed by '(' is a variable or constant.
+            operands[-1] = transform(operands[-1])
+            self.last_name = None
+
+        if self.expect_operand:
+            if kind == 'NUMBER':
+                operands.append(transform(Number(self.number(value))))
+                self.expect_operand = False
+            elif kind == 'NAME':
+                self.last_name = value
+                operands.append(Name(value))
+                self.expect_operand = False
+            elif kind == 'LPAREN':
+                operators.append((PAREN, None, len(operands)))
+            elif kind == 'OP' and (value == '-' or value == '+'):
+                operators.append((UNARY, value, None))
+            elif kind == 'RPAREN' and operators and operators[-1][0] == CALL \
+                    and len(operands) == operators[-1][2]:
+                close_group(operands, operators, transform)
+                self.expect_operand = False
+            else:
+                raise _unexpected(match)
+        elif kind == 'OP':
+            reduce_for(BINARY_PRECEDENCE[value], value in RIGHT_ASSOCIATIVE, operands, operators, transform)
+            operators.append((BINARY, value, None))
+            self.expect_operand = True
+        elif kind == 'RPAREN':
+            if not close_group(operands, operators, transform):
+                raise ParseError(f"Unmatched ')' at position {match.start()}")
+        elif kind == 'COMMA':
+            reduce_for(0, False, operands, operators, transform)
+            if not operators or operators[-1][0] != CALL:
+                raise _unexpected(match)
+            self.expect_operand = True
+        else:
+            raise _unexpected(match)
+
+    def finish(self):
+        """Close every open parenthesis and return the tree (the state is consumed)."""
+        operands = self.operands
+        operators = self.operators
+        if self.last_name is not None:
+            operands[-1] = self.transform(operands[-1])
+            self.last_name = None
+        if self.expect_operand and not (operators and operators[-1][0] == CALL
+                                        and len(operands) == operators[-1][2]):
+            raise ParseError("Unexpected end of expression")
+        while operators:
+            close_group(operands, operators, self.transform)
+        if len(operands) != 1:
+            raise ParseError("Malformed expression")
+        return operands[0]
+
+
+def parse(text, transforms=(), number=parse_number):
+    """
+    Parse `text` into an expression tree in one pass.
+
+    Unclosed parentheses are closed implicitly at the end of the input. Each
+    callable in `transforms` is applied to every node as it is built and may
+    return a replacement node. `number` converts number literals.
+    """
+    state = ParseState(compose_transforms(transforms), number)
+    feed = state.feed
+    for match in TOKEN_RE.finditer(text):
+        feed(match)
+    return state.finish()
+
+
+def _unexpected(match):
+    if match.lastgroup == 'ERROR':
+        return ParseError(f"Unexpected character {match.group()!r} at position {match.start()}")
+    return ParseError(f"Unexpected {match.group()!r} at position {match.start()}")
+
+
+# --- Transforms ---
+
+DEGREE_FUNCTIONS = {
+    'sin': 'sind', 'cos': 'cosd', 'tan': 'tand',
+    'asin': 'asind', 'acos': 'acosd', 'atan': 'atand',
+}
+
+
+def degrees_transform(node):
+    """Rewrite trig calls to their DEG-mode variants (sin -> sind, ...)."""
+    if type(node) is Call and node.func in DEGREE_FUNCTIONS:
+        return Call(DEGREE_FUNCTIONS[node.func], node.args)
+    return node
+
+
+def constants_transform(constants):
+    """Build a transform that replaces names such as `pi` and `e` with their values."""
+    def transform(node):
+        if type(node) is Name and node.id in constants:
+            return Number(constants[node.id])
+        return node
+    return transform
+
+
+def numeric_constants(namespace):
+    """Return the plain numeric entries (pi, e, ...) of an evaluation namespace."""
+    return {name: value for name, value in namespace.items()
+            if isinstance(value, (int, float)) and not isinstance(value, bool)}
+
+
+# --- Code Generation ---
+# Only the eval() backend needs this, so `ast` is imported on first use.
+
+_PY_BINARY = {
+    '+': 'Add', '-': 'Sub', '*': 'Mult', '/': 'Div',
+    '//': 'FloorDiv', '%': 'Mod', '**': 'Pow',
+}
+_PY_UNARY = {'-': 'USub', '+': 'UAdd'}
+_LOCATION = {'lineno': 1, 'col_offset': 0, 'end_lineno': 1, 'end_col_offset': 0}
+
+
+def to_python_ast(node):
+    """Convert an expression tree to a Python `ast.Expression` ready for compile()."""
+    import ast
+
+    # Iterative post-order walk so long operator chains never hit the recursion limit.
+    built = []
+    stack = [(node, False)]
+    while stack:
+        node, children_done = stack.pop()
+        node_type = type(node)
+        if node_type is Number:
+            built.append(ast.Constant(node.value, **_LOCATION))
+        elif node_type is Name:
+            built.append(ast.Name(node.id, ast.Load(), **_LOCATION))
+        elif not children_done:
+            stack.append((node, True))
+            children = (node.left, node.right) if node_type is BinOp else \
+                (node.operand,) if node_type is UnaryOp else node.args
+            stack.extend((child, False) for child in reversed(children))
+        elif node_type is BinOp:
+            right = built.pop()
+            built[-1] = ast.BinOp(built[-1], getattr(ast, _PY_BINARY[node.op])(), right, **_LOCATION)
+        elif node_type is UnaryOp:
+            built[-1] = ast.UnaryOp(getattr(ast, _PY_UNARY[node.op])(), built[-1], **_LOCATION)
+        else:
+            count = len(node.args)
+            args = built[len(built) - count:]
+            del built[len(built) - count:]
+            func = ast.Name(node.func, ast.Load(), **_LOCATION)
+            built.append(ast.Call(func, args, [], **_LOCATION))
+    return ast.Expression(built[0])
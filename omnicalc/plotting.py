@@ -0,0 +1,267 @@
+"""
+Sampling f(x) for the graph panel (see omnicalc.plotview).
+
+The work here is measured in screen pixels, so it follows what is visible and
+not how long the x range is:
+
+* `refine()` starts from a coarse grid and splits only the intervals whose
+  midpoint lies more than TOLERANCE_PX off the straight line between its ends
+  (curvature), whose ends disagree about being defined (domain edges), or
+  that are visible and too steep to judge yet. All midpoints of one round are
+  evaluated in a single `evaluate` call (CalculatorCore.evaluate_many). An
+  interval that still jumps by more than the plot height at the finest width
+  is a discontinuity, such as a pole of tan or 1/x, and gets a nan break so
+  no line is drawn across it.
+* `SampleCache` keeps every sample of one expression and remembers which x
+  ranges were refined at which scale. Scales are rounded down to powers of
+  two, so a pan samples only the newly exposed strip and a zoom back to an
+  earlier scale reuses all of its samples.
+* `decimate()` turns samples into polylines with at most one vertex per pixel
+  column, so a redraw never creates more line segments than the plot is wide.
+"""
+
+import math
+from bisect import bisect_left, bisect_right
+
+# Spacing of the initial grid, in pixels.
+SEED_PX = 4
+# Intervals are split while their midpoint is off the chord by more than this.
+TOLERANCE_PX = 0.5
+# Finest interval, in pixels; sets the refinement depth (log2(SEED_PX / MIN_PX) rounds).
+MIN_PX = 1 / 64
+# New ranges are sampled in whole chunks, so dragging does not refine one pixel at a time.
+CHUNK_PX = 64
+# A cache holding more samples than this starts over.
+MAX_SAMPLES = 200000
+# Initial x range: one period of the trigonometric functions either way.
+DEG_RANGE = (-360.0, 360.0)
+RAD_RANGE = (-10.0, 10.0)
+
+
+def default_range(deg_mode):
+    """The x range a graph (or a search for roots) starts from in DEG or RAD mode."""
+    return DEG_RANGE if deg_mode else RAD_RANGE
+
+
+def _values(results):
+    """A list of floats from evaluate_many's result (a NumPy array or a list)."""
+    if hasattr(results, 'tolist'):
+        return results.tolist()
+    return [value if type(value) is float else _to_float(value) for value in results]
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except OverflowError:
+        return math.inf if value > 0 else -math.inf
+
+
+def _finite(value):
+    return value - value == 0  # False for nan and the infinities
+
+
+def _unit(span, pixels):
+    """Data units per pixel rounded down to a power of two (exponent, size)."""
+    exponent = math.floor(math.log2(span / pixels))
+    return exponent, 2.0 ** exponent
+
+
+# --- Adaptive refinement ---
+
+def _needs_split(ya, ym, yb, uy, y0, y1):
+    finite = _finite(ya) + _finite(ym) + _finite(yb)
+    if finite != 3:
+        return finite != 0  # the edge of the domain lies somewhere inside
+    if max(ya, ym, yb) < y0 or min(ya, ym, yb) > y1:
+        return False  # entirely above or below the view
+    return abs(ym - (ya + yb) / 2) > TOLERANCE_PX * uy
+
+
+def refine(points, evaluate, ux, uy, y0, y1, height):
+    """
+    Refine the sorted list of (x, y) `points` in place for pixels of ux by uy
+    data units, with the view spanning y0..y1 (`height` pixels).
+    Returns the number of values evaluated.
+    """
+    min_width = MIN_PX * ux
+    jump = height * uy
+    pending = [(points[i], points[i + 1]) for i in range(len(points) - 1)
+               if points[i + 1][0] - points[i][0] > min_width]
+    evaluated = 0
+    while pending:
+        xs = [(a[0] + b[0]) / 2 for a, b in pending]
+        ys = _values(evaluate(xs))
+        evaluated += len(xs)
+        split = []
+        for (a, b), xm, ym in zip(pending, xs, ys):
+            middle = (xm, ym)
+            if _needs_split(a[1], ym, b[1], uy, y0, y1):
+                if xm - a[0] > min_width:
+                    split.append((a, middle))
+                    split.append((middle, b))
+                elif _finite(a[1]) and _finite(b[1]) and abs(b[1] - a[1]) > jump:
+                    middle = (xm, math.nan)  # a jump that never closes: break the line here
+            points.append(middle)
+        pending = split
+    points.sort()
+    return evaluated
+
+
+# --- Cache ---
+
+def _gaps(covered, lo, hi):
+    """Parts of [lo, hi] not inside the sorted, disjoint intervals `covered`."""
+    gaps = []
+    for start, stop in covered:
+        if stop <= lo:
+            continue
+        if start >= hi:
+            break
+        if start > lo:
+            gaps.append((lo, start))
+        lo = max(lo, stop)
+    if lo < hi:
+        gaps.append((lo, hi))
+    return gaps
+
+
+def _cover(covered, lo, hi):
+    """Add [lo, hi] to `covered`, merging overlapping intervals."""
+    merged = []
+    for start, stop in covered:
+        if stop < lo or start > hi:
+            merged.append((start, stop))
+        else:
+            lo, hi = min(lo, start), max(hi, stop)
+    merged.append((lo, hi))
+    merged.sort()
+    covered[:] = merged
+
+
+class SampleCache:
+    """
+    The samples of one expression; `evaluate(xs)` returns its values at xs.
+
+    `samples()` refines only what the view needs that no earlier view at the
+    same scale already refined.
+    """
+
+    def __init__(self, evaluate):
+        self.evaluate = evaluate
+        self.xs = []
+        self.ys = []
+        self._covered = {}  # (x exponent, y exponent, band) -> refined [lo, hi] intervals
+        self.evaluations = 0
+
+    def clear(self):
+        self.xs, self.ys = [], []
+        self._covered.clear()
+
+    def samples(self, x0, x1, y0, y1, width, height):
+        """(xs, ys) covering x0..x1, with one sample beyond each edge where there is one."""
+        x_exponent, ux = _unit(x1 - x0, width)
+        y_exponent, uy = _unit(y1 - y0, height)
+        # Refinement skips what is far above or below the view, so coverage also
+        # depends on the vertical position, in bands about a plot height tall.
+        band = uy * 2 ** math.ceil(math.log2(height))
+        first_band = math.floor(y0 / band) - 1
+        low, high = first_band * band, (math.ceil(y1 / band) + 1) * band
+        covered = self._covered.setdefault((x_exponent, y_exponent, first_band), [])
+        chunk = CHUNK_PX * ux
+        lo = math.floor(x0 / chunk) * chunk
+        hi = math.ceil(x1 / chunk) * chunk
+        for start, stop in _gaps(covered, lo, hi):
+            self._fill(start, stop, ux, uy, low, high, height)
+            _cover(covered, start, stop)
+        if len(self.xs) > MAX_SAMPLES:
+            self.clear()
+            return self.samples(x0, x1, y0, y1, width, height)
+        first = max(bisect_left(self.xs, x0) - 1, 0)
+        last = bisect_right(self.xs, x1) + 1
+        return self.xs[first:last], self.ys[first:last]
+
+    def _fill(self, lo, hi, ux, uy, y0, y1, height):
+        step = SEED_PX * ux
+        grid = [k * step for k in range(math.ceil(lo / step), math.floor(hi / step) + 1)]
+        first = bisect_left(self.xs, lo)
+        last = bisect_right(self.xs, hi)
+        # The neighbours outside [lo, hi] join in, so the intervals across its ends are checked too.
+        start, stop = max(first - 1, 0), min(last + 1, len(self.xs))
+        points = list(zip(self.xs[start:stop], self.ys[start:stop]))
+        known = set(self.xs[first:last])
+        grid = [x for x in grid if x not in known]
+        if grid:
+            points.extend(zip(grid, _values(self.evaluate(grid))))
+            self.evaluations += len(grid)
+            points.sort()
+        self.evaluations += refine(points, self.evaluate, ux, uy, y0, y1, height)
+        self.xs[start:stop] = [x for x, _ in points]
+        self.ys[start:stop] = [y for _, y in points]
+
+    def fit(self, x0, x1, width):
+        """A y range showing most of the curve over x0..x1, from a coarse grid that is not kept."""
+        count = max(width // SEED_PX, 2)
+        xs = [x0 + (x1 - x0) * i / count for i in range(count + 1)]
+        ys = sorted(y for y in _values(self.evaluate(xs)) if _finite(y))
+        self.evaluations += len(xs)
+        if not ys:
+            return -10.0, 10.0
+        # Ignore the outer 5% on each side, so a pole does not flatten everything else.
+        low, high = ys[len(ys) // 20], ys[-1 - len(ys) // 20]
+        if high - low < 1e-9 * max(abs(low), abs(high), 1.0):
+            return low - 1.0, high + 1.0
+        margin = (high - low) / 10
+        return low - margin, high + margin
+
+
+# --- Drawing ---
+
+def decimate(xs, ys, x0, x1, y0, y1, width, height):
+    """
+    Canvas polylines [px0, py0, px1, py1, ...] for the samples, keeping at
+    most one vertex per pixel column: the column's highest or lowest point,
+    whichever is farther from the previous vertex, so narrow spikes and
+    oscillations keep their full height. Lines break at nan and inf.
+    """
+    sx = width / (x1 - x0)
+    sy = height / (y1 - y0)
+    # Far off-screen values are clamped so huge numbers never reach Tk.
+    top, bottom = -height, 2.0 * height
+    last_column = width - 1
+    lines = []
+    line = []
+    column = None
+    low = high = None
+
+    def emit():
+        if not line or abs(low[1] - line[-1]) > abs(high[1] - line[-1]):
+            line.extend(low)
+        else:
+            line.extend(high)
+
+    for x, y in zip(xs, ys):
+        if not _finite(y):
+            if column is not None:
+                emit()
+                if len(line) >= 4:
+                    lines.append(line)
+            line, column = [], None
+            continue
+        px = (x - x0) * sx
+        py = min(max((y1 - y) * sy, top), bottom)
+        current = min(max(int(math.floor(px)), 0), last_column)
+        if current != column:
+            if column is not None:
+                emit()
+            column = current
+            low = high = (px, py)
+        elif py > low[1]:
+            low = (px, py)
+        elif py < high[1]:
+            high = (px, py)
+    if column is not None:
+        emit()
+        if len(line) >= 4:
+            lines.append(line)
+    return lines
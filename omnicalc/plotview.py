@@ -0,0 +1,146 @@
+"""
+The graph panel: a Tk Canvas plotting the expression being typed as f(x).
+
+Sampling, caching and decimation live in omnicalc.plotting (no tkinter); this
+module maps the view onto the canvas and handles the mouse. Drag pans, the
+wheel zooms around the pointer and a double click resets the view. Redraws
+are batched with the same RedrawScheduler as the display labels.
+"""
+
+import tkinter as tk
+
+from omnicalc.metrics import RedrawScheduler, LatencyHistogram
+from omnicalc.plotting import SampleCache, decimate, default_range
+
+
+class PlotPanel(tk.Frame):
+    """Plots `core`'s expression over the variable x (see CalculatorCore.evaluate_many)."""
+
+    ZOOM_STEP = 1.25
+
+    def __init__(self, master, core, bg, fg, curve, axis, font=None):
+        tk.Frame.__init__(self, master, bg=bg)
+        self.core = core
+        self.fg, self.curve, self.axis, self.font = fg, curve, axis, font
+        self.canvas = tk.Canvas(self, bg=bg, highlightthickness=0, width=400, height=400)
+        self.canvas.pack(expand=True, fill='both')
+        self.redraw = RedrawScheduler(self, self._redraw, LatencyHistogram('plot_redraw'))
+        self.expression = ""
+        self.view = None  # (x0, x1, y0, y1); None until the first draw fits it
+        self._cache = None
+        self._key = None
+        self._drawn = None
+        self._drag = None
+
+        canvas = self.canvas
+        canvas.bind('<Configure>', lambda event: self.redraw.request())
+        canvas.bind('<ButtonPress-1>', self._on_press)
+        canvas.bind('<B1-Motion>', self._on_drag)
+        canvas.bind('<Double-Button-1>', lambda event: self.reset_view())
+        canvas.bind('<MouseWheel>', lambda event: self._zoom(event, event.delta < 0))
+        canvas.bind('<Button-4>', lambda event: self._zoom(event, False))  # X11 wheel
+        canvas.bind('<Button-5>', lambda event: self._zoom(event, True))
+
+    def plot(self, expression):
+        """Show `expression` (redrawn when Tk is idle)."""
+        self.expression = expression
+        self.redraw.request()
+
+    def reset_view(self):
+        self.view = None
+        self.redraw.request()
+
+    def x_range(self):
+        """The x range on screen (the default range before the first draw)."""
+        return self.view[:2] if self.view is not None else default_range(self.core.is_deg_mode)
+
+    # --- Mouse ---
+
+    def _size(self):
+        return max(self.canvas.winfo_width(), 2), max(self.canvas.winfo_height(), 2)
+
+    def _on_press(self, event):
+        self._drag = (event.x, event.y, self.view)
+
+    def _on_drag(self, event):
+        if self._drag is None or self._drag[2] is None:
+            return
+        start_x, start_y, (x0, x1, y0, y1) = self._drag
+        width, height = self._size()
+        dx = (event.x - start_x) * (x1 - x0) / width
+        dy = (event.y - start_y) * (y1 - y0) / height
+        self.view = (x0 - dx, x1 - dx, y0 + dy, y1 + dy)
+        self.redraw.request()
+
+    def _zoom(self, event, out):
+        if self.view is None:
+            return
+        x0, x1, y0, y1 = self.view
+        width, height = self._size()
+        factor = self.ZOOM_STEP if out else 1 / self.ZOOM_STEP
+        # The point under the pointer stays where it is.
+        x = x0 + (x1 - x0) * event.x / width
+        y = y1 - (y1 - y0) * event.y / height
+        self.view = (x - (x - x0) * factor, x + (x1 - x) * factor,
+                     y - (y - y0) * factor, y + (y1 - y) * factor)
+        self.redraw.request()
+
+    # --- Drawing ---
+
+    def _evaluate(self, xs):
+        # Pixels need no more than floats: sample in float mode whatever the number mode is.
+        return self.core._float_mode(self.core.evaluate_many, self._key[0], xs)
+
+    def _redraw(self):
+        core = self.core
+        namespace = core.safe_dict
+        key = (self.expression, core.is_deg_mode, core.last_answer, id(namespace),
+               getattr(namespace, 'version', None))
+        width, height = self._size()
+        if key != self._key:
+            if self._key is None or key[1] != self._key[1]:
+                self.view = None  # DEG/RAD changed: the old x range means nothing now
+            self._key = key
+            self._cache = SampleCache(self._evaluate)
+            if self.view is not None:
+                self.view = self._fit(*self.view[:2], width)  # a new curve: keep x, fit y
+        if self.view is None:
+            self.view = self._fit(*default_range(core.is_deg_mode), width)
+        state = (key, self.view, width, height)
+        if state == self._drawn:
+            return
+        self._drawn = state
+
+        x0, x1, y0, y1 = self.view
+        lines = []
+        if self.expression.strip():
+            try:
+                xs, ys = self._cache.samples(x0, x1, y0, y1, width, height)
+                lines = decimate(xs, ys, x0, x1, y0, y1, width, height)
+            except Exception:
+                lines = []  # an incomplete expression while typing
+        canvas = self.canvas
+        canvas.delete('all')
+        self._draw_axes(width, height)
+        for line in lines:
+            canvas.create_line(*line, fill=self.curve, width=2)
+
+    def _fit(self, x0, x1, width):
+        if self.expression.strip():
+            try:
+                return (x0, x1) + self._cache.fit(x0, x1, width)
+            except Exception:
+                pass
+        return x0, x1, -10.0, 10.0
+
+    def _draw_axes(self, width, height):
+        x0, x1, y0, y1 = self.view
+        canvas = self.canvas
+        if y0 < 0 < y1:
+            py = y1 * height / (y1 - y0)
+            canvas.create_line(0, py, width, py, fill=self.axis)
+        if x0 < 0 < x1:
+            px = -x0 * width / (x1 - x0)
+            canvas.create_line(px, 0, px, height, fill=self.axis)
+        canvas.create_text(4, height - 4, anchor='sw', fill=self.fg, font=self.font,
+                           text=f"x {x0:.4g} … {x1:.4g}   y {y0:.4g} … {y1:.4g}")
@@ -0,0 +1,514 @@
+"""
+Arbitrary-precision decimal mode.
+
+With a precision of N significant digits, number literals are parsed straight
+into decimal.Decimal (never through a 53-bit float), arithmetic runs in a
+decimal context of N + GUARD_DIGITS digits (`evaluation_context()`), results
+are shown rounded to N, and `precise_namespace()` replaces the float-only
+functions and constants of the evaluation namespace with decimal versions:
+
+* sqrt, exp, log, log10 use Decimal's correctly rounded methods.
+* Trig, inverse trig and hyperbolic functions are series evaluated with
+  GUARD_DIGITS extra digits (more after a large argument reduction) and then
+  rounded to N digits. DEG-mode variants reduce the angle modulo 360 exactly
+  first, so sin(180) is exactly 0.
+* pi and e are computed once per precision level. `CONSTANTS` keeps each
+  constant at the highest precision computed so far, so a lower precision is
+  a rounding of the cached digits and switching back and forth never
+  recomputes. pi uses the Chudnovsky series with binary splitting in integers.
+
+This module imports `decimal`, so the calculator only loads it when a
+precision is selected.
+"""
+
+import decimal
+import math
+from decimal import Decimal, localcontext
+
+from omnicalc.combinatorics import factorial, nCr, nPr, multinomial
+from omnicalc.cost import DEFAULT_MAX_BITS, ResultTooLarge, estimate_bits
+from omnicalc.evaluator import CompiledExpression
+from omnicalc.exact import Rational
+from omnicalc.parser import Call, Number
+
+DEFAULT_PRECISION = 50
+MAX_PRECISION = 10000
+GUARD_DIGITS = 10
+
+
+def make_context(precision):
+    """Decimal context for `precision` significant digits with an unbounded exponent range."""
+    return decimal.Context(prec=precision, Emax=decimal.MAX_EMAX, Emin=decimal.MIN_EMIN,
+                           traps=[decimal.InvalidOperation, decimal.DivisionByZero, decimal.Overflow])
+
+
+def evaluation_context(precision):
+    """The context expressions are evaluated in: `precision` plus guard digits."""
+    return make_context(precision + GUARD_DIGITS)
+
+
+def check_precision(precision):
+    if not isinstance(precision, int) or not 1 <= precision <= MAX_PRECISION:
+        raise ValueError(f"precision must be an integer from 1 to {MAX_PRECISION}")
+    return precision
+
+
+def parse_decimal(text):
+    """Parser number hook: every NUMBER token becomes an exact Decimal."""
+    return Decimal(text)
+
+
+# --- Conversions ---
+
+def int_to_decimal(value):
+    """
+    An int rounded to the current context.
+
+    Decimal(int) converts every digit (quadratic in the length), so large
+    ints are cut down to their leading bits first and scaled by a power of two.
+    """
+    spare = value.bit_length() - (decimal.getcontext().prec + GUARD_DIGITS) * 4
+    if spare <= 0:
+        return +Decimal(value)
+    with localcontext() as ctx:
+        ctx.prec += GUARD_DIGITS
+        scaled = Decimal(value >> spare) * Decimal(2) ** spare
+    return +scaled
+
+
+def to_decimal(value):
+    """Convert an int, float, Rational or Decimal (e.g. ANS or memory) to the current context."""
+    if isinstance(value, Decimal):
+        return +value
+    if isinstance(value, bool):
+        return Decimal(int(value))
+    if isinstance(value, int):
+        return int_to_decimal(value)
+    if type(value) is Rational:
+        return int_to_decimal(value.num) / int_to_decimal(value.den)
+    if isinstance(value, float) and math.isfinite(value):
+        return +Decimal(repr(value))  # the shortest repr, as typed, not the binary expansion
+    raise TypeError(f"cannot use {value!r} in decimal mode")
+
+
+def format_decimal(value, precision):
+    """Show `value` (any type to_decimal accepts) with at most `precision` significant digits."""
+    with localcontext(make_context(precision)):
+        value = to_decimal(value)
+    if value.is_zero():
+        return "0"
+    value = value.normalize(make_context(precision))
+    exponent = value.adjusted()
+    if -7 < exponent < precision:
+        return format(value, 'f')
+    return format(value, 'e')
+
+
+# --- Constants ---
+
+def _chudnovsky_pi(digits):
+    """pi to `digits` significant digits (Chudnovsky, ~14 digits per term)."""
+    c3_over_24 = 640320 ** 3 // 24
+
+    def split(a, b):
+        if b - a == 1:
+            if a == 0:
+                p = q = 1
+            else:
+                p = (6 * a - 5) * (2 * a - 1) * (6 * a - 1)
+                q = a * a * a * c3_over_24
+            t = p * (13591409 + 545140134 * a)
+            return p, q, -t if a & 1 else t
+        middle = (a + b) // 2
+        p1, q1, t1 = split(a, middle)
+        p2, q2, t2 = split(middle, b)
+        return p1 * p2, q1 * q2, q2 * t1 + p1 * t2
+
+    _, q, t = split(0, digits // 14 + 2)
+    with localcontext(make_context(digits + GUARD_DIGITS)):
+        value = Decimal(426880) * Decimal(10005).sqrt() * int_to_decimal(q) / int_to_decimal(t)
+    return make_context(digits).plus(value)
+
+
+def _e(digits):
+    """e to `digits` significant digits: sum of 1/k! by binary splitting (Decimal.exp is slow this large)."""
+    def split(a, b):
+        # sum over k in (a, b] of (a+1)...k / ((a+1)...b), as (numerator, denominator)
+        if b - a == 1:
+            return 1, b
+        middle = (a + b) // 2
+        p1, q1 = split(a, middle)
+        p2, q2 = split(middle, b)
+        return p1 * q2 + p2, q1 * q2
+
+    terms, log10_factorial = 1, 0.0
+    while log10_factorial < digits + GUARD_DIGITS:
+        terms += 1
+        log10_factorial += math.log10(terms)
+    p, q = split(0, terms)
+    with localcontext(make_context(digits + GUARD_DIGITS)):
+        value = 1 + int_to_decimal(p) / int_to_decimal(q)
+    return make_context(digits).plus(value)
+
+
+class ConstantCache:
+    """
+    Constants by precision. The most precise value of each constant is kept
+    and lower precisions are roundings of it, memoized per precision.
+    """
+
+    def __init__(self, computations):
+        self._computations = computations
+        self._best = {}     # name -> (precision, value)
+        self._rounded = {}  # (name, precision) -> value
+
+    def get(self, name, precision):
+        value = self._rounded.get((name, precision))
+        if value is None:
+            best = self._best.get(name)
+            if best is None or best[0] < precision:
+                best = self._best[name] = (precision, self._computations[name](precision))
+            value = self._rounded[name, precision] = make_context(precision).plus(best[1])
+        return value
+
+    def clear(self):
+        self._best.clear()
+        self._rounded.clear()
+
+
+CONSTANTS = ConstantCache({'pi': _chudnovsky_pi, 'e': _e})
+
+
+def pi(precision=None):
+    return CONSTANTS.get('pi', precision or decimal.getcontext().prec)
+
+
+# --- Functions ---
+# Each function works in a copy of the caller's context with extra digits and
+# rounds its result back with unary plus once the copy is gone.
+
+def _working(extra=0):
+    context = decimal.getcontext().copy()
+    context.prec += GUARD_DIGITS + max(extra, 0)
+    return localcontext(context)
+
+
+def _series(x, total, term, start):
+    """Sum of the sin/cos Taylor series from `term` (the first term) at index `start`."""
+    x2 = x * x
+    n = start
+    while True:
+        n += 2
+        term = -term * x2 / (n * (n - 1))
+        updated = total + term
+        if updated == total:
+            return total
+        total = updated
+
+
+def _sin_cos_reduced(x, want_sin):
+    """sin or cos of x in the working context (no final rounding)."""
+    two_pi = 2 * pi(decimal.getcontext().prec)
+    x -= two_pi * (x / two_pi).to_integral_value()
+    return _series(x, x, x, 1) if want_sin else _series(x, Decimal(1), Decimal(1), 0)
+
+
+def sin(x):
+    with _working(x.adjusted()):
+        result = _sin_cos_reduced(x, True)
+    return +result
+
+
+def cos(x):
+    with _working(x.adjusted()):
+        result = _sin_cos_reduced(x, False)
+    return +result
+
+
+def tan(x):
+    with _working(x.adjusted()):
+        result = _sin_cos_reduced(x, True) / _sin_cos_reduced(x, False)
+    return +result
+
+
+def _atan(x):
+    """atan(x) in the working context."""
+    if x.is_zero():
+        return x
+    if abs(x) > 1:
+        half_pi = pi(decimal.getcontext().prec) / 2
+        return (half_pi if x > 0 else -half_pi) - _atan(1 / x)
+    halvings = 0
+    while abs(x) > Decimal('0.1'):
+        x = x / (1 + (1 + x * x).sqrt())  # atan(x) = 2 atan(x / (1 + sqrt(1 + x^2)))
+        halvings += 1
+    x2 = x * x
+    total = term = x
+    n = 1
+    while True:
+        term = -term * x2
+        n += 2
+        updated = total + term / n
+        if updated == total:
+            break
+        total = updated
+    return total * (1 << halvings)
+
+
+def atan(x):
+    with _working():
+        result = _atan(x)
+    return +result
+
+
+def _asin(x):
+    if abs(x) > 1:
+        raise ValueError("math domain error")
+    if abs(x) == 1:
+        half_pi = pi(decimal.getcontext().prec) / 2
+        return half_pi if x > 0 else -half_pi
+    return _atan(x / ((1 - x) * (1 + x)).sqrt())
+
+
+def asin(x):
+    with _working():
+        result = _asin(x)
+    return +result
+
+
+def acos(x):
+    with _working():
+        result = pi(decimal.getcontext().prec) / 2 - _asin(x)
+    return +result
+
+
+def sinh(x):
+    with _working(-x.adjusted()):  # e^x - e^-x cancels for small x
+        exp_x = x.exp()
+        result = (exp_x - 1 / exp_x) / 2
+    return +result
+
+
+def cosh(x):
+    with _working():
+        exp_x = x.exp()
+        result = (exp_x + 1 / exp_x) / 2
+    return +result
+
+
+def tanh(x):
+    if abs(x) > decimal.getcontext().prec * 2:
+        return Decimal(1).copy_sign(x)
+    with _working(-x.adjusted()):
+        exp_2x = (2 * x).exp()
+        result = (exp_2x - 1) / (exp_2x + 1)
+    return +result
+
+
+def asinh(x):
+    with _working(-x.adjusted()):
+        result = (abs(x) + (x * x + 1).sqrt()).ln().copy_sign(x)
+    return +result
+
+
+def acosh(x):
+    if x < 1:
+        raise ValueError("math domain error")
+    with _working():
+        result = (x + (x * x - 1).sqrt()).ln()
+    return +result
+
+
+def atanh(x):
+    if abs(x) >= 1:
+        raise ValueError("math domain error")
+    with _working(-x.adjusted()):
+        result = ((1 + x) / (1 - x)).ln() / 2
+    return +result
+
+
+# DEG mode: exact reduction modulo 360, so the quarter turns are exact.
+
+def _reduce_degrees(x, period):
+    """x modulo `period` in [0, period), exactly."""
+    with localcontext() as ctx:
+        ctx.prec = max(ctx.prec, x.adjusted() + GUARD_DIGITS)  # the quotient must fit
+        x = x % period
+        if x < 0:
+            x += period
+    return x
+
+
+def _degrees_to_radians(x):
+    return x * pi(decimal.getcontext().prec) / 180
+
+
+def sind(x):
+    x = _reduce_degrees(x, 360)
+    if x % 180 == 0:
+        return Decimal(0)
+    if x % 90 == 0:
+        return Decimal(1 if x == 90 else -1)
+    with _working(3):
+        result = _sin_cos_reduced(_degrees_to_radians(x), True)
+    return +result
+
+
+def cosd(x):
+    return sind(x + 90)
+
+
+def tand(x):
+    x = _reduce_degrees(x, 180)
+    if x == 0:
+        return Decimal(0)
+    if x == 90:
+        raise ValueError("tan is undefined at odd multiples of 90 degrees")
+    with _working(3):
+        radians = _degrees_to_radians(x)
+        result = _sin_cos_reduced(radians, True) / _sin_cos_reduced(radians, False)
+    return +result
+
+
+def _to_degrees(function):
+    def in_degrees(x):
+        with _working():
+            result = function(x) * 180 / pi(decimal.getcontext().prec)
+        return +result
+    return in_degrees
+
+
+asind = _to_degrees(_asin)
+atand = _to_degrees(_atan)
+
+
+def acosd(x):
+    with _working():
+        result = 90 - _asin(x) * 180 / pi(decimal.getcontext().prec)
+    return +result
+
+
+def sqrt(x):
+    return x.sqrt()
+
+
+def exp(x):
+    return x.exp()
+
+
+def log(x, base=None):
+    if base is None:
+        return x.ln()
+    with _working():
+        result = x.ln() / base.ln()
+    return +result
+
+
+def log10(x):
+    return x.log10()
+
+
+def log_base_y(y, x):
+    """Calculates log base y of x."""
+    if y <= 0 or y == 1 or x <= 0:
+        raise ValueError("Invalid input for log base y: y must be positive and not 1, x must be positive.")
+    return log(x, y)
+
+
+def _real_root(y, n):
+    """The real n-th root of y (negative y only for odd integral n)."""
+    if n == 0:
+        raise ZeroDivisionError("Cannot take the 0-th root.")
+    if y.is_zero():
+        return Decimal(0)
+    odd = n == n.to_integral_value() and n % 2 != 0
+    if y < 0 and not odd:
+        raise ValueError("Cannot take an even root of a negative number.")
+    with _working():
+        result = (abs(y).ln() / n).exp().copy_sign(y)
+    return +result
+
+
+def cbrt(x):
+    return _real_root(x, Decimal(3))
+
+
+def xth_root(y, x):
+    """Calculates the x-th root of y (y^(1/x))."""
+    return _real_root(y, x)
+
+
+# --- Integer functions ---
+
+def _integer_function(function):
+    """Wrap an exact integer function for Decimal arguments, with the cost check of float mode."""
+    def wrapper(*args):
+        integers = []
+        for arg in args:
+            if isinstance(arg, Decimal):
+                if arg != arg.to_integral_value():
+                    raise ValueError(f"{function.__name__}() only accepts integral values")
+                arg = int(arg)
+            integers.append(arg)
+        if estimate_bits(Call('f', tuple(Number(arg) for arg in integers)), {'f': function}) > DEFAULT_MAX_BITS:
+            raise ResultTooLarge(f"{function.__name__}() result too large for exact evaluation")
+        return int_to_decimal(function(*integers))
+    wrapper.__name__ = function.__name__
+    return wrapper
+
+
+def _lift(function):
+    """Wrap a float function from the namespace: Decimal in, Decimal out."""
+    def wrapper(*args):
+        result = function(*[float(arg) if isinstance(arg, Decimal) else arg for arg in args])
+        return to_decimal(result) if isinstance(result, (int, float)) else result
+    return wrapper
+
+
+DECIMAL_FUNCTIONS = {
+    'sqrt': sqrt, 'cbrt': cbrt, 'log': log, 'log10': log10, 'exp': exp, 'abs': abs, 'pow': pow,
+    'log_y': log_base_y, 'y_root_x': xth_root,
+    'sin': sin, 'cos': cos, 'tan': tan, 'asin': asin, 'acos': acos, 'atan': atan,
+    'sinh': sinh, 'cosh': cosh, 'tanh': tanh, 'asinh': asinh, 'acosh': acosh, 'atanh': atanh,
+    'sind': sind, 'cosd': cosd, 'tand': tand, 'asind': asind, 'acosd': acosd, 'atand': atand,
+    'factorial': _integer_function(factorial), 'nCr': _integer_function(nCr),
+    'nPr': _integer_function(nPr), 'multinomial': _integer_function(multinomial),
+}
+
+
+def precise_namespace(namespace, precision):
+    """
+    The decimal counterpart of an evaluation namespace for `precision` digits.
+
+    Known functions are replaced by the decimal versions above, pi and e come
+    from CONSTANTS, other numbers are converted and any other callable is
+    wrapped to take and return Decimals through float.
+    """
+    result = {}
+    context = evaluation_context(precision)
+    with localcontext(context):
+        for name, value in namespace.items():
+            if name in DECIMAL_FUNCTIONS:
+                result[name] = DECIMAL_FUNCTIONS[name]
+            elif name in ('pi', 'e'):
+                result[name] = CONSTANTS.get(name, context.prec)
+            elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                result[name] = to_decimal(value)
+            elif callable(value):
+                result[name] = _lift(value)
+            else:
+                result[name] = value
+    return result
+
+
+def in_context(compiled, precision):
+    """Wrap a CompiledExpression to run in the evaluation context, with variables as Decimals."""
+    function = compiled.function
+    context = evaluation_context(precision)
+
+    def run(env):
+        with localcontext(context):
+            if env:
+                env = {name: to_decimal(value) for name, value in env.items()}
+            return function(env)
+    return CompiledExpression(compiled.tree, run, compiled.variables)
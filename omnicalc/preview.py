@@ -0,0 +1,205 @@
+"""
+Live result preview that does constant work per keystroke.
+
+`IncrementalParser` keeps a copy of the parser state after every token. When
+the expression changes it finds the first edited character, resumes from the
+state before the first token that could have changed and parses only the
+tail. Subtrees built before the edit are the very same objects as last time,
+so `LivePreview` memoizes values by node identity and only evaluates what is
+new: the tail plus the chain of operators still open at the end.
+
+Preview runs on the GUI thread, so integer work is capped at a much smaller
+budget than '=' and any expression over it simply shows no preview.
+
+With a `precision`, literals are parsed as Decimals and evaluated in a decimal
+context (see omnicalc.precise); the namespace must then be the matching
+precise_namespace().
+"""
+
+from bisect import bisect_left
+
+from omnicalc.cost import estimate_bits, ResultTooLarge
+from omnicalc.evaluator import BINARY_OPERATORS, EXACT_BINARY_OPERATORS, UNARY_OPERATORS
+from omnicalc.exact import Rational, parse_exact
+from omnicalc.parser import (
+    TOKEN_RE, ParseState, Number, Name, UnaryOp, BinOp, Call,
+    compose_transforms, degrees_transform, constants_transform, numeric_constants, parse_number,
+)
+
+PREVIEW_MAX_BITS = 1 << 16
+MEMO_LIMIT = 4096
+# Kept tokens re-matched after an edit: a number can grow into the edit
+# through its 'e' and sign ('1e+' -> '1e+5' is one NUMBER, not three tokens).
+REMATCH_TOKENS = 3
+_EXACT_TYPES = (int, Rational)
+
+
+class IncrementalParser:
+    """Parses successive versions of one expression, re-parsing only what changed."""
+
+    def __init__(self, transforms=(), number=parse_number):
+        self.text = ""
+        self._ends = []                                                    # end offset of every consumed token
+        self._states = [ParseState(compose_transforms(transforms), number)]  # state after 0, 1, ... tokens
+
+    def _common_prefix(self, text):
+        old = self.text
+        if text.startswith(old):
+            return len(old)
+        if old.startswith(text):
+            return len(text)
+        size = min(len(old), len(text))
+        index = 0
+        while index < size and old[index] == text[index]:
+            index += 1
+        return index
+
+    def parse(self, text):
+        """Return the tree for `text`; raises ParseError like parser.parse()."""
+        # A token ending before the first changed character matched the same
+        # text, but a longer match may now reach into the edit ('1e' -> '1e5').
+        # Tokens cover the text without gaps, so re-match the last few at their
+        # old starts and resume before the first that would now end elsewhere.
+        ends = self._ends
+        kept = bisect_left(ends, self._common_prefix(text))
+        for index in range(max(kept - REMATCH_TOKENS, 0), kept):
+            if TOKEN_RE.match(text, ends[index - 1] if index else 0).end() != ends[index]:
+                kept = index
+                break
+        del self._ends[kept:]
+        del self._states[kept + 1:]
+        self.text = text
+
+        state = self._states[-1].copy()
+        start = self._ends[-1] if kept else 0
+        for match in TOKEN_RE.finditer(text, start):
+            state.feed(match)
+            self._ends.append(match.end())
+            self._states.append(state)
+            state = state.copy()
+        return state.finish()
+
+
+class LivePreview:
+    """
+    Computes the result preview shown while typing.
+
+    `update()` returns the formatted result, or "" while the expression is
+    incomplete, invalid, too costly or already equal to its result.
+    """
+
+    def __init__(self, namespace, format_result=str, max_bits=PREVIEW_MAX_BITS):
+        self.namespace = namespace
+        self.format_result = format_result
+        self.max_bits = max_bits
+        self._parser = None
+        self._key = None
+        self._env = None
+        self._memo = {}
+        self._exact = False
+        self._context = None
+        self._operators = BINARY_OPERATORS
+
+    def _reset(self, deg_mode, exact, precision):
+        transforms = [constants_transform(numeric_constants(self.namespace))]
+        if deg_mode:
+            transforms.append(degrees_transform)
+        number = parse_exact if exact else parse_number
+        self._context = None
+        if precision is not None:
+            from omnicalc.precise import evaluation_context, parse_decimal
+            number = parse_decimal
+            self._context = evaluation_context(precision)
+        self._parser = IncrementalParser(transforms, number)
+        self._exact = exact
+        self._operators = EXACT_BINARY_OPERATORS if exact else BINARY_OPERATORS
+        self._memo.clear()
+
+    def update(self, expression, deg_mode=True, env=None, exact=False, precision=None, format_result=None):
+        key = (deg_mode, exact, precision, id(self.namespace), getattr(self.namespace, 'version', None))
+        if key != self._key:
+            self._key = key
+            self._reset(deg_mode, exact, precision)
+        if env != self._env:
+            self._env = dict(env) if env else None
+            self._memo.clear()
+
+        try:
+            if self._context is None:
+                value = self._evaluate(self._parser.parse(expression))
+            else:
+                value = self._evaluate_in_context(expression)
+            result = (format_result or self.format_result)(value)
+        except Exception:
+            return ""
+        # Nothing to preview when the expression already is its own result.
+        return "" if result == expression.strip() else result
+
+    def _evaluate_in_context(self, expression):
+        from decimal import localcontext
+        from omnicalc.precise import to_decimal
+        with localcontext(self._context):
+            saved = self._env
+            if saved:
+                self._env = {name: to_decimal(value) for name, value in saved.items()}
+            try:
+                return self._evaluate(self._parser.parse(expression))
+            finally:
+                self._env = saved
+
+    def _check_cost(self, node):
+        if estimate_bits(node, self.namespace, exact=self._exact) > self.max_bits:
+            raise ResultTooLarge("Result too large to preview")
+
+    def _evaluate(self, tree):
+        memo = self._memo
+        if len(memo) > MEMO_LIMIT:
+            memo.clear()
+        namespace = self.namespace
+        env = self._env or {}
+        results = []
+        stack = [(tree, False)]
+        while stack:
+            node, children_done = stack.pop()
+            node_type = type(node)
+            if node_type is Number:
+                results.append(node.value)
+                continue
+            if node_type is Name:
+                if node.id in env:
+                    results.append(env[node.id])
+                elif node.id in namespace:
+                    results.append(namespace[node.id])
+                else:
+                    raise NameError(f"name '{node.id}' is not defined")
+                continue
+            cached = memo.get(id(node))
+            if cached is not None and cached[0] is node:
+                results.append(cached[1])
+                continue
+            if not children_done:
+                stack.append((node, True))
+                children = (node.left, node.right) if node_type is BinOp else \
+                    (node.operand,) if node_type is UnaryOp else node.args
+                stack.extend((child, False) for child in reversed(children))
+                continue
+
+            if node_type is BinOp:
+                right = results.pop()
+                left = results[-1]
+                if type(left) in _EXACT_TYPES and type(right) in _EXACT_TYPES:
+                    self._check_cost(BinOp(node.op, Number(left), Number(right)))
+                value = self._operators[node.op](left, right)
+                results[-1] = value
+            elif node_type is UnaryOp:
+                value = results[-1] = UNARY_OPERATORS[node.op](results[-1])
+            else:
+                count = len(node.args)
+                args = results[len(results) - count:]
+                del results[len(results) - count:]
+                self._check_cost(Call(node.func, tuple(Number(arg) for arg in args)))
+                value = namespace[node.func](*args)
+                results.append(value)
+            # Keep the node alive alongside its value so its id cannot be reused.
+            memo[id(node)] = (node, value)
+        return results[0]
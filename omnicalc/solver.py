@@ -0,0 +1,453 @@
+"""
+Roots of f(x) = 0 for the calculator's solve mode.
+
+Derivatives come from forward-mode automatic differentiation. A `Dual`
+carries a value and its derivative through the same compiled expression,
+and `dual_namespace()` replaces every function of the evaluation namespace
+(the DEG-mode trig variants included) with one that also applies the chain
+rule. One call gives f(x) and f'(x) to full precision, with none of the
+step-size trouble of finite differences.
+
+`find_roots()` scans an interval with one vectorized evaluate_many call and
+polishes every sign change with `newton_bracketed()`: Newton steps while they
+stay inside the bracket and shrink it fast enough, bisection otherwise, so it
+converges like Newton and cannot escape. Where there is no derivative
+(factorial and the other integer functions) `brent()` takes over. Roots of
+even multiplicity, where f touches zero without changing sign, are found
+by locating the zero of f' next to the grid points where |f| is smallest.
+"""
+
+import math
+import sys
+import time
+from collections import namedtuple
+
+from omnicalc.combinatorics import factorial, nCr, nPr, multinomial
+
+EPSILON = sys.float_info.epsilon
+DEFAULT_POINTS = 1000
+MAX_ITERATIONS = 100
+
+Root = namedtuple('Root', 'x iterations method')
+SolveReport = namedtuple('SolveReport', 'roots iterations evaluations seconds')
+
+
+class NotDifferentiable(ValueError):
+    """Raised when the derivative passes through a function that has none (e.g. factorial)."""
+
+
+# --- Dual numbers ---
+
+class Dual:
+    """value + slope·ε with ε² = 0: evaluating f on Dual(x, 1) gives f(x) and f'(x)."""
+
+    __slots__ = ('value', 'slope')
+
+    def __init__(self, value, slope=0.0):
+        self.value = value
+        self.slope = slope
+
+    def __add__(self, other):
+        if type(other) is Dual:
+            return Dual(self.value + other.value, self.slope + other.slope)
+        return Dual(self.value + other, self.slope)
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        if type(other) is Dual:
+            return Dual(self.value - other.value, self.slope - other.slope)
+        return Dual(self.value - other, self.slope)
+
+    def __rsub__(self, other):
+        return Dual(other - self.value, -self.slope)
+
+    def __mul__(self, other):
+        if type(other) is Dual:
+            return Dual(self.value * other.value, self.slope * other.value + self.value * other.slope)
+        return Dual(self.value * other, self.slope * other)
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, other):
+        if type(other) is Dual:
+            value = self.value / other.value
+            return Dual(value, (self.slope - value * other.slope) / other.value)
+        return Dual(self.value / other, self.slope / other)
+
+    def __rtruediv__(self, other):
+        value = other / self.value
+        return Dual(value, -value * self.slope / self.value)
+
+    def __floordiv__(self, other):
+        return Dual(self.value // _value(other), 0.0)
+
+    def __rfloordiv__(self, other):
+        return Dual(other // self.value, 0.0)
+
+    def __mod__(self, other):
+        # a % b = a - b*floor(a/b), and floor is flat almost everywhere
+        quotient = self.value // _value(other)
+        return self - other * quotient
+
+    def __rmod__(self, other):
+        return other - self * (other // self.value)
+
+    def __pow__(self, other):
+        if type(other) is Dual and other.slope:
+            value = self.value ** other.value
+            return Dual(value, value * (other.slope * math.log(self.value) + other.value * self.slope / self.value))
+        exponent = _value(other)
+        if exponent == 0:
+            return Dual(1.0, 0.0)
+        return Dual(self.value ** exponent, exponent * self.value ** (exponent - 1) * self.slope)
+
+    def __rpow__(self, other):
+        value = other ** self.value
+        return Dual(value, value * math.log(other) * self.slope if self.slope else 0.0)
+
+    def __neg__(self):
+        return Dual(-self.value, -self.slope)
+
+    def __pos__(self):
+        return self
+
+    def __abs__(self):
+        return self if self.value >= 0 else -self
+
+    # Comparisons and conversions look at the value (for functions that branch on it).
+    def __lt__(self, other):
+        return self.value < _value(other)
+
+    def __le__(self, other):
+        return self.value <= _value(other)
+
+    def __gt__(self, other):
+        return self.value > _value(other)
+
+    def __ge__(self, other):
+        return self.value >= _value(other)
+
+    def __eq__(self, other):
+        return self.value == _value(other)
+
+    __hash__ = None
+
+    def __float__(self):
+        return float(self.value)
+
+    def __repr__(self):
+        return f"Dual({self.value!r}, {self.slope!r})"
+
+
+def _value(x):
+    return x.value if type(x) is Dual else x
+
+
+def _varies(args):
+    return any(type(arg) is Dual and arg.slope for arg in args)
+
+
+# --- Dual namespace ---
+
+RADIAN = math.pi / 180
+
+# d/dx of each one-argument function, as a function of x.
+DERIVATIVES = {
+    'sqrt': lambda x: 0.5 / math.sqrt(x),
+    'cbrt': lambda x: 1 / (3 * abs(x) ** (2 / 3)),
+    'exp': math.exp,
+    'log10': lambda x: 1 / (x * math.log(10)),
+    'abs': lambda x: 1.0 if x > 0 else -1.0 if x < 0 else 0.0,
+    'sin': math.cos,
+    'cos': lambda x: -math.sin(x),
+    'tan': lambda x: 1 / math.cos(x) ** 2,
+    'asin': lambda x: 1 / math.sqrt(1 - x * x),
+    'acos': lambda x: -1 / math.sqrt(1 - x * x),
+    'atan': lambda x: 1 / (1 + x * x),
+    'sinh': math.cosh,
+    'cosh': math.sinh,
+    'tanh': lambda x: 1 / math.cosh(x) ** 2,
+    'asinh': lambda x: 1 / math.sqrt(x * x + 1),
+    'acosh': lambda x: 1 / math.sqrt(x * x - 1),
+    'atanh': lambda x: 1 / (1 - x * x),
+    'sind': lambda x: RADIAN * math.cos(math.radians(x)),
+    'cosd': lambda x: -RADIAN * math.sin(math.radians(x)),
+    'tand': lambda x: RADIAN / math.cos(math.radians(x)) ** 2,
+    'asind': lambda x: 1 / (RADIAN * math.sqrt(1 - x * x)),
+    'acosd': lambda x: -1 / (RADIAN * math.sqrt(1 - x * x)),
+    'atand': lambda x: 1 / (RADIAN * (1 + x * x)),
+}
+
+
+def _chain(function, derivative):
+    """`function` on values, extended to Duals by the chain rule."""
+    def dual(x):
+        if type(x) is not Dual:
+            return function(x)
+        return Dual(function(x.value), derivative(x.value) * x.slope if x.slope else 0.0)
+    return dual
+
+
+def _no_derivative(function):
+    """`function` on values; a Dual argument that varies has no derivative to pass on."""
+    def dual(*args):
+        if _varies(args):
+            raise NotDifferentiable(f"{getattr(function, '__name__', 'function')}() has no derivative")
+        return function(*[_value(arg) for arg in args])
+    return dual
+
+
+def _dual_log(x, base=None):
+    if type(x) is not Dual and type(base) is not Dual:
+        return math.log(x) if base is None else math.log(x, base)
+    result = _chain(math.log, lambda v: 1 / v)(x)
+    return result if base is None else result / _chain(math.log, lambda v: 1 / v)(base)
+
+
+def _dual_functions(namespace):
+    functions = {name: _chain(namespace[name], derivative)
+                 for name, derivative in DERIVATIVES.items() if name in namespace}
+    log_y = namespace.get('log_y')
+    y_root_x = namespace.get('y_root_x')
+
+    def dual_log_y(y, x):
+        if not _varies((y, x)):
+            return log_y(_value(y), _value(x))
+        return _dual_log(x, y)
+
+    def dual_y_root_x(y, x):
+        value = y_root_x(_value(y), _value(x))
+        if not _varies((y, x)):
+            return value
+        # ln|v| = ln|y| / x, so v' = v * (y'/(x*y) - x' ln|y| / x²)
+        yv, xv = _value(y), _value(x)
+        y_slope = y.slope if type(y) is Dual else 0.0
+        x_slope = x.slope if type(x) is Dual else 0.0
+        slope = value * ((y_slope / (xv * yv) if y_slope else 0.0)
+                         - (x_slope * math.log(abs(yv)) / (xv * xv) if x_slope else 0.0))
+        return Dual(value, slope)
+
+    functions.update({
+        'log': _dual_log, 'pow': pow,
+        'log_y': dual_log_y, 'y_root_x': dual_y_root_x,
+        'factorial': _no_derivative(factorial), 'nCr': _no_derivative(nCr),
+        'nPr': _no_derivative(nPr), 'multinomial': _no_derivative(multinomial),
+    })
+    return functions
+
+
+def dual_namespace(namespace):
+    """
+    The Dual counterpart of an evaluation namespace.
+
+    Known functions get their derivatives, numbers stay as they are and any
+    other callable works on constant arguments only (NotDifferentiable otherwise).
+    """
+    functions = _dual_functions(namespace)
+    result = {}
+    for name, value in namespace.items():
+        if name in functions:
+            result[name] = functions[name]
+        elif callable(value):
+            result[name] = _no_derivative(value)
+        else:
+            result[name] = value
+    return result
+
+
+def derivative_function(compiled, env, variable='x'):
+    """fdf(x) -> (f(x), f'(x)) as floats, for an expression compiled against dual_namespace()."""
+    env = dict(env or {})
+
+    def fdf(x):
+        env[variable] = Dual(x, 1.0)
+        result = compiled(env)
+        if type(result) is Dual:
+            return float(result.value), float(result.slope)
+        return float(result), 0.0  # does not depend on x
+    return fdf
+
+
+# --- Bracketed solvers ---
+
+def _finite(value):
+    return value - value == 0
+
+
+def newton_bracketed(fdf, a, b, fa, fb, xtol, max_iterations=MAX_ITERATIONS):
+    """
+    Root of f in [a, b], where fa and fb have opposite signs, as (x, iterations);
+    None when f cannot be evaluated inside. Newton steps are taken while they
+    land inside the bracket and shrink fast enough, otherwise the bracket is bisected.
+    """
+    if fa > 0:
+        a, b = b, a  # f(a) < 0 < f(b) from here on
+    x = (a + b) / 2
+    step = previous_step = abs(b - a)
+    for iteration in range(1, max_iterations + 1):
+        f, df = fdf(x)
+        if f == 0:
+            return x, iteration
+        if not _finite(f):
+            return None
+        if f < 0:
+            a = x
+        else:
+            b = x
+        newton = x - f / df if df and _finite(df) else None
+        if newton is not None and min(a, b) <= newton <= max(a, b) and abs(2 * f) < abs(previous_step * df):
+            previous_step, step = step, abs(newton - x)
+            x = newton
+        else:
+            previous_step, step = step, abs(b - a) / 2
+            x = (a + b) / 2
+        if step <= xtol + 2 * EPSILON * abs(x):
+            return x, iteration
+    return x, max_iterations
+
+
+def brent(f, a, b, fa, fb, xtol, max_iterations=MAX_ITERATIONS):
+    """
+    Root of f in [a, b], where fa and fb have opposite signs, by Brent's method
+    (inverse quadratic interpolation, secant steps and bisection; no derivative).
+    Returns (x, iterations), or None when f cannot be evaluated inside.
+    """
+    x_prev, x_cur, f_prev, f_cur = a, b, fa, fb
+    x_block = f_block = 0.0
+    s_prev = s_cur = 0.0
+    for iteration in range(1, max_iterations + 1):
+        if f_prev * f_cur < 0:
+            x_block, f_block = x_prev, f_prev
+            s_prev = s_cur = x_cur - x_prev
+        if abs(f_block) < abs(f_cur):
+            x_prev, x_cur, x_block = x_cur, x_block, x_cur
+            f_prev, f_cur, f_block = f_cur, f_block, f_cur
+        delta = (xtol + 2 * EPSILON * abs(x_cur)) / 2
+        s_bisect = (x_block - x_cur) / 2
+        if f_cur == 0 or abs(s_bisect) < delta:
+            return x_cur, iteration
+        if abs(s_prev) > delta and abs(f_cur) < abs(f_prev):
+            if x_prev == x_block:
+                s_try = -f_cur * (x_cur - x_prev) / (f_cur - f_prev)  # secant
+            else:
+                d_prev = (f_prev - f_cur) / (x_prev - x_cur)
+                d_block = (f_block - f_cur) / (x_block - x_cur)
+                s_try = -f_cur * (f_block * d_block - f_prev * d_prev) / (d_block * d_prev * (f_block - f_prev))
+            if 2 * abs(s_try) < min(abs(s_prev), 3 * abs(s_bisect) - delta):
+                s_prev, s_cur = s_cur, s_try
+            else:
+                s_prev = s_cur = s_bisect
+        else:
+            s_prev = s_cur = s_bisect
+        x_prev, f_prev = x_cur, f_cur
+        x_cur += s_cur if abs(s_cur) > delta else (delta if s_bisect > 0 else -delta)
+        f_cur = f(x_cur)
+        if not _finite(f_cur):
+            return None
+    return x_cur, max_iterations
+
+
+# --- Finding every root in an interval ---
+
+def _safe(function, x, failed):
+    try:
+        return function(x)
+    except NotDifferentiable:
+        raise
+    except (ArithmeticError, ValueError, TypeError):
+        return failed
+
+
+def find_roots(scan, fdf, lo, hi, points=DEFAULT_POINTS):
+    """
+    Every root of f in [lo, hi] that the grid of `points` intervals can see.
+
+    `scan(xs)` evaluates f over a list of xs (CalculatorCore.evaluate_many)
+    and `fdf(x)` gives (f(x), f'(x)) (see derivative_function). A sign change
+    whose end is a pole (tan at 90 degrees) is not reported as a root.
+    """
+    start = time.perf_counter()
+    width = hi - lo
+    xs = [lo + width * i / points for i in range(points + 1)]
+    ys = scan(xs)
+    ys = ys.tolist() if hasattr(ys, 'tolist') else [float(y) for y in ys]
+    evaluations = len(xs)
+    xtol = 4 * EPSILON * max(abs(lo), abs(hi)) + 1e-15 * width
+
+    counted = [0]
+
+    def f(x):
+        counted[0] += 1
+        return _safe(lambda x: float(scan([x])[0]), x, math.nan)
+
+    def f_and_slope(x):
+        counted[0] += 1
+        return _safe(fdf, x, (math.nan, math.nan))
+
+    def polish(a, b, fa, fb):
+        try:
+            found = newton_bracketed(f_and_slope, a, b, fa, fb, xtol)
+            if found is not None:
+                return found + ('newton',)
+        except NotDifferentiable:
+            pass
+        # No derivative, or none inside the bracket (cbrt at 0): f alone may still do.
+        found = brent(f, a, b, fa, fb, xtol)
+        return found and found + ('brent',)
+
+    roots = []
+    finite = [_finite(y) for y in ys]
+    scale = max((abs(y) for y, ok in zip(ys, finite) if ok), default=1.0)
+    for i in range(points + 1):
+        if ys[i] == 0:
+            roots.append(Root(xs[i], 0, 'grid'))
+        if i == points or not (finite[i] and finite[i + 1]):
+            continue
+        a, b, fa, fb = xs[i], xs[i + 1], ys[i], ys[i + 1]
+        if fa * fb < 0:
+            found = polish(a, b, fa, fb)
+            if found is not None:
+                x, iterations, method = found
+                value = f(x)
+                # A sign change across a pole converges onto the pole, where |f| is huge;
+                # at a root with an infinite slope (cbrt) |f| is only far below both ends.
+                if abs(value) <= 1e-6 * (1 + abs(fa) + abs(fb)) or abs(value) < 1e-3 * min(abs(fa), abs(fb)):
+                    roots.append(Root(x, iterations, method))
+        elif 0 < i and finite[i - 1] and fa != 0 and abs(fa) <= abs(ys[i - 1]) and abs(fa) < abs(fb) \
+                and (fa > 0) == (ys[i - 1] > 0) == (fb > 0):
+            # |f| is smallest here without changing sign: f may touch zero where f' does.
+            root = _touching_root(f_and_slope, xs[i - 1], b, xtol, 64 * EPSILON * scale)
+            if root is not None:
+                roots.append(root)
+
+    roots.sort(key=lambda root: root.x)
+    unique = []
+    for root in roots:
+        if not unique or root.x - unique[-1].x > max(xtol, 1e-12 * abs(root.x)):
+            unique.append(root)
+    return SolveReport(unique, sum(root.iterations for root in unique),
+                       evaluations + counted[0], time.perf_counter() - start)
+
+
+def _touching_root(f_and_slope, a, b, xtol, ftol):
+    try:
+        fa, slope_a = f_and_slope(a)
+        fb, slope_b = f_and_slope(b)
+        if not slope_a * slope_b < 0:
+            return None
+        found = brent(lambda x: f_and_slope(x)[1], a, b, slope_a, slope_b, xtol)
+    except NotDifferentiable:
+        return None
+    if found is None:
+        return None
+    x, iterations = found
+    value = f_and_slope(x)[0]
+    return Root(x, iterations, 'brent') if abs(value) <= ftol else None
+
+
+def format_report(report, format_value=repr):
+    """'x = r1, r2 (N iterations, T ms)' or 'no roots (...)'."""
+    roots = ", ".join(format_value(root.x) for root in report.roots)
+    found = f"x = {roots}" if roots else "no roots"
+    return f"{found} ({report.iterations} iterations, {report.seconds * 1e3:.1f} ms)"
@@ -0,0 +1,111 @@
+"""
+Value tables: expressions in x over x = start, start + step, ..., stop.
+
+A `Table` computes no rows up front. `rows()` is a generator that evaluates
+CHUNK_ROWS values of x at a time with CalculatorCore.evaluate_many (one
+vectorized pass per chunk with NumPy in float mode), so a table of millions
+of rows can be streamed to `write_csv()` in constant memory, and the table
+panel (omnicalc.tableview) asks only for the rows on screen. Cells are
+formatted with the core's `_format_result`, exactly like results on the
+display; a value that cannot be computed is "Error".
+"""
+
+import csv
+import io
+import math
+
+# Rows evaluated per evaluate_many call.
+CHUNK_ROWS = 4096
+# Rows formatted into the CSV buffer between two writes to the output stream.
+DEFAULT_BATCH_ROWS = 8192
+ERROR_CELL = "Error"
+
+
+class Table:
+    """
+    `expressions` (in the variable x) for x = start, start + step, ... up to
+    stop, in the number mode `core` has when rows are produced.
+
+    start, stop and step may be numbers or expressions such as "2*pi"; they
+    are evaluated once, in the current number mode, so 0.1 steps are exact in
+    exact mode. Every expression is compiled here, so a typo raises before
+    any row is produced. Raises ValueError if step does not lead from start
+    to stop.
+    """
+
+    def __init__(self, core, expressions, start, stop, step):
+        self.core = core
+        self.expressions = tuple(expressions)
+        self.start, self.stop, self.step = (self._value(bound) for bound in (start, stop, step))
+        if not self.step or (self.stop - self.start) * self.step < 0:
+            raise ValueError("the step must be nonzero and lead from start to stop")
+        span = float(self.stop - self.start) / float(self.step)
+        if not math.isfinite(span):
+            raise ValueError("the table would be infinitely long")
+        # Tolerate rounding in float steps: 0..1 step 0.1 ends at 1, not 0.9.
+        self._length = math.floor(span + 1e-9 * max(1.0, span)) + 1
+        for expression in self.expressions:
+            core.evaluate_many(expression, [])
+
+    def _value(self, bound):
+        if isinstance(bound, str):
+            return self.core._compile_expression(bound)({'ANS': self.core.last_answer})
+        return bound
+
+    def __len__(self):
+        return self._length
+
+    @property
+    def header(self):
+        return ('x',) + self.expressions
+
+    def x(self, index):
+        return self.start + index * self.step
+
+    def rows(self, first=0, last=None):
+        """Yield rows first..last-1 (default: all) as tuples of strings: x, then each expression."""
+        last = self._length if last is None else min(last, self._length)
+        core = self.core
+        cell = _cell_formatter(core._format_result)
+        for chunk in range(max(first, 0), last, CHUNK_ROWS):
+            xs = [self.x(index) for index in range(chunk, min(chunk + CHUNK_ROWS, last))]
+            columns = [[cell(x) for x in xs]]
+            for expression in self.expressions:
+                values = core.evaluate_many(expression, xs)
+                columns.append([cell(value) for value in (values.tolist() if hasattr(values, 'tolist') else values)])
+            yield from zip(*columns)
+
+
+def _cell_formatter(format_result):
+    def cell(value):
+        try:
+            return format_result(value)
+        except (ArithmeticError, ValueError, TypeError):
+            return ERROR_CELL  # nan (the point failed) or inf
+    return cell
+
+
+def write_csv(rows, stream, header=None, batch_rows=DEFAULT_BATCH_ROWS):
+    """
+    Write rows (iterables of cells) to `stream` as CSV with a single write per
+    `batch_rows` rows; only one batch is in memory at a time. Returns the
+    number of rows written, not counting the header.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    if header is not None:
+        writer.writerow(header)
+    count = 0
+    pending = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+        pending += 1
+        if pending >= batch_rows:
+            stream.write(buffer.getvalue())
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    stream.write(buffer.getvalue())
+    stream.flush()
+    return count
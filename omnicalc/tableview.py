@@ -0,0 +1,154 @@
+"""
+The table panel: a virtualized list of the expression being typed over x.
+
+Only the rows that fit on the canvas are drawn, and they are computed on
+demand from an omnicalc.table.Table (a window of rows around the view is
+kept), so scrolling through a table of a million rows costs no more than
+through one of ten. The entries set start, stop and step; "CSV…" streams the
+whole table to a file with write_csv.
+"""
+
+import tkinter as tk
+
+from omnicalc.metrics import RedrawScheduler, LatencyHistogram
+from omnicalc.plotting import default_range
+from omnicalc.table import Table, write_csv
+
+# Default steps: 15° or 0.5 over the default graph range.
+DEG_STEP, RAD_STEP = 15, 0.5
+
+
+class TablePanel(tk.Frame):
+    """Tabulates `core`'s expression over x for the range in its entries."""
+
+    ROW_HEIGHT = 20
+    # Rows computed beyond each edge of the view, so small scrolls need no evaluation.
+    MARGIN_ROWS = 64
+
+    def __init__(self, master, core, bg, fg, grid, font=None):
+        tk.Frame.__init__(self, master, bg=bg)
+        self.core = core
+        self.bg, self.fg, self.grid_color, self.font = bg, fg, grid, font
+        self.redraw = RedrawScheduler(self, self._redraw, LatencyHistogram('table_redraw'))
+        self.expression = ""
+        self.first = 0  # index of the top row on screen
+        self._table = None
+        self._key = None
+        self._window = (0, 0, [])  # (first, last, rows) computed around the view
+        self._drawn = None
+
+        controls = tk.Frame(self, bg=bg)
+        controls.pack(fill='x')
+        self.entries = []
+        for label in ("from", "to", "step"):
+            tk.Label(controls, text=label, bg=bg, fg=fg, font=font).pack(side='left', padx=(4, 2))
+            entry = tk.Entry(controls, width=7, font=font)
+            entry.pack(side='left')
+            entry.bind('<Return>', lambda event: self.redraw.request())
+            entry.bind('<FocusOut>', lambda event: self.redraw.request())
+            self.entries.append(entry)
+        tk.Button(controls, text="CSV…", command=self.export, font=font).pack(side='right', padx=4)
+        self.reset_range()
+
+        self.scrollbar = tk.Scrollbar(self, orient='vertical', command=self._yview)
+        self.scrollbar.pack(side='right', fill='y')
+        self.canvas = tk.Canvas(self, bg=bg, highlightthickness=0, width=300, height=400)
+        self.canvas.pack(expand=True, fill='both')
+        canvas = self.canvas
+        canvas.bind('<Configure>', lambda event: self.redraw.request())
+        canvas.bind('<MouseWheel>', lambda event: self.scroll(-3 if event.delta > 0 else 3))
+        canvas.bind('<Button-4>', lambda event: self.scroll(-3))  # X11 wheel
+        canvas.bind('<Button-5>', lambda event: self.scroll(3))
+
+    def show(self, expression):
+        """Tabulate `expression` (redrawn when Tk is idle)."""
+        self.expression = expression
+        self.redraw.request()
+
+    def reset_range(self):
+        """Fill the entries with the default graph range for the angle mode."""
+        lo, hi = default_range(self.core.is_deg_mode)
+        step = DEG_STEP if self.core.is_deg_mode else RAD_STEP
+        for entry, value in zip(self.entries, (lo, hi, step)):
+            entry.delete(0, 'end')
+            entry.insert(0, f"{value:g}")
+        self.redraw.request()
+
+    def scroll(self, rows):
+        self.first += rows
+        self.redraw.request()
+
+    def export(self):
+        """Ask for a file name and write the whole table there as CSV."""
+        if self._table is None:
+            return
+        from tkinter import filedialog
+        path = filedialog.asksaveasfilename(defaultextension='.csv', filetypes=[("CSV", "*.csv")])
+        if path:
+            with open(path, 'w', encoding='utf-8', newline='', buffering=1 << 20) as stream:
+                write_csv(self._table.rows(), stream, self._table.header)
+
+    # --- Scrolling ---
+
+    def _visible_rows(self):
+        return max(self.canvas.winfo_height() // self.ROW_HEIGHT - 1, 1)  # minus the header row
+
+    def _yview(self, action, amount, unit=None):
+        length = len(self._table) if self._table is not None else 0
+        if action == 'moveto':
+            self.first = int(float(amount) * length)
+        elif action == 'scroll':
+            self.first += int(amount) * (self._visible_rows() if unit == 'pages' else 1)
+        self.redraw.request()
+
+    # --- Drawing ---
+
+    def _redraw(self):
+        core = self.core
+        namespace = core.safe_dict
+        bounds = tuple(entry.get().strip() for entry in self.entries)
+        key = (self.expression, bounds, core.is_deg_mode, core.is_exact_mode, core.precision,
+               core.last_answer, id(namespace), getattr(namespace, 'version', None))
+        if key != self._key:
+            self._key = key
+            self._window = (0, 0, [])
+            try:
+                self._table = Table(core, [self.expression], *bounds) if self.expression.strip() else None
+            except Exception:
+                self._table = None  # an incomplete expression or range while typing
+        rows = self._visible_rows()
+        length = len(self._table) if self._table is not None else 0
+        self.first = max(min(self.first, length - rows), 0)
+        state = (key, self.first, rows, self.canvas.winfo_width())
+        if state == self._drawn:
+            return
+        self._drawn = state
+
+        canvas = self.canvas
+        canvas.delete('all')
+        width = canvas.winfo_width()
+        self._draw_row(0, ('x', self.expression or 'f(x)'), width, self.grid_color)
+        if self._table is None:
+            return
+        for position, row in enumerate(self._rows(self.first, min(self.first + rows, length)), start=1):
+            self._draw_row(position, row, width, self.fg)
+        if length:
+            self.scrollbar.set(self.first / length, min(self.first + rows, length) / length)
+
+    def _rows(self, first, last):
+        window_first, window_last, window = self._window
+        if first < window_first or last > window_last:
+            window_first = max(first - self.MARGIN_ROWS, 0)
+            window = list(self._table.rows(window_first, last + self.MARGIN_ROWS))
+            window_last = window_first + len(window)
+            self._window = (window_first, window_last, window)
+        return window[first - window_first:last - window_first]
+
+    def _draw_row(self, position, row, width, color):
+        y = position * self.ROW_HEIGHT + self.ROW_HEIGHT // 2
+        x_text, value = row
+        self.canvas.create_text(6, y, anchor='w', text=x_text, fill=color, font=self.font)
+        self.canvas.create_text(width - 6, y, anchor='e', text=value, fill=color, font=self.font)
+        if position:
+            self.canvas.create_line(0, y - self.ROW_HEIGHT // 2, width, y - self.ROW_HEIGHT // 2,
+                                    fill=self.grid_color)
@@ -0,0 +1,170 @@
+"""
+Evaluating one expression over many values of `x`.
+
+`vector_namespace()` maps every entry of the evaluation namespace to a NumPy
+ufunc (or a composition of ufuncs), so an expression compiled once with the
+closure evaluator runs over a whole array in a single vectorized pass: each
+operator and function node is one ufunc call on the full array.
+
+Failing points give nan without failing the whole batch, as in the scalar
+fallback: domain errors are nan, and so are poles (1/0, log(0), atanh(1)),
+whose ±inf from NumPy is checked point by point. A complex result, or a
+constant too large for a float, also gives nan. Overflow gives inf.
+
+NumPy is optional. Without it (or in exact and decimal modes, whose number
+types have no ufuncs) `CalculatorCore.evaluate_many` falls back to calling
+the compiled expression once per value in pure Python, with the same nan
+convention for failing points. There, overflow gives nan where Python
+raises OverflowError (exp(1000), x**2 for huge x) and inf where it does not.
+"""
+
+import math
+
+from omnicalc.combinatorics import factorial, nCr, nPr, multinomial
+from omnicalc.cost import estimate_bits
+from omnicalc.parser import Call, Number
+
+# The variable that evaluate_many binds to the input values.
+VARIABLE = 'x'
+FLOAT_MAX_BITS = 1024
+
+
+def numpy_module():
+    """NumPy if it is installed, else None."""
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+# --- NumPy namespace ---
+
+def _numpy_functions(np):
+    def log(x, base=None):
+        return np.log(x) if base is None else np.log(x) / np.log(base)
+
+    def log_y(y, x):
+        return np.log(x) / np.log(y)
+
+    def y_root_x(y, x):
+        # Real roots of negative y for odd integral x, like functions.xth_root
+        y, x = np.asarray(y, dtype=float), np.asarray(x, dtype=float)
+        odd = (np.mod(x, 2) == 1) & (y < 0)
+        magnitude = np.power(np.abs(y), 1 / x)
+        return np.where(odd, -magnitude, np.where(y < 0, np.nan, magnitude))
+
+    def integer_ufunc(function):
+        # No ufunc equivalent: element by element over integral values, nan for the rest
+        # and inf (without computing the integer) when the result cannot be a float.
+        def element(*args):
+            if not all(float(arg).is_integer() for arg in args):
+                return math.nan
+            args = tuple(int(arg) for arg in args)
+            try:
+                if estimate_bits(Call('f', tuple(Number(arg) for arg in args)), {'f': function}) > FLOAT_MAX_BITS:
+                    return math.inf
+                return float(function(*args))
+            except OverflowError:
+                return math.inf
+            except ValueError:
+                return math.nan
+        return np.vectorize(element, otypes=[float])
+
+    return {
+        'sqrt': np.sqrt, 'cbrt': np.cbrt, 'log': log, 'log10': np.log10, 'exp': np.exp,
+        'abs': np.abs, 'pow': np.power, 'log_y': log_y, 'y_root_x': y_root_x,
+        'sin': np.sin, 'cos': np.cos, 'tan': np.tan,
+        'asin': np.arcsin, 'acos': np.arccos, 'atan': np.arctan,
+        'sinh': np.sinh, 'cosh': np.cosh, 'tanh': np.tanh,
+        'asinh': np.arcsinh, 'acosh': np.arccosh, 'atanh': np.arctanh,
+        'sind': lambda x: np.sin(np.radians(x)),
+        'cosd': lambda x: np.cos(np.radians(x)),
+        'tand': lambda x: np.tan(np.radians(x)),
+        'asind': lambda x: np.degrees(np.arcsin(x)),
+        'acosd': lambda x: np.degrees(np.arccos(x)),
+        'atand': lambda x: np.degrees(np.arctan(x)),
+        'factorial': integer_ufunc(factorial), 'nCr': integer_ufunc(nCr),
+        'nPr': integer_ufunc(nPr), 'multinomial': integer_ufunc(multinomial),
+    }
+
+
+def vector_namespace(namespace, np):
+    """
+    The NumPy counterpart of an evaluation namespace.
+
+    Known functions become ufuncs, numbers become floats and any other
+    callable is applied element by element (np.vectorize).
+    """
+    functions = _numpy_functions(np)
+    result = {}
+    for name, value in namespace.items():
+        if name in functions:
+            result[name] = functions[name]
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            result[name] = float(value)
+        elif callable(value):
+            result[name] = np.vectorize(value, otypes=[float])
+        else:
+            result[name] = value
+    return result
+
+
+def as_array(values, np):
+    """`values` as a 1-D float64 array (no copy when it already is one)."""
+    array = np.asarray(values, dtype=np.float64)
+    if array.ndim != 1:
+        array = array.reshape(-1)
+    return array
+
+
+def evaluate_vector(compiled, xs, env, np):
+    """Run a vector-compiled expression over the array `xs`; always returns an array shaped like xs."""
+    env = dict(env or {})
+    env[VARIABLE] = xs
+    try:
+        with np.errstate(all='ignore'):
+            result = np.asarray(compiled(env))
+    except (ArithmeticError, ValueError, TypeError):
+        # Not an array operation that failed but Python arithmetic (an int beyond
+        # float range, an unfolded 1/0): each point on its own, like the fallback.
+        return _evaluate_points(compiled, xs, env, np)
+    if np.iscomplexobj(result):
+        result = np.full(result.shape, np.nan)  # a complex value is nan in the fallback too
+    result = result.astype(np.float64, copy=False)
+    if result.shape != xs.shape:
+        result = np.broadcast_to(result, xs.shape).copy()  # the expression does not depend on x
+    poles = np.flatnonzero(np.isinf(result))
+    if poles.size:
+        # inf from a division by zero is a pole (nan); inf from overflow stays
+        result[poles] = _evaluate_points(compiled, xs[poles], env, np)
+    return result
+
+
+def _evaluate_points(compiled, xs, env, np):
+    """`compiled` over `xs` one point at a time, with division by zero raising; failing points are nan."""
+    result = np.empty(xs.shape)
+    for i in range(xs.size):
+        env[VARIABLE] = xs[i:i + 1]
+        try:
+            with np.errstate(all='ignore', divide='raise'):
+                value = np.asarray(compiled(env))
+        except (ArithmeticError, ValueError, TypeError):
+            value = None
+        result[i] = np.nan if value is None or np.iscomplexobj(value) else value.reshape(-1)[0]
+    return result
+
+
+def evaluate_scalar(compiled, xs, env):
+    """Pure-Python fallback: one call per value; points that fail (or turn complex) give nan."""
+    env = dict(env or {})
+    results = []
+    append = results.append
+    for x in xs:
+        env[VARIABLE] = x
+        try:
+            value = compiled(env)
+        except (ArithmeticError, ValueError, TypeError):
+            value = math.nan
+        append(math.nan if type(value) is complex else value)
+    return results
@@ -0,0 +1,387 @@
+"""
+Worksheets: named values and functions that recompute like a spreadsheet.
+
+A worksheet is a set of cells, each defined by a line such as
+
+    r = 5
+    area = pi*r**2
+    f(x) = sin(x)/x
+
+Cells may be defined in any order and read each other by name; `ANS` is the
+core's last answer. Every cell is compiled once with CalculatorCore's
+compiler (the cost guard included), with the names it reads bound as
+variables, and a dependency graph records who reads whom. Changing `r`
+re-evaluates only `area` and whatever depends on it, in topological order,
+with the compiled expressions reused. A cell that calls a user function is
+recompiled when the function (or anything it reads) changes, since calls with
+constant arguments are folded at compile time. A cell on a cycle, or reading
+one, is an error.
+
+With `workers`, cells of the same topological layer are independent of each
+other; those that took longer than PARALLEL_SECONDS the last time are
+evaluated together in worker processes (omnicalc.parallel).
+"""
+
+import re
+import time
+
+DEFINITION_RE = re.compile(r'\s*([A-Za-z_]\w*)\s*(\(\s*([A-Za-z_]\w*(?:\s*,\s*[A-Za-z_]\w*)*)?\s*\))?\s*=\s*(.*)$')
+# Cells that took longer than this are worth sending to a worker process.
+PARALLEL_SECONDS = 0.02
+
+
+class CircularReference(ValueError):
+    pass
+
+
+class Cell:
+    """One definition: a value (`params` None) or a function of `params`."""
+
+    __slots__ = ('name', 'expression', 'params', 'reads', 'calls', 'inputs', 'compiled', 'compile_error',
+                 'value', 'error', 'seconds')
+
+    def __init__(self, name, expression, params=None):
+        self.name = name
+        self.expression = expression
+        self.params = params
+        self.reads = frozenset()  # other cells read by name
+        self.calls = frozenset()  # user functions called
+        self.inputs = frozenset()  # both
+        self.compiled = None
+        self.compile_error = None
+        self.value = None
+        self.error = None
+        self.seconds = 0.0  # time the last evaluation took
+
+    @property
+    def is_function(self):
+        return self.params is not None
+
+    def __repr__(self):
+        head = f"{self.name}({', '.join(self.params)})" if self.is_function else self.name
+        return f"<Cell {head} = {self.expression}>"
+
+
+class UserFunction:
+    """The callable a user function cell puts in the namespace; it runs the cell's current definition."""
+
+    __slots__ = ('worksheet', 'name')
+
+    def __init__(self, worksheet, name):
+        self.worksheet = worksheet
+        self.name = name
+
+    def __call__(self, *args):
+        cell = self.worksheet.cells.get(self.name)
+        if cell is None or not cell.is_function:
+            raise NameError(f"name '{self.name}' is not defined")
+        if cell.error is not None:
+            raise cell.error
+        if len(args) != len(cell.params):
+            raise TypeError(f"{self.name}() takes {len(cell.params)} arguments ({len(args)} given)")
+        env = self.worksheet._env(cell)
+        env.update(zip(cell.params, args))
+        return cell.compiled(env)
+
+
+def parse_definition(line):
+    """(name, params or None, expression) from a line like 'r = 5' or 'f(x, y) = x*y'."""
+    match = DEFINITION_RE.match(line)
+    if match is None or not match.group(4).strip():
+        raise SyntaxError(f"expected 'name = expression' or 'name(x) = expression': {line.strip()!r}")
+    name, parens, params, expression = match.groups()
+    if parens is None:
+        return name, None, expression.strip()
+    return name, tuple(param.strip() for param in params.split(',')) if params else (), expression.strip()
+
+
+class Worksheet:
+    """Cells evaluated with `core`'s modes and compiler; see the module docstring."""
+
+    def __init__(self, core, workers=0):
+        self.core = core
+        self.workers = workers
+        self.cells = {}  # name -> Cell, in definition order
+        self._readers = {}  # name -> names of the cells that read or call it (defined or not)
+        self._functions = {}  # name -> UserFunction
+        self._namespace = None
+        self._key = None
+        self._pool = None
+
+    def __contains__(self, name):
+        return name in self.cells
+
+    def __iter__(self):
+        return iter(self.cells)
+
+    def __len__(self):
+        return len(self.cells)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool = None
+
+    def value(self, name):
+        """The value of cell `name`; raises the cell's error if it has none."""
+        cell = self.cells[name]
+        if cell.error is not None:
+            raise cell.error
+        return cell.value
+
+    def format_cell(self, name):
+        """'name = value' (or the definition for a function) as the command line prints it."""
+        cell = self.cells[name]
+        if cell.is_function:
+            head = f"{name}({', '.join(cell.params)}) = {cell.expression}"
+            return head if cell.error is None else f"{head}: Error: {cell.error}"
+        if cell.error is not None:
+            return f"{name} = Error: {str(cell.error) or type(cell.error).__name__}"
+        return f"{name} = {self.core._format_result(cell.value)}"
+
+    # --- Editing ---
+
+    def define(self, line):
+        """Add or replace the cell defined by `line`; returns the names recomputed, in order."""
+        name, params, expression = parse_definition(line)
+        return self.set(name, expression, params)
+
+    def set(self, name, expression, params=None):
+        """Add or replace cell `name`; returns the names recomputed, in order."""
+        if self._check_modes():
+            self._put(name, expression, params)
+            return self.recompute_all()
+        recompile = self._put(name, expression, params)
+        return self._recompute({name}, recompile)
+
+    def load(self, lines):
+        """Define a cell for every non-blank line, then compute them all once; returns their names."""
+        names = []
+        for line in lines:
+            if line.strip():
+                name, params, expression = parse_definition(line)
+                self._put(name, expression, params)
+                names.append(name)
+        self.recompute_all()
+        return names
+
+    def remove(self, name):
+        """Delete cell `name`; the cells reading it become errors. Returns the names recomputed."""
+        cell = self.cells.pop(name)
+        self._unlink(cell)
+        if cell.is_function:
+            del self._functions[name]
+            self._namespace = None
+        return self._recompute({name}, set(self._readers.get(name, ())))
+
+    def check_name(self, name, params=None):
+        """Raise ValueError if `name` or one of `params` is a built-in name."""
+        core = self.core
+        if name in core.VARIABLES or name in core.safe_dict:
+            raise ValueError(f"'{name}' is a built-in name")
+        for param in params or ():
+            if param in core.safe_dict:
+                raise ValueError(f"'{param}' is a built-in name")
+
+    def _put(self, name, expression, params):
+        """Replace the cell without evaluating anything; returns the cells to recompile (itself included)."""
+        self.check_name(name, params)
+        old = self.cells.get(name)
+        if old is not None:
+            self._unlink(old)
+        cell = Cell(name, expression, params)
+        self.cells[name] = cell
+        if cell.is_function != (name in self._functions):
+            if cell.is_function:
+                self._functions[name] = UserFunction(self, name)
+            else:
+                del self._functions[name]
+            self._namespace = None
+        self._analyze(cell)
+        # A call to a function that was not one before failed to compile.
+        if old is None or old.is_function or cell.is_function:
+            return {name} | self._readers.get(name, set())
+        return {name}
+
+    def _unlink(self, cell):
+        for read in cell.inputs:
+            readers = self._readers.get(read)
+            if readers is not None:
+                readers.discard(cell.name)
+                if not readers:
+                    del self._readers[read]
+
+    # --- Compiling ---
+
+    def _check_modes(self):
+        """Drop compiled forms when the number or angle mode (or the function table) changed."""
+        core = self.core
+        namespace = core.safe_dict
+        key = (core.is_deg_mode, core.is_exact_mode, core.precision, id(namespace),
+               getattr(namespace, 'version', None))
+        if key == self._key:
+            return False
+        self._key = key
+        self._namespace = None
+        self.close()  # the workers run in the old modes
+        return True
+
+    def _names(self):
+        if self._namespace is None:
+            namespace = dict(self.core._namespace())
+            namespace.update(self._functions)
+            self._namespace = namespace
+        return self._namespace
+
+    def _analyze(self, cell):
+        """Find the names the cell reads and calls and record it as their reader."""
+        from omnicalc.parser import Name, UnaryOp, BinOp, Call
+        try:
+            tree = self.core._preprocess_expression(cell.expression)
+        except Exception as exc:
+            cell.compile_error = exc
+            return
+        builtins = self.core.safe_dict
+        local = set(cell.params or ()) | set(self.core.VARIABLES)
+        reads, calls = set(), set()
+        stack = [tree]
+        while stack:
+            node = stack.pop()
+            node_type = type(node)
+            if node_type is Name:
+                if node.id not in local and node.id not in builtins:
+                    reads.add(node.id)
+            elif node_type is BinOp:
+                stack.extend((node.left, node.right))
+            elif node_type is UnaryOp:
+                stack.append(node.operand)
+            elif node_type is Call:
+                if node.func not in builtins:
+                    calls.add(node.func)
+                stack.extend(node.args)
+        cell.reads, cell.calls = frozenset(reads), frozenset(calls)
+        cell.inputs = cell.reads | cell.calls
+        for name in cell.inputs:
+            self._readers.setdefault(name, set()).add(cell.name)
+
+    def _compile(self, cell):
+        cell.compiled = cell.compile_error = None
+        variables = self.core.VARIABLES + tuple(cell.params or ()) + tuple(sorted(cell.reads))
+        try:
+            cell.compiled = self.core._compile_uncached(cell.expression, variables, self._names())
+        except Exception as exc:
+            cell.compile_error = exc
+
+    # --- Evaluating ---
+
+    def recompute_all(self):
+        """Recompile and re-evaluate every cell; returns their names in the order computed."""
+        self._check_modes()
+        return self._recompute(set(self.cells), set(self.cells))
+
+    def _recompute(self, changed, recompile):
+        # Everything downstream of the change, ...
+        affected = set()
+        stack = list(changed)
+        while stack:
+            name = stack.pop()
+            if name not in affected:
+                affected.add(name)
+                stack.extend(self._readers.get(name, ()))
+        for name in affected:
+            cell = self.cells.get(name)
+            if cell is not None and cell.is_function:
+                recompile.update(self._readers.get(name, ()))  # their calls may have been folded
+        cells = self.cells
+        affected.intersection_update(cells)
+        # ... in topological order (Kahn), one layer of independent cells at a time.
+        pending = {}  # cell -> number of affected cells it still waits for
+        for name in affected:
+            cell = cells[name]
+            pending[name] = len(cell.inputs & affected) if cell.inputs else 0
+        layer = [name for name, count in pending.items() if count == 0]
+        order = []
+        while layer:
+            for name in layer:
+                del pending[name]
+                if name in recompile:
+                    self._compile(cells[name])
+            self._evaluate_layer([cells[name] for name in layer])
+            order.extend(layer)
+            following = []
+            for name in layer:
+                for reader in self._readers.get(name, ()):
+                    if reader in pending:
+                        pending[reader] -= 1
+                        if pending[reader] == 0:
+                            following.append(reader)
+            layer = following
+        for name in pending:  # on a cycle or downstream of one
+            cell = cells[name]
+            cell.value, cell.error = None, CircularReference(f"circular reference in {name}")
+            order.append(name)
+        return order
+
+    def _env(self, cell):
+        """The values of the cells `cell` reads, plus ANS."""
+        env = {'ANS': self.core.last_answer}
+        cells = self.cells
+        for name in cell.reads:
+            read = cells.get(name)
+            if read is None:
+                raise NameError(f"name '{name}' is not defined")
+            if read.is_function:
+                raise TypeError(f"{name} is a function")
+            if read.error is not None:
+                raise ValueError(f"{name} has no value")
+            env[name] = read.value
+        return env
+
+    def _evaluate_layer(self, layer):
+        slow = []
+        for cell in layer:
+            if cell.is_function or cell.compile_error is not None:
+                cell.value, cell.error = None, cell.compile_error
+            elif self.workers and not cell.calls and cell.seconds > PARALLEL_SECONDS:
+                slow.append(cell)
+            else:
+                self._evaluate(cell)
+        if len(slow) == 1:
+            self._evaluate(slow[0])
+        elif slow:
+            self._evaluate_parallel(slow)
+
+    def _evaluate(self, cell):
+        start = time.perf_counter()
+        try:
+            cell.value, cell.error = cell.compiled(self._env(cell)), None
+        except Exception as exc:
+            cell.value, cell.error = None, exc
+        cell.seconds = time.perf_counter() - start
+
+    def _evaluate_parallel(self, cells):
+        items = []
+        for cell in cells:
+            try:
+                items.append((cell.expression, self._env(cell)))
+            except Exception as exc:
+                cell.value, cell.error = None, exc
+                items.append(None)
+        if self._pool is None:
+            from omnicalc.parallel import BatchEvaluator
+            core = self.core
+            self._pool = BatchEvaluator(workers=self.workers, timeout=None, chunk_size=1,
+                                        deg_mode=core.is_deg_mode, cost_model=core.cost_model,
+                                        exact=core.is_exact_mode, precision=core.precision, values=True)
+        work = [(cell, item) for cell, item in zip(cells, items) if item is not None]
+        for (cell, _), result in zip(work, self._pool.map(item for _, item in work)):
+            if result.ok:
+                cell.value, cell.error = result.output, None
+            else:
+                cell.value, cell.error = None, ValueError(result.output.removeprefix("Error: "))